@@ -0,0 +1,74 @@
+"""Configurable vector index (hnsw / ivfflat) on embeddings.vector
+
+Revision ID: 003_vector_index_type
+Revises: 002_subject_grade_decouple
+Create Date: 2026-10-18
+
+Changes:
+1. Drop the original ivfflat index idx_embeddings_vector
+2. Recreate idx_embeddings_vector as HNSW or ivfflat depending on
+   VECTOR_INDEX_TYPE (read from the environment, see app/core/config.py)
+
+To switch index type later:
+    alembic downgrade 002_subject_grade_decouple
+    VECTOR_INDEX_TYPE=ivfflat alembic upgrade head
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# Read the index settings directly (same names and defaults as app/core/config.py)
+# so the migration does not depend on importing the application package.
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw").strip().lower()
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "100"))
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003_vector_index_type'
+down_revision: Union[str, None] = '002_subject_grade_decouple'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if VECTOR_INDEX_TYPE not in ("hnsw", "ivfflat"):
+        raise RuntimeError("VECTOR_INDEX_TYPE must be hnsw or ivfflat.")
+
+    conn = op.get_bind()
+
+    conn.execute(sa.text("""
+        DROP INDEX IF EXISTS idx_embeddings_vector
+    """))
+
+    if VECTOR_INDEX_TYPE == "hnsw":
+        # HNSW 不需要先有資料即可建立，查詢參數為 hnsw.ef_search
+        conn.execute(sa.text(f"""
+            CREATE INDEX idx_embeddings_vector ON embeddings
+            USING hnsw (vector vector_cosine_ops)
+            WITH (m = {int(HNSW_M)}, ef_construction = {int(HNSW_EF_CONSTRUCTION)})
+        """))
+    else:
+        # ivfflat 的 lists 建議約為 rows / 1000，查詢參數為 ivfflat.probes
+        conn.execute(sa.text(f"""
+            CREATE INDEX idx_embeddings_vector ON embeddings
+            USING ivfflat (vector vector_cosine_ops)
+            WITH (lists = {int(IVFFLAT_LISTS)})
+        """))
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+
+    conn.execute(sa.text("""
+        DROP INDEX IF EXISTS idx_embeddings_vector
+    """))
+
+    # 還原 db/init.sql 的原始索引
+    conn.execute(sa.text("""
+        CREATE INDEX idx_embeddings_vector ON embeddings
+        USING ivfflat (vector vector_cosine_ops)
+    """))
@@ -0,0 +1,46 @@
+"""add jobs table for background work
+
+Revision ID: 004_add_jobs_table
+Revises: 003_vector_index_type
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004_add_jobs_table'
+down_revision: Union[str, None] = '003_vector_index_type'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.String(36), nullable=False),
+        sa.Column('job_type', sa.String(50), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+        sa.Column('params', sa.JSON(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('progress_done', sa.Integer(), server_default='0'),
+        sa.Column('progress_total', sa.Integer(), server_default='0'),
+        sa.Column('message', sa.String(255), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), server_default='false'),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+        sa.Column('started_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_jobs_job_type', 'jobs', ['job_type'])
+    op.create_index('ix_jobs_status', 'jobs', ['status'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_status', table_name='jobs')
+    op.drop_index('ix_jobs_job_type', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,34 @@
+"""add content_hash to embeddings for incremental re-embedding
+
+Revision ID: 005_embedding_content_hash
+Revises: 004_add_jobs_table
+Create Date: 2026-10-18
+
+Existing rows keep a NULL hash; it is computed from slice_text and
+backfilled the first time the owning document is re-indexed.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_embedding_content_hash'
+down_revision: Union[str, None] = '004_add_jobs_table'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('embeddings', sa.Column('content_hash', sa.String(64), nullable=True))
+    op.create_index(
+        'ix_embeddings_document_id_content_hash',
+        'embeddings',
+        ['document_id', 'content_hash'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_embeddings_document_id_content_hash', table_name='embeddings')
+    op.drop_column('embeddings', 'content_hash')
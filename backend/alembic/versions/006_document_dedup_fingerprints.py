@@ -0,0 +1,66 @@
+"""add content hash and simhash fingerprints to documents
+
+Revision ID: 006_document_dedup_fingerprints
+Revises: 005_embedding_content_hash
+Create Date: 2026-10-18
+
+Existing documents are fingerprinted in batches with app.core.dedup so
+that the ingest duplicate checks also cover rows imported before this
+revision. The hash index is deliberately non-unique: earlier imports may
+already contain duplicates.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.core.dedup import document_fingerprint
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006_document_dedup_fingerprints'
+down_revision: Union[str, None] = '005_embedding_content_hash'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('content_hash', sa.String(64), nullable=True))
+    op.add_column('documents', sa.Column('simhash', sa.BigInteger(), nullable=True))
+    op.add_column('documents', sa.Column('simhash_bands', postgresql.ARRAY(sa.Integer()), nullable=True))
+
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.text(
+                "SELECT id, content FROM documents WHERE id > :last_id ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+        conn.execute(
+            sa.text(
+                "UPDATE documents SET content_hash = :content_hash, simhash = :simhash, "
+                "simhash_bands = :simhash_bands WHERE id = :id"
+            ),
+            [{"id": row.id, **document_fingerprint(row.content)} for row in rows],
+        )
+        last_id = rows[-1].id
+
+    op.create_index('ix_documents_content_hash', 'documents', ['content_hash'])
+    op.create_index(
+        'ix_documents_simhash_bands', 'documents', ['simhash_bands'], postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_simhash_bands', table_name='documents')
+    op.drop_index('ix_documents_content_hash', table_name='documents')
+    op.drop_column('documents', 'simhash_bands')
+    op.drop_column('documents', 'simhash')
+    op.drop_column('documents', 'content_hash')
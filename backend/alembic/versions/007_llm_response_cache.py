@@ -0,0 +1,40 @@
+"""add llm response cache table
+
+Revision ID: 007_llm_response_cache
+Revises: 006_document_dedup_fingerprints
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007_llm_response_cache'
+down_revision: Union[str, None] = '006_document_dedup_fingerprints'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'llm_response_cache',
+        sa.Column('key', sa.String(64), nullable=False),
+        sa.Column('model', sa.String(100), nullable=False),
+        sa.Column('response', sa.Text(), nullable=False),
+        sa.Column('prompt_chars', sa.Integer(), server_default='0'),
+        sa.Column('hit_count', sa.Integer(), server_default='0'),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+        sa.Column('last_hit_at', sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+        sa.Column('expires_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_llm_response_cache_last_hit_at', 'llm_response_cache', ['last_hit_at'])
+    op.create_index('ix_llm_response_cache_expires_at', 'llm_response_cache', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_llm_response_cache_expires_at', table_name='llm_response_cache')
+    op.drop_index('ix_llm_response_cache_last_hit_at', table_name='llm_response_cache')
+    op.drop_table('llm_response_cache')
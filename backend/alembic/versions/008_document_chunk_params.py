@@ -0,0 +1,33 @@
+"""record chunking parameters on documents
+
+Revision ID: 008_document_chunk_params
+Revises: 007_llm_response_cache
+Create Date: 2026-10-18
+
+Incremental re-embedding (DocumentService.update_document) must re-chunk
+a document with the same chunk size and overlap that produced its stored
+embeddings; otherwise no chunk hash matches and the whole document is
+re-embedded with mixed chunk sizes. Existing rows keep NULL and fall back
+to the defaults for their import_source.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008_document_chunk_params'
+down_revision: Union[str, None] = '007_llm_response_cache'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('chunk_size', sa.Integer(), nullable=True))
+    op.add_column('documents', sa.Column('chunk_overlap', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('documents', 'chunk_overlap')
+    op.drop_column('documents', 'chunk_size')
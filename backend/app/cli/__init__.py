@@ -0,0 +1,5 @@
+"""
+EduRAG 命令列工具。
+
+    python -m app.cli import <檔案> [選項]
+"""
@@ -0,0 +1,57 @@
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.core.config import UPLOAD_CHUNK_SIZE, CHUNK_OVERLAP
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="EduRAG 命令列工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser(
+        "import",
+        help="大量匯入文件（.xlsx / .xls / .csv / .jsonl），可中斷後續傳",
+    )
+    import_parser.add_argument("path", help="來源檔案")
+    import_parser.add_argument("--database-url", help="預設使用環境變數 DATABASE_URL")
+    import_parser.add_argument("--import-source", default="cli_import", help="寫入 documents.import_source 的值")
+    import_parser.add_argument("--default-subject", default="健康", help="Subject 欄位空白時使用的科目")
+    import_parser.add_argument("--batch-size", type=int, default=1000, help="每批（每個交易）的列數")
+    import_parser.add_argument("--workers", type=int, default=None, help="分塊 / 向量化的 process 數（預設為 CPU 數）")
+    import_parser.add_argument("--chunk-size", type=int, default=UPLOAD_CHUNK_SIZE)
+    import_parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP)
+    import_parser.add_argument("--restart", action="store_true", help="忽略先前的進度，從頭匯入")
+    return parser
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    args = build_parser().parse_args(argv)
+
+    if args.command == "import":
+        from app.cli.bulk_import import run_import
+
+        summary = asyncio.run(run_import(
+            args.path,
+            database_url=args.database_url,
+            import_source=args.import_source,
+            default_subject=args.default_subject,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            overlap=args.overlap,
+            restart=args.restart,
+        ))
+        print(
+            f"匯入完成：{summary['documents']} 份文件（重複略過 {summary['duplicates']}）、"
+            f"{summary['embeddings']} 個文本塊、"
+            f"{summary['errors']} 列錯誤（job {summary['job_id']}）"
+        )
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
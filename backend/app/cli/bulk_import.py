@@ -0,0 +1,400 @@
+# app/cli/bulk_import.py
+"""
+大量匯入文件 — 取代舊的根目錄 import_excel_data.py。
+
+    python -m app.cli import data.xlsx --workers 4 --batch-size 1000
+
+- 來源可為 .xlsx / .xls、.csv、.jsonl；欄位同 Excel 範本（Words, Chapter,
+  Subject, Imagesrelated, Grade, Page），也接受 content / chapter /
+  subject / image_filename / grade / page_number / title 等小寫鍵
+- 主程序串流讀取來源，每 batch_size 列交給 process pool 驗證、分塊並
+  向量化；結果依原順序以 COPY（copy_records_to_table）寫入
+  documents / embeddings，文件 ID 先用 nextval 一次保留
+- 內容與既有文件完全相同（content_hash）的列略過，並寫入去重指紋
+- 每批的資料與進度（jobs 表，job ID 由檔案內容 hash 決定）在同一交易內
+  提交；中斷後重新執行同一指令會從最後提交的批次繼續，不會重複寫入
+- 結束後 ANALYZE documents / embeddings，讓查詢計畫反映新資料量
+"""
+import asyncio
+import csv
+import functools
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+import asyncpg
+from pgvector.asyncpg import register_vector
+
+from app.core.chunking import iter_chunks
+from app.core.config import DATABASE_URL
+from app.core.dedup import document_fingerprint
+from app.core.embeddings import get_embedding_backend
+from app.core.excel_reader import ExcelReader, cell_to_text
+from app.services.document_service import validate_document_row
+from app.services.indexing_service import chunk_content_hash
+from app.services.upload_service import build_document_title
+
+logger = logging.getLogger(__name__)
+
+JOB_TYPE = "bulk_import"
+MAX_STORED_ERRORS = 100
+
+# 來源欄位（小寫）→ documents 欄位
+FIELD_ALIASES = {
+    "words": "content",
+    "content": "content",
+    "title": "title",
+    "chapter": "chapter",
+    "subject": "subject",
+    "grade": "grade",
+    "page": "page_number",
+    "page_number": "page_number",
+    "imagesrelated": "image_filename",
+    "image_filename": "image_filename",
+}
+
+DOCUMENT_COLUMNS = (
+    "id", "title", "content", "subject", "grade", "chapter",
+    "page_number", "image_filename", "import_source",
+    "content_hash", "simhash", "simhash_bands",
+    "chunk_size", "chunk_overlap",
+)
+EMBEDDING_COLUMNS = ("document_id", "slice_text", "content_hash", "vector")
+
+ENSURE_SUBJECTS_SQL = """
+    INSERT INTO subjects (name, description, color, grade, is_active)
+    SELECT n, '自動建立於大量匯入', '#3B82F6', '', true
+    FROM unnest($1::varchar[]) AS n
+    WHERE NOT EXISTS (SELECT 1 FROM subjects s WHERE s.name = n)
+    ON CONFLICT (name, grade) DO NOTHING
+"""
+
+
+# ---------------------------------------------------------------------- #
+#  Source readers
+# ---------------------------------------------------------------------- #
+def iter_source_rows(path: str) -> Iterator[Dict[str, Optional[str]]]:
+    """依副檔名串流讀取來源檔，每列產生 {documents 欄位: 值}；無法解析的列帶 _error"""
+    suffix = Path(path).suffix.lower()
+
+    if suffix in (".xlsx", ".xls"):
+        with open(path, "rb") as f:
+            with ExcelReader(f, path, column_aliases=FIELD_ALIASES, lowercase_columns=True) as reader:
+                reader.require(["content"], message="來源缺少內容欄位（Words / content）")
+                for record in reader:
+                    yield record.values
+
+    elif suffix == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                yield {
+                    _field_name(key): (value if value != "" else None)
+                    for key, value in row.items()
+                    if key
+                }
+
+    elif suffix in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    obj = json.loads(line)
+                    if not isinstance(obj, dict):
+                        raise ValueError("每行必須是 JSON 物件")
+                except ValueError as e:
+                    yield {"_error": f"JSON 格式錯誤: {e}"}
+                    continue
+                yield {_field_name(key): cell_to_text(value) for key, value in obj.items()}
+
+    else:
+        raise ValueError(f"不支援的檔案格式: {suffix}（支援 .xlsx、.xls、.csv、.jsonl）")
+
+
+def _field_name(key: str) -> str:
+    key = key.strip().lower()
+    return FIELD_ALIASES.get(key, key)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(functools.partial(f.read, 1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------------------- #
+#  Worker side (runs in the process pool)
+# ---------------------------------------------------------------------- #
+def prepare_batch(
+    rows: List[Dict[str, Optional[str]]],
+    import_source: str,
+    default_subject: str,
+    chunk_size: int,
+    overlap: int,
+) -> Dict[str, Any]:
+    """
+    驗證、分塊並向量化一批列（子程序內執行，必須是模組層級函式）
+
+    Returns:
+        documents: 通過驗證的文件欄位 dict
+        chunks: [(documents 中的位置, 文本, content_hash)]
+        vectors: 與 chunks 對應的向量（numpy 陣列）
+        errors: [(批次內列位置, 錯誤訊息)]
+    """
+    documents: List[Dict[str, Any]] = []
+    chunks: List[Tuple[int, str, str]] = []
+    errors: List[Tuple[int, str]] = []
+
+    for offset, row in enumerate(rows):
+        if "_error" in row:
+            errors.append((offset, row["_error"]))
+            continue
+
+        content = row.get("content") or ""
+        chapter = row.get("chapter") or ""
+        document = {
+            "title": (row.get("title") or "").strip() or build_document_title(content, chapter),
+            "content": content,
+            "subject": (row.get("subject") or "").strip() or default_subject,
+            "grade": (row.get("grade") or "").strip() or None,
+            "chapter": chapter,
+            "page_number": (row.get("page_number") or "").strip() or None,
+            "image_filename": row.get("image_filename"),
+            "import_source": import_source,
+            # 記錄分塊參數，之後編輯文件時以相同參數增量重建
+            "chunk_size": chunk_size,
+            "chunk_overlap": overlap,
+        }
+        error = validate_document_row(document)
+        if error:
+            errors.append((offset, error))
+            continue
+
+        document.update(document_fingerprint(content))
+        position = len(documents)
+        documents.append(document)
+        for chunk in iter_chunks(content, chunk_size, overlap):
+            chunks.append((position, chunk.text, chunk_content_hash(chunk.text)))
+
+    vectors = (
+        get_embedding_backend().embed_batch([text for _, text, _ in chunks])
+        if chunks else None
+    )
+    return {"documents": documents, "chunks": chunks, "vectors": vectors, "errors": errors}
+
+
+# ---------------------------------------------------------------------- #
+#  Import driver
+# ---------------------------------------------------------------------- #
+async def run_import(
+    path: str,
+    database_url: Optional[str] = None,
+    import_source: str = "cli_import",
+    default_subject: str = "健康",
+    batch_size: int = 1000,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+    overlap: int = 50,
+    restart: bool = False,
+) -> Dict[str, Any]:
+    """執行（或續傳）一次大量匯入，回傳統計"""
+    dsn = (database_url or DATABASE_URL or "").replace("postgresql+asyncpg://", "postgresql://", 1)
+    if not dsn:
+        raise RuntimeError("請以 --database-url 或環境變數 DATABASE_URL 指定資料庫")
+
+    file_hash = file_sha256(path)
+    job_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"edurag:{JOB_TYPE}:{import_source}:{file_hash}"))
+    workers = workers or os.cpu_count() or 1
+
+    conn = await asyncpg.connect(dsn)
+    await register_vector(conn)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        state = await _start_job(conn, job_id, path, file_hash, import_source, restart)
+        if state is None:
+            logger.info("檔案已完整匯入過（job %s），略過；要重新匯入請加 --restart", job_id)
+            summary = await _job_summary(conn, job_id)
+            return {**summary, "job_id": job_id}
+
+        rows_done, totals = state
+        if rows_done:
+            logger.info("從第 %d 列之後續傳（job %s）", rows_done, job_id)
+
+        loop = asyncio.get_running_loop()
+        prepare = functools.partial(
+            prepare_batch,
+            import_source=import_source,
+            default_subject=default_subject,
+            chunk_size=chunk_size,
+            overlap=overlap,
+        )
+
+        # 依序寫入，同時最多 2 * workers 批在 process pool 中處理
+        in_flight: Deque[Tuple[int, asyncio.Future]] = deque()
+        rows = itertools.islice(iter_source_rows(path), rows_done, None)
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if batch:
+                in_flight.append((len(batch), loop.run_in_executor(pool, prepare, batch)))
+            if in_flight and (not batch or len(in_flight) >= 2 * workers):
+                row_count, future = in_flight.popleft()
+                prepared = await future
+                await _write_batch(conn, job_id, rows_done, row_count, prepared, totals)
+                rows_done += row_count
+                logger.info(
+                    "已匯入 %d 列（文件 %d、重複略過 %d、文本塊 %d、錯誤 %d）",
+                    rows_done, totals["documents"], totals["duplicates"],
+                    totals["embeddings"], totals["errors"],
+                )
+            if not batch and not in_flight:
+                break
+
+        await conn.execute(
+            "UPDATE jobs SET status = 'succeeded', finished_at = now(), updated_at = now() WHERE id = $1",
+            job_id,
+        )
+        logger.info("ANALYZE documents / embeddings")
+        await conn.execute("ANALYZE documents")
+        await conn.execute("ANALYZE embeddings")
+        return {**totals, "job_id": job_id}
+
+    except BaseException as e:
+        # 已提交的批次保留；重新執行同一指令即可續傳
+        try:
+            await conn.execute(
+                "UPDATE jobs SET status = 'failed', error = $2, finished_at = now(), updated_at = now() WHERE id = $1",
+                job_id, f"{type(e).__name__}: {e}"[:2000],
+            )
+        except Exception:
+            logger.warning("無法更新匯入工作 %s 的狀態", job_id)
+        raise
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        await conn.close()
+
+
+async def _start_job(
+    conn: asyncpg.Connection,
+    job_id: str,
+    path: str,
+    file_hash: str,
+    import_source: str,
+    restart: bool,
+) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """建立或接續匯入工作；回傳 (已完成列數, 累計統計)，已完成時回傳 None"""
+    existing = await conn.fetchrow("SELECT status FROM jobs WHERE id = $1", job_id)
+    if existing and existing["status"] == "succeeded" and not restart:
+        return None
+
+    params = json.dumps({"path": os.path.abspath(path), "sha256": file_hash, "import_source": import_source})
+    row = await conn.fetchrow(
+        """
+        INSERT INTO jobs (id, job_type, status, params, progress_done, progress_total,
+                          started_at, updated_at)
+        VALUES ($1, $2, 'running', $3, 0, 0, now(), now())
+        ON CONFLICT (id) DO UPDATE SET
+            status = 'running', error = NULL, finished_at = NULL, updated_at = now(),
+            progress_done = CASE WHEN $4 THEN 0 ELSE jobs.progress_done END,
+            result = CASE WHEN $4 THEN NULL ELSE jobs.result END
+        RETURNING progress_done, result
+        """,
+        job_id, JOB_TYPE, params, restart,
+    )
+    totals = {"documents": 0, "duplicates": 0, "embeddings": 0, "errors": 0, "error_rows": []}
+    if row["result"]:
+        totals.update(json.loads(row["result"]))
+    return row["progress_done"] or 0, totals
+
+
+async def _job_summary(conn: asyncpg.Connection, job_id: str) -> Dict[str, Any]:
+    result = await conn.fetchval("SELECT result FROM jobs WHERE id = $1", job_id)
+    summary = {"documents": 0, "duplicates": 0, "embeddings": 0, "errors": 0}
+    if result:
+        summary.update(json.loads(result))
+    return summary
+
+
+async def _write_batch(
+    conn: asyncpg.Connection,
+    job_id: str,
+    rows_before: int,
+    row_count: int,
+    prepared: Dict[str, Any],
+    totals: Dict[str, Any],
+) -> None:
+    """在單一交易內寫入一批文件、文本塊與進度；內容與既有文件完全相同的列略過"""
+    documents = prepared["documents"]
+    chunks = prepared["chunks"]
+    vectors = prepared["vectors"]
+
+    async with conn.transaction():
+        # 以 content_hash 索引一次查出已存在的內容，連同同批內的重複一起略過
+        existing = {
+            record[0]
+            for record in await conn.fetch(
+                "SELECT content_hash FROM documents WHERE content_hash = ANY($1::varchar[])",
+                list({doc["content_hash"] for doc in documents}),
+            )
+        } if documents else set()
+        kept_positions: List[int] = []
+        for position, doc in enumerate(documents):
+            if doc["content_hash"] not in existing:
+                existing.add(doc["content_hash"])
+                kept_positions.append(position)
+        duplicates = len(documents) - len(kept_positions)
+
+        document_ids: Dict[int, int] = {}
+        if kept_positions:
+            reserved = await conn.fetch(
+                "SELECT nextval(pg_get_serial_sequence('documents', 'id')) "
+                "FROM generate_series(1, $1)",
+                len(kept_positions),
+            )
+            document_ids = {position: record[0] for position, record in zip(kept_positions, reserved)}
+            kept = [documents[position] for position in kept_positions]
+            await conn.execute(ENSURE_SUBJECTS_SQL, sorted({doc["subject"] for doc in kept}))
+            await conn.copy_records_to_table(
+                "documents",
+                columns=DOCUMENT_COLUMNS,
+                records=[
+                    (document_ids[position], *(documents[position][column] for column in DOCUMENT_COLUMNS[1:]))
+                    for position in kept_positions
+                ],
+            )
+
+        embedding_records = [
+            (document_ids[position], text, digest, vector)
+            for (position, text, digest), vector in zip(chunks, vectors if vectors is not None else [])
+            if position in document_ids
+        ]
+        if embedding_records:
+            await conn.copy_records_to_table(
+                "embeddings", columns=EMBEDDING_COLUMNS, records=embedding_records
+            )
+
+        batch_totals = dict(totals)
+        batch_totals["documents"] += len(kept_positions)
+        batch_totals["duplicates"] = totals.get("duplicates", 0) + duplicates
+        batch_totals["embeddings"] += len(embedding_records)
+        batch_totals["errors"] += len(prepared["errors"])
+        batch_totals["error_rows"] = (totals["error_rows"] + [
+            {"row": rows_before + offset + 1, "error": message}
+            for offset, message in prepared["errors"]
+        ])[:MAX_STORED_ERRORS]
+
+        await conn.execute(
+            "UPDATE jobs SET progress_done = $2, result = $3, updated_at = now() WHERE id = $1",
+            job_id, rows_before + row_count, json.dumps(batch_totals, ensure_ascii=False),
+        )
+
+    totals.update(batch_totals)
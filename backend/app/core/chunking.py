@@ -0,0 +1,154 @@
+# app/core/chunking.py
+"""
+線性時間的句子分塊器 — 供 ingest 與 Excel 上傳預覽共用。
+
+文本先依分隔符切成句子（句子包含結尾的分隔符），再把相鄰句子累積成
+不超過 max_chunk_size 的塊；相鄰塊之間保留不超過 overlap 個字元的
+完整句子作為重疊。超過 max_chunk_size 的長句以固定視窗硬切。
+
+SentenceChunker 支援以 feed() 分段餵入文字，只保留尚未輸出的尾端，
+適合串流處理；iter_chunks() 則是一次處理整段文字的便捷函式。
+"""
+import re
+from collections import deque
+from typing import Deque, Iterator, NamedTuple, Optional, Tuple
+
+from app.core.config import DEFAULT_CHUNK_SIZE, CHUNK_OVERLAP
+
+DEFAULT_DELIMITERS = "。！？.!?\n"
+
+
+class TextChunk(NamedTuple):
+    """分塊結果；start / end 為在原始文本中的字元位置（text == 原文[start:end]）"""
+    text: str
+    start: int
+    end: int
+
+
+class SentenceChunker:
+    def __init__(
+        self,
+        max_chunk_size: int = DEFAULT_CHUNK_SIZE,
+        overlap: int = CHUNK_OVERLAP,
+        delimiters: str = DEFAULT_DELIMITERS,
+    ):
+        if max_chunk_size <= 0:
+            raise ValueError("max_chunk_size 必須大於 0")
+        if not delimiters:
+            raise ValueError("delimiters 不能為空")
+        self.max_chunk_size = max_chunk_size
+        self.overlap = max(0, min(overlap, max_chunk_size - 1))
+        escaped = re.escape(delimiters)
+        self._sentence_re = re.compile(f"[^{escaped}]*[{escaped}]+")
+
+        self._buffer = ""
+        self._base = 0  # _buffer[0] 在原始文本中的位置
+        self._scan = 0  # 尚未切句的起點（原始文本位置）
+        self._sentences: Deque[Tuple[int, int]] = deque()  # 目前塊內的句子範圍
+
+    # ------------------------------------------------------------------ #
+    #  Public API
+    # ------------------------------------------------------------------ #
+    def feed(self, text: str) -> Iterator[TextChunk]:
+        """餵入一段文字，產生已可確定的塊"""
+        if not text:
+            return
+        self._buffer += text
+        end_of_buffer = self._base + len(self._buffer)
+
+        for match in self._sentence_re.finditer(self._buffer, self._scan - self._base):
+            if match.end() == len(self._buffer):
+                break  # 結尾的分隔符可能延續到下一段（例如「。」後的「\n」），等更多文字或 finish()
+            yield from self._add_sentence(self._base + match.start(), self._base + match.end())
+            self._scan = self._base + match.end()
+
+        # 沒有分隔符的長尾端：超過上限就先以視窗硬切，避免緩衝無限增長
+        if end_of_buffer - self._scan > self.max_chunk_size:
+            yield from self._flush_sentences()
+            step = self.max_chunk_size - self.overlap
+            while end_of_buffer - self._scan > self.max_chunk_size:
+                chunk = self._make_chunk(self._scan, self._scan + self.max_chunk_size)
+                if chunk:
+                    yield chunk
+                self._scan += step
+
+        self._compact()
+
+    def finish(self) -> Iterator[TextChunk]:
+        """輸入結束：輸出剩餘的尾端與最後一塊"""
+        end_of_buffer = self._base + len(self._buffer)
+        if self._scan < end_of_buffer:
+            yield from self._add_sentence(self._scan, end_of_buffer)
+            self._scan = end_of_buffer
+        yield from self._flush_sentences()
+        self._compact()
+
+    # ------------------------------------------------------------------ #
+    #  Internals
+    # ------------------------------------------------------------------ #
+    def _add_sentence(self, start: int, end: int) -> Iterator[TextChunk]:
+        if end - start > self.max_chunk_size:
+            yield from self._hard_split(start, end)
+            return
+
+        sentences = self._sentences
+        if sentences and end - sentences[0][0] > self.max_chunk_size:
+            chunk = self._make_chunk(sentences[0][0], sentences[-1][1])
+            if chunk:
+                yield chunk
+            # 保留結尾不超過 overlap 字元的完整句子作為下一塊的開頭
+            last_end = sentences[-1][1]
+            while sentences and last_end - sentences[0][0] > self.overlap:
+                sentences.popleft()
+            while sentences and end - sentences[0][0] > self.max_chunk_size:
+                sentences.popleft()
+        sentences.append((start, end))
+
+    def _hard_split(self, start: int, end: int) -> Iterator[TextChunk]:
+        """超長句：先輸出目前的塊，再以 max_chunk_size 視窗（含 overlap）切開"""
+        yield from self._flush_sentences()
+
+        step = self.max_chunk_size - self.overlap
+        pos = start
+        while end - pos > self.max_chunk_size:
+            chunk = self._make_chunk(pos, pos + self.max_chunk_size)
+            if chunk:
+                yield chunk
+            pos += step
+        self._sentences.append((pos, end))
+
+    def _flush_sentences(self) -> Iterator[TextChunk]:
+        """輸出目前累積的塊（不保留重疊）"""
+        if self._sentences:
+            chunk = self._make_chunk(self._sentences[0][0], self._sentences[-1][1])
+            self._sentences.clear()
+            if chunk:
+                yield chunk
+
+    def _make_chunk(self, start: int, end: int) -> Optional[TextChunk]:
+        raw = self._buffer[start - self._base : end - self._base]
+        stripped = raw.strip()
+        if not stripped:
+            return None
+        lead = len(raw) - len(raw.lstrip())
+        return TextChunk(stripped, start + lead, start + lead + len(stripped))
+
+    def _compact(self) -> None:
+        """丟棄已不再需要的緩衝前段（僅在可丟棄部分過半時才複製，維持線性時間）"""
+        keep_from = self._sentences[0][0] if self._sentences else self._scan
+        dead = keep_from - self._base
+        if dead > 0 and dead * 2 >= len(self._buffer):
+            self._buffer = self._buffer[dead:]
+            self._base = keep_from
+
+
+def iter_chunks(
+    text: str,
+    max_chunk_size: int = DEFAULT_CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP,
+    delimiters: str = DEFAULT_DELIMITERS,
+) -> Iterator[TextChunk]:
+    """將整段文字分塊，逐一產生 TextChunk"""
+    chunker = SentenceChunker(max_chunk_size, overlap, delimiters)
+    yield from chunker.feed(text)
+    yield from chunker.finish()
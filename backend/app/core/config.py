@@ -6,6 +6,7 @@ load_dotenv(find_dotenv())
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL") or None  # 例如本機 stub server；未設定時使用官方 API
 LLM_PROVIDER = "anthropic"  # 只支持 Claude
 USE_MOCK_API = os.getenv("USE_MOCK_API", "false").lower() in ("1", "true", "yes")
 
@@ -26,21 +27,117 @@ CORS_ORIGINS = [
 RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
 SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.1"))
 
+# Vector index (pgvector)：hnsw 或 ivfflat，由 alembic 003 遷移建立
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw").strip().lower()
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "100"))
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "100"))
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+
+# Embedding：md5（既有資料使用的雜湊向量）或 hashing（本地 NumPy 字元 n-gram）
+# 已存的 embeddings 都是 md5 向量，與 hashing 向量不相容；改用 hashing 前須重新嵌入全部文件
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "md5").strip().lower()
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+# 一批文字總字元數達此值時改在執行緒中計算向量，避免阻塞 event loop；短查詢仍直接計算
+EMBEDDING_THREAD_MIN_CHARS = int(os.getenv("EMBEDDING_THREAD_MIN_CHARS", "8192"))
+
+# Query embedding cache（LRU 筆數上限）
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "256"))
+
 # Text chunking
 DEFAULT_CHUNK_SIZE = int(os.getenv("DEFAULT_CHUNK_SIZE", "300"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
 UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", "500"))
 
+# Streaming ingest（/api/ingest/stream）
+STREAM_INGEST_MAX_BYTES = int(os.getenv("STREAM_INGEST_MAX_BYTES", str(100 * 1024 * 1024)))
+STREAM_INGEST_MAX_LINE_BYTES = int(os.getenv("STREAM_INGEST_MAX_LINE_BYTES", str(4 * 1024 * 1024)))  # NDJSON 單行上限
+STREAM_INGEST_CONTENT_PAGE = int(os.getenv("STREAM_INGEST_CONTENT_PAGE", str(1024 * 1024)))  # 原文每累積多少字元寫入一次
+
 # LLM
 LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "claude-sonnet-4-20250514")
+# LLM 後端：anthropic（Claude API）或 fake（app/core/fake_llm.py，離線壓測用的決定性假回應）
+LLM_BACKEND = os.getenv("LLM_BACKEND", "anthropic").strip().lower()
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))  # 首個 token 延遲的中位數
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))  # 對數常態分佈的 sigma；0 表示固定延遲
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "80"))  # 輸出速度；0 表示不模擬
+FAKE_LLM_RATE_LIMIT_RATE = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0"))  # 回傳 429 的比例
+FAKE_LLM_SERVER_ERROR_RATE = float(os.getenv("FAKE_LLM_SERVER_ERROR_RATE", "0"))  # 回傳 500 / 529 的比例
+FAKE_LLM_MALFORMED_RATE = float(os.getenv("FAKE_LLM_MALFORMED_RATE", "0"))  # 輸出格式損壞的比例
+FAKE_LLM_RETRY_AFTER_SECONDS = float(os.getenv("FAKE_LLM_RETRY_AFTER_SECONDS", "1"))
+FAKE_LLM_MAX_TRACKED = int(os.getenv("FAKE_LLM_MAX_TRACKED", "10000"))  # 記住的請求 / 快取前綴數上限（LRU）
+# Prompt caching（app/core/prompt_cache.py）：模板與文件內容作為可快取的前綴
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))  # 前綴短於此不加快取斷點
+
+# 模板生成的 context 預算（app/core/context_packer.py）：文件內容超過預算時只保留最相關的段落
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "40000"))  # 0 表示不限制
+# 依模型覆寫預算（逗號分隔的 model=tokens），例如 "claude-3-5-haiku-20241022=20000"
+CONTEXT_TOKEN_BUDGETS = {
+    model.strip(): int(tokens)
+    for model, _, tokens in (
+        item.partition("=") for item in os.getenv("CONTEXT_TOKEN_BUDGETS", "").split(",")
+    )
+    if model.strip() and tokens.strip()
+}
+CONTEXT_PACK_CHUNK_SIZE = int(os.getenv("CONTEXT_PACK_CHUNK_SIZE", "600"))  # 打包時的段落大小（字元）
+CONTEXT_COVERAGE_DECAY = float(os.getenv("CONTEXT_COVERAGE_DECAY", "0.9"))  # 同一文件每多選一段，價值乘上此值
+
+# Claude 呼叫速率限制（app/core/rate_limiter.py）：並行上限依 429 以 AIMD 自動調整
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "4"))
+# 每分鐘額度（對應 Anthropic 帳號的 RPM / ITPM / OTPM 上限）；0 表示不限制
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_INPUT_TOKENS_PER_MINUTE = int(os.getenv("LLM_INPUT_TOKENS_PER_MINUTE", "0"))
+LLM_OUTPUT_TOKENS_PER_MINUTE = int(os.getenv("LLM_OUTPUT_TOKENS_PER_MINUTE", "0"))
+
+# LLM response cache（llm_response_cache 表；預設關閉）
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_EVICT_EVERY = int(os.getenv("LLM_CACHE_EVICT_EVERY", "100"))  # 每寫入幾筆執行一次淘汰
+
+# 大量題目分片並行生成（app/core/fanout.py）：題數超過門檻時拆成多個並行請求（預設關閉）
+# 開啟後請求數變多、各分片 prompt 與 context 不同（無法共用 prompt caching 前綴），去重也可能刪掉題目
+LLM_FANOUT_THRESHOLD = int(os.getenv("LLM_FANOUT_THRESHOLD", "0"))  # 0 表示停用，例如 12
+LLM_FANOUT_SHARD_SIZE = int(os.getenv("LLM_FANOUT_SHARD_SIZE", "6"))  # 每個分片的題數
+LLM_FANOUT_MAX_SHARDS = int(os.getenv("LLM_FANOUT_MAX_SHARDS", "8"))
+LLM_FANOUT_DEDUP_THRESHOLD = float(os.getenv("LLM_FANOUT_DEDUP_THRESHOLD", "0.7"))  # 題幹相似度（bigram Jaccard）達此值視為重複
+
+# Message Batches API 離線大量生成（app/core/message_batches.py，bulk_generate 工作）
+MESSAGE_BATCH_POLL_SECONDS = float(os.getenv("MESSAGE_BATCH_POLL_SECONDS", "30"))  # 查詢批次狀態的間隔
+MESSAGE_BATCH_MAX_REQUESTS = int(os.getenv("MESSAGE_BATCH_MAX_REQUESTS", "10000"))  # 每個批次的請求數上限
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))  # 程序內 asyncio worker 數
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", "2"))  # Excel 解析等 CPU 密集工作的 process 數；0 表示改用執行緒
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "1.0"))  # 進度寫回 DB 的最短間隔（秒）
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "600"))  # 超過此時間未更新的 running 工作視為中斷
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "60"))  # running 工作更新 updated_at 的間隔，須遠小於 JOB_STALE_SECONDS
 
 # Image questions
 IMAGES_BASE_DIR = os.getenv("IMAGES_BASE_DIR", "/app/data/images")
 QUESTION_IMAGES_DIR = os.getenv("QUESTION_IMAGES_DIR", f"{IMAGES_BASE_DIR}/questions")
 ANSWER_IMAGES_DIR = os.getenv("ANSWER_IMAGES_DIR", f"{IMAGES_BASE_DIR}/answers")
 
-if not USE_MOCK_API and not DATABASE_URL:
-    raise RuntimeError("請先在 .env 設定 DATABASE_URL，再啟動服務。")
+if VECTOR_INDEX_TYPE not in ("hnsw", "ivfflat"):
+    raise RuntimeError("VECTOR_INDEX_TYPE 只支援 hnsw 或 ivfflat。")
+
+if LLM_BACKEND not in ("anthropic", "fake"):
+    raise RuntimeError("LLM_BACKEND 只支援 anthropic 或 fake。")
+
+
+def check_required_settings() -> None:
+    """
+    啟動 API 服務前檢查必要的設定
+
+    不在 import 時檢查：CLI 匯入（--database-url）與 alembic 只需部分設定，
+    不應要求 ANTHROPIC_API_KEY。
+    """
+    if not USE_MOCK_API and not DATABASE_URL:
+        raise RuntimeError("請先在 .env 設定 DATABASE_URL，再啟動服務。")
 
-if not USE_MOCK_API and not ANTHROPIC_API_KEY:
-    raise RuntimeError("請先在 .env 設定 ANTHROPIC_API_KEY。")
\ No newline at end of file
+    if not USE_MOCK_API and not ANTHROPIC_API_KEY and LLM_BACKEND != "fake":
+        raise RuntimeError("請先在 .env 設定 ANTHROPIC_API_KEY。")
\ No newline at end of file
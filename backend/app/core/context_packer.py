@@ -0,0 +1,218 @@
+# app/core/context_packer.py
+"""
+Context 打包 — 在 token 預算內挑選要放進 prompt 的文件內容。
+
+模板生成原本把選取文件的全文直接接在一起，選多份大文件時 prompt 沒有
+上限，成本、延遲與失敗率都隨之上升。pack_documents：
+
+- 文件內容合計不超過預算時原樣回傳（prompt 與 LLM 快取 key 都不變）
+- 超過時以 SentenceChunker 切成段落，每段價值 = 相關度 × 覆蓋率：
+  相關度為段落與查詢文字（模板內容）的字元 bigram 重疊；覆蓋率讓同一
+  文件每多選一段價值乘上 CONTEXT_COVERAGE_DECAY，避免預算全被一份
+  文件佔走
+- 依「價值 / token」貪婪挑選放得下的段落（knapsack 的貪婪近似）；
+  覆蓋率只會讓價值下降，因此以 lazy greedy 搭配 heap，不需每步重算全部
+- 選中的段落依原文順序組回，不相鄰處以省略記號分隔
+
+token 數以 estimate_tokens 在本機估算，不呼叫 API。stats 回報預算、
+用量與各文件被捨棄的段落數，供回應與日誌使用。
+
+async 呼叫端使用 pack_documents_async：未超過預算時直接在 event loop
+回傳（只需估算 token），超過時才以 asyncio.to_thread 切段與挑選，
+不必把文件全文序列化給 process pool、也不會排在 Excel 解析之後。
+"""
+import asyncio
+import heapq
+import logging
+import math
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set
+
+from app.core.chunking import iter_chunks
+from app.core.config import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_TOKEN_BUDGETS,
+    CONTEXT_PACK_CHUNK_SIZE,
+    CONTEXT_COVERAGE_DECAY,
+)
+from app.core.dedup import normalize_text
+from app.core.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+GAP_MARKER = "\n……\n"
+_MIN_RELEVANCE = 0.2  # 與查詢無關的段落仍保留的基本價值，讓覆蓋率有作用
+
+
+class _Piece(NamedTuple):
+    doc: int
+    seq: int  # 在文件內的段落序號
+    start: int
+    end: int
+    tokens: int
+    relevance: float
+
+
+class ContextPack(NamedTuple):
+    contents: List[str]  # 與輸入文件同順序；整份被捨棄的文件為空字串
+    stats: Dict[str, Any]
+
+
+def context_budget(model: Optional[str] = None) -> int:
+    """指定模型的 context token 預算（CONTEXT_TOKEN_BUDGETS 覆寫，否則為 CONTEXT_TOKEN_BUDGET）"""
+    return CONTEXT_TOKEN_BUDGETS.get(model or "", CONTEXT_TOKEN_BUDGET)
+
+
+def _bigrams(text: str) -> Set[str]:
+    normalized = normalize_text(text)
+    return {normalized[i : i + 2] for i in range(len(normalized) - 1)}
+
+
+def pack_documents(
+    documents: Sequence[Dict[str, Any]],
+    budget_tokens: int,
+    query: str = "",
+    chunk_size: int = CONTEXT_PACK_CHUNK_SIZE,
+    coverage_decay: float = CONTEXT_COVERAGE_DECAY,
+) -> ContextPack:
+    """
+    在 budget_tokens 內挑選各文件的內容
+
+    Args:
+        documents: 含 "content" 的文件（可有 "id" / "title"，只用於 stats）
+        budget_tokens: 內容的 token 預算；<= 0 表示不限制
+        query: 用來計算相關度的文字（例如模板內容）；空字串表示不考慮相關度
+    """
+    unchanged = _unchanged_pack(documents, budget_tokens)
+    if unchanged is not None:
+        return unchanged
+
+    contents = [doc.get("content") or "" for doc in documents]
+    total_tokens = sum(estimate_tokens(content) for content in contents)
+    pieces = _split(contents, query, chunk_size)
+    chosen = _select(pieces, budget_tokens, coverage_decay, len(contents))
+
+    packed: List[str] = []
+    for doc_index, content in enumerate(contents):
+        parts: List[str] = []
+        previous: Optional[_Piece] = None
+        for piece in sorted((p for p in chosen if p.doc == doc_index), key=lambda p: p.seq):
+            if previous is not None:
+                # 相鄰段落保留原文中間的空白，不相鄰處加省略記號
+                parts.append(content[previous.end : piece.start] if piece.seq == previous.seq + 1 else GAP_MARKER)
+            parts.append(content[piece.start : piece.end])
+            previous = piece
+        packed.append("".join(parts))
+
+    used_tokens = sum(p.tokens for p in chosen)
+    stats = _stats(documents, budget_tokens, total_tokens, used_tokens, pieces, chosen)
+    logger.info(
+        "Context 打包：%d → %d tokens（預算 %d），捨棄 %d/%d 段",
+        total_tokens, used_tokens, budget_tokens, stats["dropped_chunks"], stats["total_chunks"],
+    )
+    return ContextPack(packed, stats)
+
+
+async def pack_documents_async(
+    documents: Sequence[Dict[str, Any]],
+    budget_tokens: int,
+    query: str = "",
+    **kwargs: Any,
+) -> ContextPack:
+    """pack_documents 的 async 版本：未超過預算時直接回傳，超過時在執行緒中打包"""
+    unchanged = _unchanged_pack(documents, budget_tokens)
+    if unchanged is not None:
+        return unchanged
+    return await asyncio.to_thread(pack_documents, documents, budget_tokens, query, **kwargs)
+
+
+# ------------------------------------------------------------------ #
+#  Internals
+# ------------------------------------------------------------------ #
+def _unchanged_pack(documents: Sequence[Dict[str, Any]], budget_tokens: int) -> Optional[ContextPack]:
+    """內容合計不超過預算時回傳原樣的 ContextPack，否則回傳 None"""
+    contents = [doc.get("content") or "" for doc in documents]
+    total_tokens = sum(estimate_tokens(content) for content in contents)
+    if budget_tokens <= 0 or total_tokens <= budget_tokens:
+        return ContextPack(contents, _stats(documents, budget_tokens, total_tokens, total_tokens, None, None))
+    return None
+
+
+def _split(
+    contents: List[str],
+    query: str,
+    chunk_size: int,
+) -> List[_Piece]:
+    query_grams = _bigrams(query)
+    raw: List[_Piece] = []
+    for doc_index, content in enumerate(contents):
+        for i, chunk in enumerate(iter_chunks(content, chunk_size, 0)):
+            if query_grams:
+                grams = _bigrams(chunk.text)
+                overlap = len(grams & query_grams)
+                relevance = overlap / math.sqrt(len(grams) * len(query_grams)) if grams else 0.0
+            else:
+                relevance = 1.0
+            tokens = max(1, estimate_tokens(chunk.text))
+            raw.append(_Piece(doc_index, i, chunk.start, chunk.end, tokens, relevance))
+
+    # 相關度正規化到 [_MIN_RELEVANCE, 1]
+    top = max((p.relevance for p in raw), default=0.0)
+    if top <= 0:
+        return [p._replace(relevance=1.0) for p in raw]
+    return [p._replace(relevance=_MIN_RELEVANCE + (1 - _MIN_RELEVANCE) * p.relevance / top) for p in raw]
+
+
+def _select(pieces: List[_Piece], budget: int, decay: float, doc_count: int) -> List[_Piece]:
+    picked_per_doc = [0] * doc_count
+    # heap 項目：(-價值密度, 段落索引, 計算時該文件已選段數)
+    heap = [(-p.relevance / p.tokens, i, 0) for i, p in enumerate(pieces)]
+    heapq.heapify(heap)
+    remaining = budget
+    chosen: List[_Piece] = []
+    while heap and remaining > 0:
+        _, i, stamp = heapq.heappop(heap)
+        piece = pieces[i]
+        if piece.tokens > remaining:
+            continue  # 剩餘預算只會變少，之後也放不下
+        picked = picked_per_doc[piece.doc]
+        if stamp != picked:
+            # 價值已過期（同文件又選了段落），重算後放回
+            heapq.heappush(heap, (-piece.relevance * decay ** picked / piece.tokens, i, picked))
+            continue
+        chosen.append(piece)
+        picked_per_doc[piece.doc] += 1
+        remaining -= piece.tokens
+    return chosen
+
+
+def _stats(
+    documents: Sequence[Dict[str, Any]],
+    budget: int,
+    total_tokens: int,
+    used_tokens: int,
+    pieces: Optional[List[_Piece]],
+    chosen: Optional[List[_Piece]],
+) -> Dict[str, Any]:
+    chosen_keys = {(p.doc, p.seq) for p in chosen or ()}
+    per_doc = []
+    for doc_index, doc in enumerate(documents):
+        entry: Dict[str, Any] = {"id": doc.get("id"), "title": doc.get("title")}
+        if pieces is None:
+            entry.update(dropped_chunks=0, dropped_tokens=0)
+        else:
+            dropped = [p for p in pieces if p.doc == doc_index and (p.doc, p.seq) not in chosen_keys]
+            entry.update(dropped_chunks=len(dropped), dropped_tokens=sum(p.tokens for p in dropped))
+        per_doc.append(entry)
+
+    total_chunks = len(pieces) if pieces is not None else 0
+    kept_chunks = len(chosen) if chosen is not None else 0
+    return {
+        "budget_tokens": budget,
+        "total_tokens": total_tokens,
+        "used_tokens": used_tokens,
+        "truncated": pieces is not None,
+        "total_chunks": total_chunks,
+        "kept_chunks": kept_chunks,
+        "dropped_chunks": total_chunks - kept_chunks,
+        "documents": per_doc,
+    }
@@ -0,0 +1,182 @@
+# app/core/dedup.py
+"""
+文件去重指紋 — 內容 hash（完全重複）與 SimHash（近似重複）。
+
+- content_hash: 正規化（NFKC、小寫、合併空白）後的 SHA-256，以 btree
+  索引做等值查詢
+- simhash: 64-bit SimHash（字元 3-gram，NumPy 向量化）
+- simhash_bands: 把 64 bit 切成 SIMHASH_BANDS 段，每段編碼為
+  ``band_index << 16 | value`` 存成整數陣列並建 GIN 索引；漢明距離
+  < SIMHASH_BANDS 的兩個指紋至少有一段完全相同（鴿籠原理），因此以
+  ``simhash_bands && :bands`` 取候選即可，不需掃描全表
+"""
+import hashlib
+import re
+import unicodedata
+from typing import Any, Dict, List
+
+import numpy as np
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+SIMHASH_MAX_DISTANCE = SIMHASH_BANDS - 1  # 保證能以 band 索引找到的最大漢明距離
+SHINGLE_SIZE = 3
+
+_BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+_PRIME = np.uint64(1099511628211)  # FNV-1a 64-bit prime
+_MIX = np.uint64(0xFF51AFD7ED558CCD)  # murmur3 fmix64 常數
+_BIT_SHIFTS = np.arange(SIMHASH_BITS, dtype=np.uint64)
+_WHITESPACE_RE = re.compile(r"\s+")
+_TOKEN_RE = re.compile(r"\S+")
+
+
+def normalize_text(text: str) -> str:
+    """NFKC、小寫並合併空白，讓排版差異不影響指紋"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip().lower()
+
+
+def content_hash(text: str) -> str:
+    """正規化內容的 SHA-256（hex）"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash（無號整數）"""
+    normalized = normalize_text(text)
+    if not normalized:
+        return 0
+    codes = _codepoints(normalized)
+    ones, windows = _shingle_bit_counts(codes, min(SHINGLE_SIZE, len(codes)))
+    return _fingerprint_from_counts(ones, windows)
+
+
+def _codepoints(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+
+
+def _shingle_bit_counts(codes: np.ndarray, n: int):
+    """回傳 (每個 bit 為 1 的 shingle 數, shingle 數)"""
+    windows = len(codes) - n + 1
+    if windows <= 0:
+        return np.zeros(SIMHASH_BITS, dtype=np.int64), 0
+    h = np.full(windows, n, dtype=np.uint64)
+    for j in range(n):
+        h = h * _PRIME + codes[j : j + windows]
+    h ^= h >> np.uint64(33)
+    h *= _MIX
+    h ^= h >> np.uint64(33)
+    bits = (h[:, None] >> _BIT_SHIFTS) & np.uint64(1)
+    return bits.sum(axis=0, dtype=np.int64), windows
+
+
+def _fingerprint_from_counts(ones: np.ndarray, windows: int) -> int:
+    """每個 bit：出現 1 的 shingle 數是否超過一半"""
+    fingerprint = 0
+    for bit in np.nonzero(ones * 2 > windows)[0]:
+        fingerprint |= 1 << int(bit)
+    return fingerprint
+
+
+def simhash_bands(fingerprint: int) -> List[int]:
+    """切成 SIMHASH_BANDS 段，每段編碼為 band_index << 16 | value"""
+    fingerprint &= (1 << SIMHASH_BITS) - 1
+    return [
+        (band << _BAND_BITS) | ((fingerprint >> (band * _BAND_BITS)) & _BAND_MASK)
+        for band in range(SIMHASH_BANDS)
+    ]
+
+
+def hamming_distance(a: int, b: int) -> int:
+    mask = (1 << SIMHASH_BITS) - 1
+    return bin((a & mask) ^ (b & mask)).count("1")
+
+
+def to_signed64(value: int) -> int:
+    """無號 64-bit 轉成 Postgres BIGINT 可存的有號整數"""
+    return value - (1 << SIMHASH_BITS) if value >= 1 << (SIMHASH_BITS - 1) else value
+
+
+def document_fingerprint(text: str) -> Dict[str, Any]:
+    """回傳可直接寫入 Document 的 content_hash / simhash / simhash_bands"""
+    fingerprint = simhash(text)
+    return {
+        "content_hash": content_hash(text),
+        "simhash": to_signed64(fingerprint),
+        "simhash_bands": simhash_bands(fingerprint),
+    }
+
+
+class IncrementalFingerprint:
+    """
+    分段計算 document_fingerprint（結果與一次處理整段文字相同）
+
+    文字在最後一個空白處切開才做正規化，空白的合併與 SimHash 的 shingle
+    都跨段延續；只保留尚未遇到空白的尾端，記憶體與總長度無關。
+    """
+
+    def __init__(self):
+        self._sha = hashlib.sha256()
+        self._tail = ""  # 尚未正規化的原始文字（不含空白結尾）
+        self._pending_space = False
+        self._started = False
+        self._carry = np.zeros(0, dtype=np.uint64)  # 最後 SHINGLE_SIZE - 1 個 code point
+        self._ones = np.zeros(SIMHASH_BITS, dtype=np.int64)
+        self._windows = 0
+
+    def feed(self, text: str) -> None:
+        if not text:
+            return
+        buffer = self._tail + text
+        cut = _last_whitespace_end(buffer)
+        if cut == 0:
+            self._tail = buffer
+            return
+        self._tail = buffer[cut:]
+        self._emit(buffer[:cut])
+
+    def result(self) -> Dict[str, Any]:
+        self._emit(self._tail)
+        self._tail = ""
+        if self._windows == 0 and len(self._carry):
+            # 全文不足一個 shingle：以整段為單一 shingle（與 simhash() 相同）
+            self._ones, self._windows = _shingle_bit_counts(self._carry, len(self._carry))
+        fingerprint = _fingerprint_from_counts(self._ones, self._windows)
+        return {
+            "content_hash": self._sha.hexdigest(),
+            "simhash": to_signed64(fingerprint),
+            "simhash_bands": simhash_bands(fingerprint),
+        }
+
+    def _emit(self, raw: str) -> None:
+        normalized = unicodedata.normalize("NFKC", raw)
+        pieces: List[str] = []
+        end = 0
+        for match in _TOKEN_RE.finditer(normalized):
+            # 與前一個 token 之間有空白（包含上一段結尾的空白）時補一個空格
+            if self._started and (self._pending_space or match.start() > end):
+                pieces.append(" ")
+            pieces.append(match.group().lower())
+            self._started = True
+            self._pending_space = False
+            end = match.end()
+        if end < len(normalized):
+            self._pending_space = True
+        if not pieces:
+            return
+
+        out = "".join(pieces)
+        self._sha.update(out.encode("utf-8"))
+        codes = np.concatenate((self._carry, _codepoints(out)))
+        ones, windows = _shingle_bit_counts(codes, SHINGLE_SIZE)
+        self._ones += ones
+        self._windows += windows
+        self._carry = codes[-(SHINGLE_SIZE - 1):]
+
+
+def _last_whitespace_end(text: str) -> int:
+    """最後一段空白結束的位置（沒有空白時回傳 0）"""
+    for i in range(len(text) - 1, -1, -1):
+        if text[i].isspace():
+            return i + 1
+    return 0
@@ -1,21 +1,269 @@
 # app/core/embeddings.py
-from app.core.config import USE_MOCK_API, ANTHROPIC_API_KEY
-
-if not USE_MOCK_API:
-    # 真實模式：使用 Claude 進行文本嵌入（實際上 Claude 不提供嵌入服務，所以使用 Mock）
-    # 注意：Anthropic 不提供嵌入服務，這裡實際返回 Mock 數據
-    async def create_embedding(text: str) -> list[float]:
-        # Claude 沒有嵌入服務，使用固定向量或其他嵌入服務
-        # 為了簡化，這裡返回基於文本長度的簡單向量
-        import hashlib
-        text_hash = hashlib.md5(text.encode()).hexdigest()
-        # 生成一個基於哈希的 1536 維向量
-        embedding = []
-        for i in range(1536):
-            embedding.append(float(int(text_hash[i % len(text_hash)], 16) / 15.0 - 0.5))
-        return embedding
-
-else:
-    # Mock 模式：回傳固定零向量（長度對應 1536）
-    async def create_embedding(text: str) -> list[float]:
-        return [0.0] * 1536
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    USE_MOCK_API,
+    EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_THREAD_MIN_CHARS,
+    QUERY_EMBEDDING_CACHE_SIZE,
+)
+
+# embeddings.vector 欄位維度（Vector(1536)）
+EMBEDDING_DIMENSION = 1536
+
+
+# ---------------------------------------------------------------------- #
+#  Embedding backends
+# ---------------------------------------------------------------------- #
+class EmbeddingBackend:
+    """
+    嵌入後端介面
+
+    子類別實作 ``embed_batch``（同步、一次處理一批文字，回傳
+    shape = (len(texts), dimension) 的 float32 陣列）。需要網路的後端可改寫
+    ``embed`` 以非同步方式呼叫外部服務。
+
+    ``embed`` 在總字元數達 EMBEDDING_THREAD_MIN_CHARS 時以 asyncio.to_thread
+    執行 embed_batch（NumPy 運算大多會釋放 GIL）；短查詢直接計算，省去
+    切換執行緒的成本。
+    """
+
+    model_name: str = ""
+    dimension: int = EMBEDDING_DIMENSION
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def _embed_list(self, texts: Sequence[str]) -> List[List[float]]:
+        return self.embed_batch(texts).tolist()
+
+    async def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        if sum(len(t) for t in texts) >= EMBEDDING_THREAD_MIN_CHARS:
+            return await asyncio.to_thread(self._embed_list, texts)
+        return self._embed_list(texts)
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    本地字元 n-gram hashing vectorizer（不需網路）
+
+    將整批文字串接成一個 Unicode code point 陣列，以 NumPy 一次算出所有
+    n-gram 的雜湊值，再用 bincount 累加到 (文字, 維度) 桶中並做 L2 正規化。
+    中文以單字與雙字詞為主要特徵，英文則由 3-gram 捕捉字根。
+    """
+
+    _PRIME = np.uint64(1099511628211)  # FNV-1a 64-bit prime
+    _MIX = np.uint64(0xFF51AFD7ED558CCD)  # murmur3 fmix64 常數
+
+    def __init__(self, dimension: int = EMBEDDING_DIMENSION, ngram_range: Tuple[int, int] = (1, 3)):
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+        self.model_name = f"hashing-char{ngram_range[0]}{ngram_range[1]}-{dimension}"
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        count = len(texts)
+        if count == 0:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        # 以 \0 分隔各段文字；n-gram 不可跨越分隔符
+        joined = "\0".join(t.replace("\0", " ").lower() for t in texts)
+        codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        is_sep = codes == 0
+        sep_prefix = np.concatenate(([0], np.cumsum(is_sep)))
+        row_of_pos = sep_prefix[:-1]
+
+        rows_parts = []
+        buckets_parts = []
+        signs_parts = []
+        length = len(codes)
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            windows = length - n + 1
+            if windows <= 0:
+                continue
+            h = np.full(windows, n, dtype=np.uint64)
+            for j in range(n):
+                h = h * self._PRIME + codes[j : j + windows]
+            h ^= h >> np.uint64(33)
+            h *= self._MIX
+            h ^= h >> np.uint64(33)
+
+            valid = (sep_prefix[n : n + windows] - sep_prefix[:windows]) == 0
+            h = h[valid]
+            rows_parts.append(row_of_pos[:windows][valid])
+            buckets_parts.append((h % np.uint64(self.dimension)).astype(np.int64))
+            signs_parts.append(np.where(h >> np.uint64(63), 1.0, -1.0))
+
+        if rows_parts:
+            rows = np.concatenate(rows_parts).astype(np.int64)
+            flat_index = rows * self.dimension + np.concatenate(buckets_parts)
+            matrix = np.bincount(
+                flat_index,
+                weights=np.concatenate(signs_parts),
+                minlength=count * self.dimension,
+            ).reshape(count, self.dimension)
+        else:
+            matrix = np.zeros((count, self.dimension), dtype=np.float64)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        # 空字串沒有任何 n-gram；零向量的餘弦距離為 NaN，改用固定的單位向量
+        matrix[norms[:, 0] == 0, 0] = 1.0
+        return matrix.astype(np.float32)
+
+
+class Md5EmbeddingBackend(EmbeddingBackend):
+    """舊版 MD5 雜湊向量（與既有資料相容用，不具語意）"""
+
+    model_name = "md5-hash-1536"
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        digests = b"".join(hashlib.md5(t.encode()).hexdigest().encode() for t in texts)
+        hex_chars = np.frombuffer(digests, dtype=np.uint8).reshape(len(texts), 32)
+        # '0'-'9' -> 0-9, 'a'-'f' -> 10-15
+        nibbles = np.where(hex_chars >= ord("a"), hex_chars - ord("a") + 10, hex_chars - ord("0"))
+        values = nibbles.astype(np.float32) / 15.0 - 0.5
+        return np.tile(values, (1, self.dimension // 32))
+
+
+class ZeroEmbeddingBackend(EmbeddingBackend):
+    """Mock 模式：回傳固定零向量"""
+
+    model_name = "mock-zero-1536"
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        return np.zeros((len(texts), self.dimension), dtype=np.float32)
+
+
+_BACKENDS: Dict[str, Callable[[], EmbeddingBackend]] = {
+    "hashing": HashingEmbeddingBackend,
+    "md5": Md5EmbeddingBackend,
+    "zero": ZeroEmbeddingBackend,
+}
+
+if EMBEDDING_BACKEND not in _BACKENDS:
+    raise RuntimeError(f"EMBEDDING_BACKEND 只支援: {', '.join(_BACKENDS)}")
+
+_backend: EmbeddingBackend = _BACKENDS["zero" if USE_MOCK_API else EMBEDDING_BACKEND]()
+
+
+def get_embedding_backend() -> EmbeddingBackend:
+    return _backend
+
+
+def set_embedding_backend(backend: EmbeddingBackend) -> None:
+    """替換目前使用的嵌入後端（例如接上外部嵌入服務）"""
+    global _backend
+    _backend = backend
+
+
+async def create_embeddings(
+    texts: Sequence[str],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+) -> List[List[float]]:
+    """批次生成向量，每 batch_size 筆呼叫一次後端"""
+    backend = get_embedding_backend()
+    vectors: List[List[float]] = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(await backend.embed(texts[start : start + batch_size]))
+    return vectors
+
+
+async def create_embedding(text: str) -> list[float]:
+    return (await create_embeddings([text]))[0]
+
+
+class QueryEmbeddingCache:
+    """
+    查詢向量的 LRU 快取（以 (model, text) 為 key）
+
+    - 超過 maxsize 時淘汰最久未使用的項目
+    - 同一個 key 的並行 miss 只會呼叫一次 factory（single-flight），
+      其他呼叫者等待同一個結果
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, ...]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def get_or_create(
+        self,
+        model: str,
+        text: str,
+        factory: Callable[[str], Awaitable[list[float]]],
+    ) -> list[float]:
+        key = (model, text)
+
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(cached)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            # 已有相同查詢正在計算，等待它的結果
+            self.coalesced += 1
+            return list(await asyncio.shield(inflight))
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            vector = tuple(await factory(text))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # 標記為已讀取，避免沒有等待者時出現警告
+            raise
+        else:
+            future.set_result(vector)
+            self._store(key, vector)
+            return list(vector)
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key: Hashable, vector: Tuple[float, ...]) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = self.coalesced = 0
+
+
+query_embedding_cache = QueryEmbeddingCache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+
+
+async def create_query_embedding(text: str) -> list[float]:
+    """取得查詢文字的向量（經過 LRU 快取，適用於重複出現的檢索查詢）"""
+    return await query_embedding_cache.get_or_create(
+        get_embedding_backend().model_name, text, create_embedding
+    )
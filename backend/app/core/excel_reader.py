@@ -0,0 +1,155 @@
+# app/core/excel_reader.py
+"""
+串流 Excel 讀取器 — 供文件匯入與圖片題目匯入共用。
+
+.xlsx 以 openpyxl read_only 模式逐列讀取（不建 DataFrame，記憶體與列數
+無關）；每列以 ExcelRecord 產生，欄位值統一轉成 Optional[str]：
+
+- 空儲存格為 None
+- 整數值的浮點數（Excel 常把 12 存成 12.0）轉成 "12"
+- 整列皆空的列直接略過
+
+無法處理的列記在 reader.errors，不會中斷整份檔案。
+舊版 .xls 交給 pandas（需要 xlrd），讀入後同樣轉成 ExcelRecord。
+"""
+import io
+import logging
+import zipfile
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Union
+
+from openpyxl import load_workbook
+
+logger = logging.getLogger(__name__)
+
+
+class ExcelRecord(NamedTuple):
+    """一列資料；row_number 為 Excel 行號（標題列為第 1 行）"""
+    row_number: int
+    values: Dict[str, Optional[str]]
+
+    def get(self, column: str, default: Optional[str] = None) -> Optional[str]:
+        value = self.values.get(column)
+        return default if value is None else value
+
+    def text(self, column: str) -> Optional[str]:
+        """去除前後空白的欄位值；空白或缺欄位時回傳 None"""
+        value = self.values.get(column)
+        if value is None:
+            return None
+        return value.strip() or None
+
+
+class RowError(NamedTuple):
+    row_number: int
+    message: str
+
+
+def cell_to_text(value: Any) -> Optional[str]:
+    """把儲存格值轉成字串；空值回傳 None"""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return None
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+class ExcelReader:
+    """
+    逐列讀取工作表第一頁
+
+    Args:
+        source: 檔案內容（bytes）或二進位檔案物件
+        filename: 檔名（用來判斷 .xls）
+        column_aliases: 欄位名稱對照（比對前先套用 normalize）
+        lowercase_columns: 欄位名稱是否轉小寫比對
+    """
+
+    def __init__(
+        self,
+        source: Union[bytes, BinaryIO],
+        filename: str = "",
+        column_aliases: Optional[Dict[str, str]] = None,
+        lowercase_columns: bool = False,
+    ):
+        self._stream = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+        self._legacy = filename.lower().endswith(".xls")
+        self._aliases = column_aliases or {}
+        self._lowercase = lowercase_columns
+        self._workbook = None
+        self._rows: Iterator[Sequence[Any]] = iter(())
+        self.columns: List[Optional[str]] = []
+        self.errors: List[RowError] = []
+        self._open()
+
+    # ------------------------------------------------------------------ #
+    #  Public API
+    # ------------------------------------------------------------------ #
+    def require(self, columns: Iterable[str], message: str = "Excel 文件缺少必要欄位") -> None:
+        """檢查必要欄位，缺少時拋出 ValueError"""
+        missing = [col for col in columns if col not in self.columns]
+        if missing:
+            raise ValueError(f"{message}: {', '.join(missing)}")
+
+    def __iter__(self) -> Iterator[ExcelRecord]:
+        indexed = [(i, name) for i, name in enumerate(self.columns) if name]
+        for row_number, row in enumerate(self._rows, start=2):
+            try:
+                values = {
+                    name: cell_to_text(row[i]) if i < len(row) else None
+                    for i, name in indexed
+                }
+            except Exception as e:
+                self.errors.append(RowError(row_number, f"無法讀取: {e}"))
+                continue
+            if all(v is None or not v.strip() for v in values.values()):
+                continue
+            yield ExcelRecord(row_number, values)
+
+    def close(self) -> None:
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+
+    def __enter__(self) -> "ExcelReader":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------ #
+    #  Internals
+    # ------------------------------------------------------------------ #
+    def _open(self) -> None:
+        if self._legacy:
+            rows = self._read_legacy_rows()
+        else:
+            try:
+                self._workbook = load_workbook(self._stream, read_only=True, data_only=True)
+            except (zipfile.BadZipFile, KeyError, OSError) as e:
+                raise ValueError(f"無法讀取 Excel 文件: {e}") from e
+            rows = self._workbook.active.iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("Excel 文件為空")
+        self.columns = [self._normalize_column(name) for name in header]
+        self._rows = rows
+
+    def _normalize_column(self, name: Any) -> Optional[str]:
+        if name is None:
+            return None
+        name = str(name).strip()
+        if self._lowercase:
+            name = name.lower()
+        return self._aliases.get(name, name)
+
+    def _read_legacy_rows(self) -> Iterator[Sequence[Any]]:
+        import pandas as pd
+
+        df = pd.read_excel(self._stream, header=None, dtype=object)
+        df = df.astype(object).where(df.notna(), None)
+        logger.info("以 pandas 讀取舊版 .xls（%d 列）", len(df))
+        return iter(df.itertuples(index=False, name=None))
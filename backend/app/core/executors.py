@@ -0,0 +1,52 @@
+# app/core/executors.py
+"""
+CPU 密集工作的執行器 — 避免阻塞 uvicorn 的 event loop。
+
+CPU_POOL_WORKERS > 0 時使用共用的 ProcessPoolExecutor（函式與參數必須可
+pickle，也就是模組層級函式）；否則退回預設的執行緒池。
+
+子程序以 spawn 啟動：uvicorn 程序內已有 event loop 與執行緒，fork 可能
+複製到被鎖住的鎖。子程序第一次使用時匯入模組，之後重複使用。
+"""
+import asyncio
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from app.core.config import CPU_POOL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """取得共用的 process pool（未啟用時回傳 None）"""
+    global _process_pool
+    if CPU_POOL_WORKERS <= 0:
+        return None
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=CPU_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info("啟動 process pool（%d workers）", CPU_POOL_WORKERS)
+    return _process_pool
+
+
+async def run_cpu_bound(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """在 process pool（或執行緒池）執行同步函式並等待結果"""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(fn, *args, **kwargs)
+    return await loop.run_in_executor(get_process_pool(), call)
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
@@ -0,0 +1,419 @@
+# app/core/fake_llm.py
+"""
+決定性的假 LLM 後端 — 離線壓測用（LLM_BACKEND=fake）。
+
+USE_MOCK_API 會換成整組 mock router，繞過 GenerateService、檢索與 DB，
+壓測量不到真正的程式路徑。FakeLLMServer 改在 HTTP 層替換 Claude：
+以 httpx.MockTransport 實作 ``POST /v1/messages``（含 SSE 串流），接在
+真正的 AsyncAnthropic client 後面，因此 _call_claude / _stream_claude 的
+限流、重試、prompt cache 統計、JSON 解析與驗證都照常執行：
+
+- 回應內容：依 prompt 要求的題數與題型（QuestionType）產生題目 JSON，
+  題幹取用 prompt 中教材的詞語；同一個 prompt 永遠得到相同內容
+- 延遲：首個 token 延遲為對數常態分佈（中位數 FAKE_LLM_LATENCY_MS、
+  FAKE_LLM_LATENCY_SIGMA），之後依 FAKE_LLM_TOKENS_PER_SECOND 輸出
+- 錯誤注入：依比例回傳 429（帶 retry-after）、500 / 529，以及格式損壞
+  的輸出（截斷、缺逗號、沒有 JSON 的說明文字）
+- usage：以 estimate_tokens 估算；帶快取斷點的前綴第一次計為
+  cache_creation，之後計為 cache_read
+
+每個請求的隨機數由 FAKE_LLM_SEED、請求內容與該內容第幾次出現決定，
+與並行順序無關；重送同一個請求會重新抽選，不會永遠落在同一個錯誤上。
+出現次數與已快取的前綴各只記住最近 FAKE_LLM_MAX_TRACKED 個（LRU），
+長時間壓測時記憶體不會無限成長；被淘汰的請求視為第一次出現。
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+import httpx
+
+from app.core.config import (
+    FAKE_LLM_SEED,
+    FAKE_LLM_LATENCY_MS,
+    FAKE_LLM_LATENCY_SIGMA,
+    FAKE_LLM_TOKENS_PER_SECOND,
+    FAKE_LLM_RATE_LIMIT_RATE,
+    FAKE_LLM_SERVER_ERROR_RATE,
+    FAKE_LLM_MALFORMED_RATE,
+    FAKE_LLM_RETRY_AFTER_SECONDS,
+    FAKE_LLM_MAX_TRACKED,
+)
+from app.core.tokens import estimate_tokens
+from app.schemas.question import QuestionType
+
+_COUNT_RES = (
+    re.compile(r"請(?:生成|製作)\s*(\d+)\s*道"),
+    re.compile(r"exactly (\d+) questions"),
+)
+_MAX_COUNT = 100
+_TERM_RE = re.compile(r"[一-鿿]{2,}|[A-Za-z][A-Za-z\-]{3,}")
+_FALLBACK_TERMS = ["課程概念", "基本原理", "重要名詞", "應用情境", "歷史背景", "實驗步驟"]
+_STREAM_CHUNK_CHARS = 40
+
+# 依 prompt 關鍵字判斷要求的題型；對應 llm_client 的 _TYPE_HINTS 與 _type_prompt
+_TYPE_KEYWORDS = [
+    (QuestionType.MATCHING, ("question_data", "配對", "matching", "連連看")),
+    (QuestionType.TRUE_FALSE, ("true/false", "是非", "對錯")),
+    (QuestionType.SEQUENCE, ("in sequence", "排序題")),
+    (QuestionType.ENUMERATION, ("list items", "列舉題")),
+    (QuestionType.SYMBOL_IDENTIFICATION, ("symbol recognition", "符號辨識")),
+    (QuestionType.CLOZE, ("fill-in-the-blank", "填空", "完形")),
+    (QuestionType.SHORT_ANSWER, ("short written", "簡答")),
+    (QuestionType.SINGLE_CHOICE, ("multiple choice", "選擇題", "4個選項")),
+]
+_MIXED_KEYWORDS = ("variety of question types", "混合題型")
+_MIXED_TYPES = [
+    QuestionType.SINGLE_CHOICE,
+    QuestionType.CLOZE,
+    QuestionType.SHORT_ANSWER,
+    QuestionType.TRUE_FALSE,
+    QuestionType.MATCHING,
+]
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def _blocks(params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """system 與第一則 user 訊息的 text 區塊（字串內容視為單一區塊）"""
+    blocks: List[Dict[str, Any]] = []
+    for source in (params.get("system"), (params.get("messages") or [{}])[0].get("content")):
+        if isinstance(source, str):
+            blocks.append({"type": "text", "text": source})
+        elif source:
+            blocks.extend(block for block in source if block.get("type") == "text")
+    return blocks
+
+
+def _requested_count(prompt: str) -> int:
+    for pattern in _COUNT_RES:
+        match = pattern.search(prompt)
+        if match:
+            return max(1, min(_MAX_COUNT, int(match.group(1))))
+    return 3
+
+
+def _requested_types(prompt: str) -> List[QuestionType]:
+    lower = prompt.lower()
+    if any(kw in lower for kw in _MIXED_KEYWORDS):
+        return list(_MIXED_TYPES)
+    detected = [qt for qt, keywords in _TYPE_KEYWORDS if any(kw in lower for kw in keywords)]
+    return detected or [QuestionType.SINGLE_CHOICE]
+
+
+def _terms(text: str, rng: random.Random) -> List[str]:
+    """從教材文字取出候選詞語（中文取 2～4 字的片段，英文取單字），打亂順序"""
+    terms: Set[str] = set()
+    for match in _TERM_RE.finditer(text):
+        word = match.group()
+        if word.isascii():
+            terms.add(word.lower())
+        else:
+            terms.update(word[i : i + 4] for i in range(0, max(1, len(word) - 1), 3))
+    ordered = sorted(t for t in terms if len(t) >= 2)
+    rng.shuffle(ordered)
+    return ordered or list(_FALLBACK_TERMS)
+
+
+# ---- 各題型的題目 ---- #
+def _single_choice(t: List[str], rng: random.Random) -> Dict[str, Any]:
+    answer = rng.randrange(4)
+    options = [f"{'ABCD'[i]}. {t[(i + 1) % len(t)] if i != answer else t[0]}相關的敘述" for i in range(4)]
+    return {
+        "prompt": rng.choice(
+            [f"關於「{t[0]}」，下列敘述何者正確？", f"下列何者最能說明「{t[0]}」與「{t[1]}」的關係？"]
+        ),
+        "options": options,
+        "answer": "ABCD"[answer],
+        "explanation": f"教材中說明了「{t[0]}」的內容，因此選 {'ABCD'[answer]}。",
+    }
+
+
+def _cloze(t: List[str], rng: random.Random) -> Dict[str, Any]:
+    return {
+        "prompt": f"根據教材，______ 與「{t[1]}」密切相關，常在討論「{t[2]}」時一併提到。",
+        "answer": t[0],
+        "explanation": f"教材將「{t[0]}」與「{t[1]}」放在同一段落說明。",
+    }
+
+
+def _short_answer(t: List[str], rng: random.Random) -> Dict[str, Any]:
+    return {
+        "prompt": rng.choice([f"請簡要說明「{t[0]}」的意義。", f"請說明「{t[0]}」如何影響「{t[1]}」。"]),
+        "answer": f"「{t[0]}」是本單元的重點之一，與「{t[1]}」有直接關聯。",
+        "explanation": f"回答需提到「{t[0]}」的定義以及與「{t[1]}」的關係。",
+    }
+
+
+def _true_false(t: List[str], rng: random.Random) -> Dict[str, Any]:
+    answer = rng.random() < 0.5
+    return {
+        "prompt": f"「{t[0]}」與「{t[1]}」{'屬於' if answer else '不屬於'}同一個主題。",
+        "answer": "true" if answer else "false",
+        "explanation": f"依教材內容，「{t[0]}」與「{t[1]}」{'屬於' if answer else '不屬於'}同一主題。",
+    }
+
+
+def _matching(t: List[str], rng: random.Random) -> Dict[str, Any]:
+    size = min(len(t), rng.randint(3, 4))
+    left = t[:size]
+    order = list(range(size))
+    rng.shuffle(order)
+    right = [f"與「{left[i]}」有關的說明" for i in order]
+    pairs = ", ".join(f"{left[i]}-{order.index(i) + 1}" for i in range(size))
+    return {
+        "prompt": f"請將下列與「{t[-1]}」相關的概念與說明配對。",
+        "question_data": {"left_items": left, "right_items": right},
+        "answer": pairs,
+        "explanation": "依教材中各概念的定義配對。",
+    }
+
+
+def _sequence(t: List[str], rng: random.Random) -> Dict[str, Any]:
+    ordered = t[:4]
+    items = ordered[:]
+    rng.shuffle(items)
+    return {
+        "prompt": f"請依教材中的先後順序排列下列與「{t[-1]}」相關的項目。",
+        "items": items,
+        "answer": ordered,
+        "explanation": "教材依此順序介紹各項目。",
+    }
+
+
+def _enumeration(t: List[str], rng: random.Random) -> Dict[str, Any]:
+    size = min(len(t) - 1, 3)
+    return {
+        "prompt": f"請列出 {size} 個與「{t[0]}」相關的概念。",
+        "answer": t[1 : 1 + size],
+        "explanation": f"教材中與「{t[0]}」一起出現的概念。",
+    }
+
+
+def _symbol_identification(t: List[str], rng: random.Random) -> Dict[str, Any]:
+    symbols = ["△", "○", "□", "☆"]
+    answer = rng.randrange(len(symbols))
+    return {
+        "prompt": f"下列哪一個符號代表「{t[0]}」？",
+        "symbols": symbols,
+        "answer": f"{symbols[answer]}：{t[0]}",
+        "explanation": f"教材以 {symbols[answer]} 表示「{t[0]}」。",
+    }
+
+
+_BUILDERS: Dict[QuestionType, Callable[[List[str], random.Random], Dict[str, Any]]] = {
+    QuestionType.SINGLE_CHOICE: _single_choice,
+    QuestionType.CLOZE: _cloze,
+    QuestionType.SHORT_ANSWER: _short_answer,
+    QuestionType.TRUE_FALSE: _true_false,
+    QuestionType.MATCHING: _matching,
+    QuestionType.SEQUENCE: _sequence,
+    QuestionType.ENUMERATION: _enumeration,
+    QuestionType.SYMBOL_IDENTIFICATION: _symbol_identification,
+}
+
+
+def _malform(text: str, rng: random.Random) -> str:
+    """產生模型偶爾會回的壞格式"""
+    kind = rng.choice(("truncated", "missing_comma", "prose"))
+    if kind == "truncated":
+        return text[: max(1, int(len(text) * rng.uniform(0.3, 0.9)))]
+    if kind == "missing_comma":
+        # respond() 輸出 indent=2 的 JSON，欄位之間以 ",\n" 分隔；拿掉第一個逗號
+        return text.replace(",\n", "\n", 1)
+    return "抱歉，教材內容不足以產生指定數量的題目，請提供更多資料後再試一次。"
+
+
+class FakeLLMServer:
+    def __init__(
+        self,
+        seed: int = FAKE_LLM_SEED,
+        latency_ms: float = FAKE_LLM_LATENCY_MS,
+        latency_sigma: float = FAKE_LLM_LATENCY_SIGMA,
+        tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND,
+        rate_limit_rate: float = FAKE_LLM_RATE_LIMIT_RATE,
+        server_error_rate: float = FAKE_LLM_SERVER_ERROR_RATE,
+        malformed_rate: float = FAKE_LLM_MALFORMED_RATE,
+        retry_after: float = FAKE_LLM_RETRY_AFTER_SECONDS,
+        max_tracked: int = FAKE_LLM_MAX_TRACKED,
+    ):
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.malformed_rate = malformed_rate
+        self.retry_after = retry_after
+        self.transport = httpx.MockTransport(self.handle)
+        self.max_tracked = max_tracked
+        self._seen: "OrderedDict[str, int]" = OrderedDict()  # 請求內容 digest → 出現次數
+        self._cached_prefixes: "OrderedDict[str, None]" = OrderedDict()
+        self.counters = {"requests": 0, "rate_limited": 0, "server_errors": 0, "malformed": 0}
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "POST" or request.url.path.rstrip("/") != "/v1/messages":
+            return self._error(404, "not_found_error", "unknown path")
+        params = json.loads(request.content)
+        rng = self._request_rng(request.content)
+        self.counters["requests"] += 1
+
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            self.counters["rate_limited"] += 1
+            return self._error(
+                429, "rate_limit_error", "fake rate limit",
+                headers={"retry-after": str(self.retry_after)},
+            )
+        if roll < self.rate_limit_rate + self.server_error_rate:
+            self.counters["server_errors"] += 1
+            status = rng.choice((500, 529))
+            return self._error(status, "api_error" if status == 500 else "overloaded_error", "fake server error")
+
+        text = self.respond(params)
+        stop_reason = "end_turn"
+        if rng.random() < self.malformed_rate:
+            self.counters["malformed"] += 1
+            text = _malform(text, rng)
+            stop_reason = "max_tokens" if not text.endswith(("]", "}", "。")) else "end_turn"
+        usage = self._usage(params, text)
+        first_token = self._first_token_delay(rng)
+        duration = usage["output_tokens"] / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+        message = self._message(params, text, usage, stop_reason)
+        if params.get("stream"):
+            return httpx.Response(
+                200,
+                headers={"content-type": "text/event-stream"},
+                content=self._sse(message, first_token, duration),
+            )
+        await asyncio.sleep(first_token + duration)
+        return httpx.Response(200, json=message)
+
+    def respond(self, params: Dict[str, Any]) -> str:
+        """依請求產生題目 JSON（同樣的 prompt 永遠得到同樣的內容）；也可作為 FakeMessageBatchServer 的 responder"""
+        blocks = _blocks(params)
+        prompt = "\n\n".join(block.get("text", "") for block in blocks)
+        rng = random.Random(_digest(self.seed, prompt))
+        # 題目取材自 user 訊息的第一個區塊（模板與教材），不含出題指示
+        user_blocks = (params.get("messages") or [{}])[0].get("content")
+        material = user_blocks if isinstance(user_blocks, str) else (user_blocks or [{}])[0].get("text", "")
+        terms = _terms(material or prompt, rng)
+        types = _requested_types(prompt)
+
+        questions = []
+        for i in range(_requested_count(prompt)):
+            qtype = types[i % len(types)]
+            offset = (i * 3) % len(terms)
+            picked = (terms[offset:] + terms[:offset] + _FALLBACK_TERMS)[:6]
+            question = _BUILDERS[qtype](picked, rng)
+            if len(types) > 1:
+                question = {"type": qtype.value, **question}
+            questions.append(question)
+        return json.dumps(questions, ensure_ascii=False, indent=2)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters)
+
+    # ------------------------------------------------------------------ #
+    #  Internals
+    # ------------------------------------------------------------------ #
+    def _request_rng(self, body: bytes) -> random.Random:
+        key = hashlib.sha256(body).hexdigest()
+        occurrence = self._seen.get(key, 0)
+        self._remember(self._seen, key, occurrence + 1)
+        return random.Random(_digest(self.seed, key, occurrence))
+
+    def _remember(self, entries: "OrderedDict[str, Any]", key: str, value: Any = None) -> None:
+        """寫入 LRU：移到最新位置，超過 max_tracked 時淘汰最久未使用的項目"""
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > max(1, self.max_tracked):
+            entries.popitem(last=False)
+
+    def _first_token_delay(self, rng: random.Random) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        if self.latency_sigma <= 0:
+            return self.latency_ms / 1000
+        return rng.lognormvariate(0.0, self.latency_sigma) * self.latency_ms / 1000
+
+    def _usage(self, params: Dict[str, Any], text: str) -> Dict[str, int]:
+        blocks = _blocks(params)
+        total = estimate_tokens("\n\n".join(block.get("text", "") for block in blocks))
+        read = created = 0
+        breakpoint_at = max((i for i, block in enumerate(blocks) if "cache_control" in block), default=-1)
+        if breakpoint_at >= 0:
+            prefix = "\n\n".join(block.get("text", "") for block in blocks[: breakpoint_at + 1])
+            key = _digest(params.get("model"), prefix)
+            if key in self._cached_prefixes:
+                read = estimate_tokens(prefix)
+            else:
+                created = estimate_tokens(prefix)
+            self._remember(self._cached_prefixes, key)
+        return {
+            "input_tokens": max(0, total - read - created),
+            "output_tokens": max(1, estimate_tokens(text)),
+            "cache_read_input_tokens": read,
+            "cache_creation_input_tokens": created,
+        }
+
+    def _message(self, params: Dict[str, Any], text: str, usage: Dict[str, int], stop_reason: str) -> Dict[str, Any]:
+        return {
+            "id": f"msg_fake_{_digest(text)[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": params.get("model"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": usage,
+        }
+
+    async def _sse(self, message: Dict[str, Any], first_token: float, duration: float) -> AsyncIterator[bytes]:
+        """依輸出速度分段送出 SSE 事件"""
+        text = message["content"][0]["text"]
+        usage = message["usage"]
+
+        def event(name: str, data: Dict[str, Any]) -> bytes:
+            return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        await asyncio.sleep(first_token)
+        yield event("message_start", {
+            "type": "message_start",
+            "message": {**message, "content": [], "stop_reason": None, "usage": {**usage, "output_tokens": 1}},
+        })
+        yield event("content_block_start", {
+            "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""},
+        })
+        for start in range(0, len(text), _STREAM_CHUNK_CHARS):
+            chunk = text[start : start + _STREAM_CHUNK_CHARS]
+            if duration > 0:
+                await asyncio.sleep(duration * len(chunk) / len(text))
+            yield event("content_block_delta", {
+                "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": chunk},
+            })
+        yield event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        yield event("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+            "usage": {"output_tokens": usage["output_tokens"]},
+        })
+        yield event("message_stop", {"type": "message_stop"})
+
+    @staticmethod
+    def _error(
+        status: int, error_type: str, message: str, headers: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        return httpx.Response(
+            status, json={"type": "error", "error": {"type": error_type, "message": message}}, headers=headers
+        )
+
+
+fake_llm_server = FakeLLMServer()
@@ -0,0 +1,186 @@
+# app/core/fake_message_batches.py
+"""
+Message Batches API 的本機替身 — 搭配 MessageBatchClient(transport=...) 使用。
+
+FakeMessageBatchServer 以 httpx.MockTransport 實作 create / retrieve /
+cancel / results 四個端點，不需要網路：
+
+- 建立後的批次在被查詢 polls_until_ended 次之後結束
+- 每個請求的回應文字由 responder(params) 產生；預設依 prompt 中要求的
+  題數回傳單選題 JSON
+- custom_id 在 error_ids 中的請求回傳 errored 結果；批次結束前被取消的
+  請求回傳 canceled
+"""
+import itertools
+import json
+import re
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List
+
+import httpx
+
+from app.core.message_batches import DEFAULT_BASE_URL
+
+_COUNT_RES = (re.compile(r"請生成\s*(\d+)\s*道"), re.compile(r"exactly (\d+) questions"))
+_ids = itertools.count(1)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _prompt_text(params: Dict[str, Any]) -> str:
+    parts: List[str] = []
+    for message in params.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content or [])
+    return "\n".join(parts)
+
+
+def default_responder(params: Dict[str, Any]) -> str:
+    """依 prompt 要求的題數回傳單選題 JSON"""
+    prompt = _prompt_text(params)
+    count = 3
+    for pattern in _COUNT_RES:
+        match = pattern.search(prompt)
+        if match:
+            count = int(match.group(1))
+            break
+    return json.dumps(
+        [
+            {
+                "prompt": f"範例題目 {i + 1}：下列何者正確？",
+                "options": ["A. 選項一", "B. 選項二", "C. 選項三", "D. 選項四"],
+                "answer": "A",
+                "explanation": "範例解釋。",
+            }
+            for i in range(count)
+        ],
+        ensure_ascii=False,
+    )
+
+
+class FakeMessageBatchServer:
+    def __init__(
+        self,
+        responder: Callable[[Dict[str, Any]], str] = default_responder,
+        polls_until_ended: int = 1,
+        error_ids: Iterable[str] = (),
+        base_url: str = DEFAULT_BASE_URL,
+    ):
+        self.responder = responder
+        self.polls_until_ended = polls_until_ended
+        self.error_ids = set(error_ids)
+        self.base_url = base_url.rstrip("/")
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.transport = httpx.MockTransport(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        parts = request.url.path.strip("/").split("/")  # v1 / messages / batches / {id} / ...
+        if parts[:3] != ["v1", "messages", "batches"]:
+            return self._error(404, "not_found_error", "unknown path")
+        batch_id = parts[3] if len(parts) > 3 else None
+        action = parts[4] if len(parts) > 4 else None
+
+        if request.method == "POST" and batch_id is None:
+            return self._create(json.loads(request.content))
+        batch = self.batches.get(batch_id or "")
+        if batch is None:
+            return self._error(404, "not_found_error", f"batch {batch_id} not found")
+        if request.method == "GET" and action is None:
+            return self._retrieve(batch)
+        if request.method == "POST" and action == "cancel":
+            return self._cancel(batch)
+        if request.method == "GET" and action == "results":
+            return self._results(batch)
+        return self._error(405, "invalid_request_error", "method not allowed")
+
+    # ------------------------------------------------------------------ #
+    #  Internals
+    # ------------------------------------------------------------------ #
+    def _create(self, body: Dict[str, Any]) -> httpx.Response:
+        requests = body.get("requests") or []
+        if not requests:
+            return self._error(400, "invalid_request_error", "requests must not be empty")
+        batch_id = f"msgbatch_fake_{next(_ids)}"
+        self.batches[batch_id] = {
+            "requests": requests,
+            "polls": 0,
+            "canceled": False,
+            "object": {
+                "id": batch_id,
+                "type": "message_batch",
+                "processing_status": "in_progress",
+                "request_counts": {
+                    "processing": len(requests), "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0,
+                },
+                "created_at": _now(),
+                "ended_at": None,
+                "results_url": None,
+            },
+        }
+        return httpx.Response(200, json=self.batches[batch_id]["object"])
+
+    def _retrieve(self, batch: Dict[str, Any]) -> httpx.Response:
+        obj = batch["object"]
+        if obj["processing_status"] != "ended":
+            batch["polls"] += 1
+            if batch["canceled"] or batch["polls"] >= self.polls_until_ended:
+                self._finish(batch)
+        return httpx.Response(200, json=obj)
+
+    def _cancel(self, batch: Dict[str, Any]) -> httpx.Response:
+        if batch["object"]["processing_status"] != "ended":
+            batch["canceled"] = True
+            batch["object"]["processing_status"] = "canceling"
+        return httpx.Response(200, json=batch["object"])
+
+    def _finish(self, batch: Dict[str, Any]) -> None:
+        obj = batch["object"]
+        results = []
+        for item in batch["requests"]:
+            custom_id = item["custom_id"]
+            if batch["canceled"]:
+                result: Dict[str, Any] = {"type": "canceled"}
+            elif custom_id in self.error_ids:
+                result = {"type": "errored", "error": {"type": "invalid_request_error", "message": "fake error"}}
+            else:
+                result = {"type": "succeeded", "message": self._message(item["params"])}
+            results.append({"custom_id": custom_id, "result": result})
+        batch["results"] = results
+
+        counts = {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+        for entry in results:
+            counts[entry["result"]["type"]] += 1
+        obj.update(
+            processing_status="ended",
+            request_counts=counts,
+            ended_at=_now(),
+            results_url=f"{self.base_url}/v1/messages/batches/{obj['id']}/results",
+        )
+
+    def _message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        text = self.responder(params)
+        return {
+            "id": f"msg_fake_{next(_ids)}",
+            "type": "message",
+            "role": "assistant",
+            "model": params.get("model"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": len(_prompt_text(params)) // 4, "output_tokens": len(text) // 4},
+        }
+
+    def _results(self, batch: Dict[str, Any]) -> httpx.Response:
+        if batch["object"]["processing_status"] != "ended":
+            return self._error(400, "invalid_request_error", "batch has not ended")
+        lines = "\n".join(json.dumps(entry, ensure_ascii=False) for entry in batch["results"]) + "\n"
+        return httpx.Response(200, content=lines.encode("utf-8"), headers={"content-type": "application/x-jsonl"})
+
+    @staticmethod
+    def _error(status: int, error_type: str, message: str) -> httpx.Response:
+        return httpx.Response(status, json={"type": "error", "error": {"type": error_type, "message": message}})
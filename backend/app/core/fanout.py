@@ -0,0 +1,224 @@
+# app/core/fanout.py
+"""
+大量題目的分片並行生成 — 把一次長輸出拆成多個並行的短請求。
+
+一次要求 40 題時，Claude 必須依序解碼整份輸出，耗時隨題數線性增加。
+設定 LLM_FANOUT_THRESHOLD（預設 0，不分片）後，題數超過門檻時改為：
+
+- plan_shards：拆成最多 LLM_FANOUT_MAX_SHARDS 個分片，每片約
+  LLM_FANOUT_SHARD_SIZE 題
+- 每個分片拿到不同段落的 context（split_context）與不同的出題角度提示
+  （DIVERSITY_HINTS），降低各分片出同一題的機率
+- 分片以 asyncio.gather 並行送出，實際並行數仍由 claude_limiter 控制
+- 合併後以正規化題幹的 bigram Jaccard 相似度去除近似重複
+  （dedupe_questions）；不足 count 時再補一輪，補題請求附上已有的題幹
+  要求避開
+
+單一分片失敗只記錄警告，全部失敗才拋出例外。
+
+開啟分片會改變生成行為：請求數變多、各分片的 prompt 與 context 不同，
+因此無法共用同一個 prompt caching 前綴，去重也可能使題數略少於單次請求。
+"""
+import asyncio
+import logging
+import math
+import re
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Set
+
+from app.core.config import (
+    LLM_FANOUT_THRESHOLD,
+    LLM_FANOUT_SHARD_SIZE,
+    LLM_FANOUT_MAX_SHARDS,
+    LLM_FANOUT_DEDUP_THRESHOLD,
+)
+from app.core.dedup import normalize_text
+
+logger = logging.getLogger(__name__)
+
+DIVERSITY_HINTS = (
+    "著重基本概念與名詞定義",
+    "著重實際應用與情境判斷",
+    "著重比較、分類與因果關係",
+    "著重細節、數據與具體事例",
+    "著重常見的錯誤觀念與易混淆之處",
+    "著重綜合多個段落的整合分析",
+    "著重步驟、流程與先後順序",
+    "著重原因、目的與影響",
+)
+_MAX_AVOID_STEMS = 30  # 補題請求最多附上幾個已有題幹
+
+# 題號前綴，例如 "1." "(2)" "Q3:" "第4題"
+_NUMBERING_RE = re.compile(r"^\s*(?:第\s*\d+\s*題|q?\s*\d+\s*[.、:：)）]|[(（]\s*\d+\s*[)）])\s*", re.IGNORECASE)
+_BLOCK_SPLIT_RE = re.compile(r"\n\s*\n")
+
+
+class Shard(NamedTuple):
+    index: int
+    total: int
+    count: int  # 這個分片要生成的題數
+    context: str  # 分配給這個分片的 context（沒有 context 時為空字串）
+    hint: str  # 附加在 prompt 後的出題角度提示
+
+
+# ---- 分片規劃 ---- #
+def plan_shards(
+    count: int,
+    threshold: int = LLM_FANOUT_THRESHOLD,
+    shard_size: int = LLM_FANOUT_SHARD_SIZE,
+    max_shards: int = LLM_FANOUT_MAX_SHARDS,
+) -> List[int]:
+    """回傳每個分片的題數；不需分片時只有一個元素"""
+    if threshold <= 0 or count <= threshold or max_shards <= 1:
+        return [count]
+    shards = min(max_shards, math.ceil(count / max(1, shard_size)))
+    base, extra = divmod(count, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def split_context(context: str, shards: int) -> List[str]:
+    """
+    把 context 依段落切成 shards 份長度相近的連續片段
+
+    段落不足時改以行切分；仍不足時每個分片都使用完整 context。
+    """
+    if shards <= 1 or not context:
+        return [context] * max(shards, 1)
+    blocks = [b for b in _BLOCK_SPLIT_RE.split(context) if b.strip()]
+    separator = "\n\n"
+    if len(blocks) < shards:
+        blocks = [line for line in context.splitlines() if line.strip()]
+        separator = "\n"
+    if len(blocks) < shards:
+        return [context] * shards
+
+    target = sum(len(b) for b in blocks) / shards
+    slices: List[str] = []
+    current: List[str] = []
+    size = 0
+    for i, block in enumerate(blocks):
+        current.append(block)
+        size += len(block)
+        remaining_blocks = len(blocks) - i - 1
+        remaining_slices = shards - len(slices) - 1
+        # 累積到目標長度就結束這一片，但要確保後面每片至少有一個段落
+        if remaining_slices and (size >= target or remaining_blocks == remaining_slices):
+            slices.append(separator.join(current))
+            current, size = [], 0
+    slices.append(separator.join(current))
+    return slices
+
+
+def shard_hint(index: int, total: int, avoid_stems: Optional[List[str]] = None) -> str:
+    """第 index 個分片的出題角度提示"""
+    hint = (
+        f"\n\n本次為第 {index + 1}/{total} 組題目，請{DIVERSITY_HINTS[index % len(DIVERSITY_HINTS)]}，"
+        "題幹的切入角度與用語請避免與其他組雷同。"
+    )
+    if avoid_stems:
+        listed = "\n".join(f"- {stem}" for stem in avoid_stems[:_MAX_AVOID_STEMS])
+        hint += f"\n以下題目已經出過，請勿重複或換句話說：\n{listed}"
+    return hint
+
+
+# ---- 題幹去重 ---- #
+def normalize_stem(text: str) -> str:
+    """題幹正規化：NFKC、小寫、去掉題號、標點與空白"""
+    text = _NUMBERING_RE.sub("", normalize_text(text))
+    return "".join(
+        ch for ch in text if not unicodedata.category(ch).startswith(("P", "Z", "S", "C"))
+    )
+
+
+def _bigrams(stem: str) -> Set[str]:
+    if len(stem) < 2:
+        return {stem} if stem else set()
+    return {stem[i : i + 2] for i in range(len(stem) - 1)}
+
+
+def stem_similarity(a: str, b: str) -> float:
+    """兩個題幹（正規化後）的 bigram Jaccard 相似度"""
+    x, y = _bigrams(normalize_stem(a)), _bigrams(normalize_stem(b))
+    if not x or not y:
+        return 0.0
+    return len(x & y) / len(x | y)
+
+
+def dedupe_questions(
+    questions: List[Dict[str, Any]],
+    threshold: float = LLM_FANOUT_DEDUP_THRESHOLD,
+) -> List[Dict[str, Any]]:
+    """依序保留題目，略過題幹與已保留題目相同或相似度 >= threshold 者"""
+    kept: List[Dict[str, Any]] = []
+    seen: Set[str] = set()
+    kept_grams: List[Set[str]] = []
+    for q in questions:
+        stem = normalize_stem(str(q.get("prompt") or ""))
+        if not stem:
+            kept.append(q)  # 沒有題幹無從比較，交給後續驗證處理
+            continue
+        if stem in seen:
+            continue
+        grams = _bigrams(stem)
+        if any(len(grams & other) / len(grams | other) >= threshold for other in kept_grams):
+            continue
+        seen.add(stem)
+        kept_grams.append(grams)
+        kept.append(q)
+    return kept
+
+
+# ---- 並行執行 ---- #
+async def fan_out(
+    count: int,
+    generate: Callable[[Shard], Awaitable[List[Dict[str, Any]]]],
+    context: str = "",
+    shard_counts: Optional[List[int]] = None,
+    dedup_threshold: float = LLM_FANOUT_DEDUP_THRESHOLD,
+) -> List[Dict[str, Any]]:
+    """
+    以分片並行呼叫 generate，合併並去重後回傳最多 count 題
+
+    Args:
+        generate: 依 Shard 生成題目的函式（負責組 prompt、呼叫 LLM 與解析）
+        context: 要分配給各分片的 context；空字串表示 prompt 已自帶內容
+        shard_counts: 各分片題數，預設由 plan_shards(count) 決定
+    """
+    shard_counts = shard_counts or plan_shards(count)
+    total = len(shard_counts)
+    contexts = split_context(context, total)
+    shards = [
+        Shard(i, total, n, contexts[i], shard_hint(i, total)) for i, n in enumerate(shard_counts)
+    ]
+    logger.info("分片並行生成：%d 題拆成 %d 個分片 %s", count, total, shard_counts)
+
+    results = await asyncio.gather(*(generate(shard) for shard in shards), return_exceptions=True)
+    merged: List[Dict[str, Any]] = []
+    failures: List[BaseException] = []
+    for shard, result in zip(shards, results):
+        if isinstance(result, BaseException):
+            logger.warning("分片 %d/%d 生成失敗: %s", shard.index + 1, total, result)
+            failures.append(result)
+        else:
+            merged.extend(result)
+    if len(failures) == total:
+        raise failures[0]
+
+    questions = dedupe_questions(merged, dedup_threshold)
+    if len(merged) != len(questions):
+        logger.info("分片合併：移除 %d 道重複題目", len(merged) - len(questions))
+
+    deficit = count - len(questions)
+    if deficit > 0:
+        # 補一輪：使用完整 context 與下一個出題角度，並列出已有題幹要求避開
+        avoid = [str(q.get("prompt") or "")[:80] for q in questions]
+        top_up = Shard(total, total + 1, deficit, context, shard_hint(total, total + 1, avoid))
+        logger.info("分片合併後不足 %d 題，補生成 %d 題", count, deficit)
+        try:
+            extra = await generate(top_up)
+        except Exception as e:
+            logger.warning("補題失敗: %s", e)
+        else:
+            questions = dedupe_questions(questions + extra, dedup_threshold)
+
+    return questions[:count]
@@ -0,0 +1,228 @@
+# app/core/jobs.py
+"""
+程序內背景工作系統 — 把耗時處理移出 HTTP 請求，不需要外部 broker。
+
+- 工作狀態持久化在 Postgres 的 jobs 表（見 JobService），可由
+  /api/jobs/{id} 查詢，服務重啟後 pending 工作會重新排入佇列
+- 每個 uvicorn worker 內有 JOB_WORKERS 個 asyncio worker 從佇列取工作；
+  以 UPDATE ... WHERE status = 'pending' 原子地認領，避免重複執行
+- CPU 密集步驟可用 ``job.run_cpu_bound()`` 交給 process pool
+- 執行中的工作每 JOB_HEARTBEAT_SECONDS 更新一次 updated_at；啟動時只把
+  超過 JOB_STALE_SECONDS 沒有 heartbeat 的工作視為中斷，不會誤判其他
+  worker 上仍在執行、只是久未回報進度的工作
+
+handler 簽名為 ``async def handler(job: Job, **params)``，params 必須可
+JSON 序列化。handler 以 ``await job.set_progress(done, total)`` 回報進度
+（同時檢查取消要求），回傳值（需可 JSON 序列化）存為工作結果。
+"""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import (
+    JOB_WORKERS,
+    JOB_PROGRESS_INTERVAL,
+    JOB_STALE_SECONDS,
+    JOB_HEARTBEAT_SECONDS,
+)
+from app.core.executors import run_cpu_bound
+from app.db import database
+from app.services.job_service import JobService
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[..., Awaitable[Any]]
+
+
+class JobCancelled(Exception):
+    """工作已被要求取消"""
+
+
+class Job:
+    """執行中工作的句柄，傳給 handler 使用"""
+
+    def __init__(self, job_id: str, job_type: str, params: Dict[str, Any]):
+        self.id = job_id
+        self.job_type = job_type
+        self.params = params
+        self.progress_done = 0
+        self.progress_total = 0
+        self.cancel_requested = False
+        self._last_flush = 0.0
+
+    async def set_progress(
+        self,
+        done: int,
+        total: Optional[int] = None,
+        message: Optional[str] = None,
+        force: bool = False,
+    ) -> None:
+        """回報進度（最多每 JOB_PROGRESS_INTERVAL 秒寫回一次 DB）；已要求取消時拋出 JobCancelled"""
+        self.progress_done = done
+        if total is not None:
+            self.progress_total = total
+
+        now = time.monotonic()
+        if force or now - self._last_flush >= JOB_PROGRESS_INTERVAL:
+            self._last_flush = now
+            async with database.AsyncSessionLocal() as db:
+                if await JobService(db).update_progress(
+                    self.id, self.progress_done, self.progress_total, message
+                ):
+                    self.cancel_requested = True
+
+        self.check_cancelled()
+
+    def check_cancelled(self) -> None:
+        if self.cancel_requested:
+            raise JobCancelled(f"工作 {self.id} 已取消")
+
+    async def run_cpu_bound(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在 process pool 執行 CPU 密集的同步函式"""
+        self.check_cancelled()
+        return await run_cpu_bound(fn, *args, **kwargs)
+
+
+class JobManager:
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = max(1, workers)
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._worker_tasks: List[asyncio.Task] = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._running: Dict[str, Tuple[Job, asyncio.Task]] = {}
+
+    # ------------------------------------------------------------------ #
+    #  Registration & lifecycle
+    # ------------------------------------------------------------------ #
+    def register(self, job_type: str, handler: JobHandler) -> None:
+        self._handlers[job_type] = handler
+
+    async def start(self) -> None:
+        """啟動 worker，並恢復上次未完成的工作"""
+        if self._worker_tasks:
+            return
+        async with database.AsyncSessionLocal() as db:
+            service = JobService(db)
+            stale = await service.fail_stale_jobs(JOB_STALE_SECONDS)
+            if stale:
+                logger.warning("%d 個中斷的工作已標記為失敗", stale)
+            for job_id in await service.get_pending_job_ids():
+                self._queue.put_nowait(job_id)
+
+        self._worker_tasks = [
+            asyncio.create_task(self._worker_loop(i)) for i in range(self.workers)
+        ]
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        logger.info("背景工作系統已啟動（%d workers）", self.workers)
+
+    async def stop(self) -> None:
+        tasks = self._worker_tasks + ([self._heartbeat_task] if self._heartbeat_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._heartbeat_task = None
+
+    # ------------------------------------------------------------------ #
+    #  Public API
+    # ------------------------------------------------------------------ #
+    async def submit(self, job_type: str, **params: Any) -> str:
+        """建立工作並排入佇列，回傳 job ID"""
+        if job_type not in self._handlers:
+            raise ValueError(f"未知的工作類型: {job_type}")
+        job_id = str(uuid.uuid4())
+        async with database.AsyncSessionLocal() as db:
+            await JobService(db).create_job(job_id, job_type, params)
+        self._queue.put_nowait(job_id)
+        logger.info("建立背景工作 %s (%s)", job_id, job_type)
+        return job_id
+
+    def cancel_local(self, job_id: str) -> bool:
+        """若工作正在本程序執行，立即中止它的 task"""
+        running = self._running.get(job_id)
+        if not running:
+            return False
+        job, task = running
+        job.cancel_requested = True
+        task.cancel()
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": len(self._worker_tasks),
+            "queued": self._queue.qsize(),
+            "running": len(self._running),
+        }
+
+    # ------------------------------------------------------------------ #
+    #  Internals
+    # ------------------------------------------------------------------ #
+    async def _worker_loop(self, worker_index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error("worker %d 執行工作 %s 發生錯誤: %s", worker_index, job_id, e, exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _heartbeat_loop(self) -> None:
+        """定期更新本程序執行中工作的 updated_at，並帶回其他程序送出的取消要求"""
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            if not self._running:
+                continue
+            try:
+                async with database.AsyncSessionLocal() as db:
+                    cancelled = await JobService(db).heartbeat(list(self._running))
+            except Exception as e:
+                logger.warning("背景工作 heartbeat 失敗: %s", e)
+                continue
+            for job_id in cancelled:
+                running = self._running.get(job_id)
+                if running:
+                    running[0].cancel_requested = True
+
+    async def _run(self, job_id: str) -> None:
+        async with database.AsyncSessionLocal() as db:
+            record = await JobService(db).claim_job(job_id)
+        if record is None:
+            return  # 已被其他 worker 取走或已取消
+
+        handler = self._handlers.get(record.job_type)
+        job = Job(record.id, record.job_type, record.params or {})
+        status, result, error = "succeeded", None, None
+
+        if handler is None:
+            status, error = "failed", f"未知的工作類型: {record.job_type}"
+        else:
+            task = asyncio.create_task(handler(job, **job.params))
+            self._running[job.id] = (job, task)
+            try:
+                result = await task
+            except (JobCancelled, asyncio.CancelledError):
+                if not job.cancel_requested:
+                    raise  # worker 本身被停止
+                status, error = "cancelled", "已取消"
+            except Exception as e:
+                status, error = "failed", str(e)
+                logger.error("背景工作 %s (%s) 失敗: %s", job.id, job.job_type, e, exc_info=True)
+            finally:
+                self._running.pop(job.id, None)
+
+        async with database.AsyncSessionLocal() as db:
+            service = JobService(db)
+            if status == "succeeded":
+                await service.update_progress(job.id, job.progress_done, job.progress_total)
+            finished = await service.finish_job(job.id, status, result=result, error=error)
+        if not finished:
+            logger.warning("背景工作 %s (%s) 已不是 running 狀態，不覆寫結果（%s）", job.id, job.job_type, status)
+            return
+        logger.info("背景工作 %s (%s) 結束：%s", job.id, job.job_type, status)
+
+
+job_manager = JobManager()
@@ -0,0 +1,196 @@
+# app/core/json_stream.py
+"""
+單次掃描的容錯 JSON 擷取器 — 從 LLM 回應中取出題目物件。
+
+LLM 回應可能是 ``[{...}, ...]``、包在 markdown code block 裡、包在
+``{"questions": [...]}`` 裡，或只是一連串 ``{...}`` 物件夾雜說明文字。
+JsonObjectExtractor 逐段接收文字、只掃描一次：
+
+- 頂層（任何括號之外）只找 ``[`` / ``{``，說明文字與 code fence 直接略過，
+  其中的引號也不影響判斷
+- 頂層陣列：每個物件 / 陣列元素閉合時立即產生
+- 頂層物件：若在 ``"questions":`` 後開始陣列，改為逐一產生陣列元素；
+  否則整個物件閉合後產生它本身
+- 字串內的括號與跳脫字元正確略過；以 regex 跳到下一個有意義的字元，
+  不逐字元執行 Python 迴圈
+
+只保留目前元素的文字，可用於串流。元素以 orjson 解析；失敗時改用
+寬鬆模式（允許字串內的控制字元、移除結尾多餘的逗號）再試一次，仍失敗
+才記在 errors 並略過。
+"""
+import json
+import logging
+import re
+from typing import Any, Iterator, List, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+_ROOT_START_RE = re.compile(r"[\[{]")
+# 完整的字串一次跳過；字串跨越片段時只比對到開頭的引號
+_STRUCTURAL_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}"]')
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+_WRAPPER_KEY_RE = re.compile(r'"questions"\s*:\s*$')
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+# 頂層容器的模式
+_ARRAY = "array"  # 產生陣列內的元素
+_OBJECT = "object"  # 產生整個物件
+_WRAPPER = "wrapper"  # {"questions": [...]}：產生內層陣列的元素
+
+
+class JsonObjectExtractor:
+    def __init__(self):
+        self.errors: List[str] = []
+        self._mode: Optional[str] = None  # None 表示在頂層
+        self._depth = 0  # 括號深度（頂層容器內為 1）
+        self._emit_depth = 0  # 元素所在的深度；元素的括號開在此深度
+        self._in_string = False
+        self._escape = False
+        self._buffer: List[str] = []  # 目前元素（或頂層物件）已收到的文字
+        self._capturing = False
+
+    @property
+    def truncated(self) -> bool:
+        """輸入結束時是否還有未閉合的元素（例如回應被 max_tokens 截斷）"""
+        return self._capturing
+
+    def feed(self, text: str) -> Iterator[Any]:
+        """餵入一段文字，產生本段內完成的元素"""
+        pos = 0
+        capture_from = 0
+        length = len(text)
+
+        while pos < length:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRING_SPECIAL_RE.search(text, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                if match.group() == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                continue
+
+            if self._mode is None:
+                match = _ROOT_START_RE.search(text, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                self._depth = 1
+                if match.group() == "[":
+                    self._mode, self._emit_depth = _ARRAY, 1
+                else:
+                    self._mode, self._emit_depth = _OBJECT, 0
+                    self._capturing, capture_from = True, match.start()
+                continue
+
+            # 容器內：連續處理結構字元，直到頂層容器結束或字串跨越片段結尾
+            resume = pos
+            pos = length
+            for match in _STRUCTURAL_RE.finditer(text, resume):
+                ch = match.group()
+                if ch[0] == '"':
+                    if len(ch) == 1:  # 字串在這個片段內沒有結束
+                        self._in_string = True
+                        pos = match.end()
+                        break
+                elif ch == "{" or ch == "[":
+                    if (
+                        ch == "["
+                        and self._depth == 1
+                        and self._mode == _OBJECT
+                        and _WRAPPER_KEY_RE.search("".join(self._buffer) + text[capture_from:match.start()])
+                    ):
+                        # {"questions": [...]}：丟掉外層物件的文字，改為逐一產生內層元素
+                        self._mode, self._emit_depth = _WRAPPER, 2
+                        self._buffer, self._capturing = [], False
+                    elif self._depth == self._emit_depth:
+                        self._capturing, capture_from = True, match.start()
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._capturing and self._depth == self._emit_depth:
+                        self._buffer.append(text[capture_from:match.end()])
+                        yield from self._emit()
+                    if self._depth == 0:
+                        self._mode = None  # 頂層容器結束，繼續找下一個
+                        pos = match.end()
+                        break
+
+        if self._capturing:
+            self._buffer.append(text[capture_from:])
+
+    # ------------------------------------------------------------------ #
+    #  Internals
+    # ------------------------------------------------------------------ #
+    def _emit(self) -> Iterator[Any]:
+        raw = "".join(self._buffer)
+        self._buffer, self._capturing = [], False
+        value = _loads_tolerant(raw)
+        if value is _INVALID:
+            self.errors.append(raw[:80])
+            logger.warning("JSON 元素解析失敗，已略過: %s", raw[:80])
+            return
+        if self._mode == _OBJECT and isinstance(value, dict) and isinstance(value.get("questions"), list):
+            # 外層物件在 "questions" 之前就無法判斷（例如鍵順序不同）時的備援
+            yield from value["questions"]
+            return
+        yield value
+
+
+_INVALID = object()
+
+
+def _loads_tolerant(raw: str) -> Any:
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        pass
+    for candidate in (raw, _TRAILING_COMMA_RE.sub(r"\1", raw)):
+        try:
+            return json.loads(candidate, strict=False)
+        except ValueError:
+            continue
+    return _INVALID
+
+
+def _loads_whole(text: str) -> Any:
+    """整段回應（或唯一的 code block 內容）是合法 JSON 時直接解析，否則回傳 _INVALID"""
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        pass
+    # 只有一個 code block、區塊外沒有括號時，擷取器的結果就是區塊內容本身
+    if text.count("```") != 2:
+        return _INVALID
+    start = text.index("```")
+    end = text.index("```", start + 3)
+    outside = text[:start] + text[end + 3 :]
+    if "[" in outside or "{" in outside:
+        return _INVALID
+    match = _ROOT_START_RE.search(text, start + 3, end)  # 略過語言標記（```json）
+    if match is None:
+        return _INVALID
+    try:
+        return orjson.loads(text[match.start() : end])
+    except orjson.JSONDecodeError:
+        return _INVALID
+
+
+def extract_json_objects(text: str) -> List[Any]:
+    """一次擷取整段回應中的所有元素；整段或唯一的 code block 是合法 JSON 時直接解析"""
+    data = _loads_whole(text)
+    if data is _INVALID:
+        return list(JsonObjectExtractor().feed(text))
+    if isinstance(data, dict) and isinstance(data.get("questions"), list):
+        return data["questions"]
+    if isinstance(data, list):
+        return data
+    return [data] if isinstance(data, dict) else []
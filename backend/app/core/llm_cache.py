@@ -0,0 +1,231 @@
+# app/core/llm_cache.py
+"""
+LLM 回應快取 — 相同請求參數不重複呼叫 Claude API。
+
+- key 為 (model, prompt, max_tokens, temperature, top_p) 的 SHA-256，存在
+  Postgres 的 llm_response_cache 表（見 LLMCacheService），多個 worker 共用
+- 預設關閉，以 LLM_CACHE_ENABLED 開啟；項目超過 LLM_CACHE_TTL_SECONDS 失效，
+  每寫入 LLM_CACHE_EVICT_EVERY 筆淘汰過期與超過 LLM_CACHE_MAX_ENTRIES 的
+  最久未使用項目
+- 同一程序內相同 key 的並行 miss 只呼叫一次 API（single-flight）
+- 明確略過：``with bypass_llm_cache(): ...``，或 HTTP 請求帶
+  ``Cache-Control: no-cache``；略過時不讀快取，但仍以新回應更新快取
+- 快取本身出錯（例如 DB 不可用）只記錄警告，不影響生成
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+from fastapi import Header
+
+from app.core.config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_EVICT_EVERY,
+)
+from app.db import database
+from app.services.llm_cache_service import LLMCacheService
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_FIELDS = ("model", "prompt", "max_tokens", "temperature", "top_p")
+
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_llm_cache(bypass: bool = True) -> Iterator[None]:
+    """在此範圍內的 LLM 呼叫不讀取快取"""
+    token = _bypass.set(bypass)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def set_llm_cache_bypass(bypass: bool) -> None:
+    """設定目前 context（例如單一 HTTP 請求）是否略過快取"""
+    _bypass.set(bypass)
+
+
+def is_llm_cache_bypassed() -> bool:
+    return _bypass.get()
+
+
+async def llm_cache_control(cache_control: Optional[str] = Header(None)) -> bool:
+    """
+    FastAPI dependency：請求帶 Cache-Control: no-cache / no-store 時，本次生成不讀取 LLM 快取
+
+    必須是 async def：同步 dependency 在 threadpool 中以複製的 context 執行，
+    設定的 ContextVar 不會回到 endpoint 的 task。
+    """
+    bypass = bool(cache_control) and any(
+        directive.strip().lower() in ("no-cache", "no-store")
+        for directive in cache_control.split(",")
+    )
+    set_llm_cache_bypass(bypass)
+    return bypass
+
+
+def cache_key(params: Dict[str, Any]) -> str:
+    """請求參數的 SHA-256（只取 CACHE_KEY_FIELDS，順序固定）"""
+    payload = json.dumps(
+        [params.get(field) for field in CACHE_KEY_FIELDS],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(
+        self,
+        enabled: bool = LLM_CACHE_ENABLED,
+        ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        evict_every: int = LLM_CACHE_EVICT_EVERY,
+    ):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.evict_every = max(1, evict_every)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get_or_call(self, params: Dict[str, Any], call: Callable[[], Awaitable[str]]) -> str:
+        """命中時回傳快取的回應，否則執行 call() 並寫入快取"""
+        if not self.enabled:
+            return await call()
+
+        key = cache_key(params)
+        if _bypass.get():
+            self.bypassed += 1
+            response = await call()
+            await self._store(key, params, response)
+            return response
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            # 相同請求正在呼叫 API，等待它的結果
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await self._load(key)
+            if response is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                response = await call()
+                await self._store(key, params, response)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # 標記為已讀取，避免沒有等待者時出現警告
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            self._inflight.pop(key, None)
+
+    async def lookup(self, params: Dict[str, Any]) -> Optional[str]:
+        """只查詢快取（串流呼叫用）；未命中、略過或未啟用時回傳 None"""
+        if not self.enabled:
+            return None
+        if _bypass.get():
+            self.bypassed += 1
+            return None
+        response = await self._load(cache_key(params))
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    async def store(self, params: Dict[str, Any], response: str) -> None:
+        """寫入完整回應（串流呼叫結束後使用）"""
+        if self.enabled:
+            await self._store(cache_key(params), params, response)
+
+    async def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        stats: Dict[str, Any] = {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+        if self.enabled and database.AsyncSessionLocal is not None:
+            try:
+                async with database.AsyncSessionLocal() as db:
+                    stats.update(await LLMCacheService(db).get_stats())
+            except Exception as e:
+                logger.warning("讀取 LLM 快取統計失敗: %s", e)
+        return stats
+
+    async def clear(self) -> int:
+        async with database.AsyncSessionLocal() as db:
+            removed = await LLMCacheService(db).clear()
+        logger.info("已清除 %d 筆 LLM 快取", removed)
+        return removed
+
+    # ------------------------------------------------------------------ #
+    #  Internals
+    # ------------------------------------------------------------------ #
+    async def _load(self, key: str) -> Optional[str]:
+        try:
+            async with database.AsyncSessionLocal() as db:
+                return await LLMCacheService(db).get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("讀取 LLM 快取失敗，直接呼叫 API: %s", e)
+            return None
+
+    async def _store(self, key: str, params: Dict[str, Any], response: str) -> None:
+        if not response:
+            return
+        try:
+            async with database.AsyncSessionLocal() as db:
+                service = LLMCacheService(db)
+                await service.put(
+                    key,
+                    str(params.get("model") or ""),
+                    response,
+                    len(params.get("prompt") or ""),
+                    self.ttl_seconds,
+                )
+                self.stores += 1
+                if self.stores % self.evict_every == 0:
+                    removed = await service.evict(self.max_entries)
+                    self.evictions += removed
+                    if removed:
+                        logger.info("LLM 快取淘汰 %d 筆", removed)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("寫入 LLM 快取失敗: %s", e)
+
+
+llm_cache = LLMCache()
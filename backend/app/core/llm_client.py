@@ -1,7 +1,6 @@
 # app/core/llm_client.py
-from typing import List, Dict, Any, Optional
-import json
-import re
+from typing import AsyncIterator, List, Dict, Any, Optional
+import asyncio
 import logging
 
 from tenacity import (
@@ -11,7 +10,27 @@ from tenacity import (
     retry_if_exception_type,
 )
 
-from app.core.config import USE_MOCK_API, ANTHROPIC_API_KEY, LLM_MODEL_NAME
+from app.core.config import (
+    USE_MOCK_API,
+    ANTHROPIC_API_KEY,
+    ANTHROPIC_BASE_URL,
+    LLM_BACKEND,
+    LLM_MODEL_NAME,
+)
+from app.core.fanout import Shard, fan_out, plan_shards
+from app.core.json_stream import JsonObjectExtractor, extract_json_objects
+from app.core.llm_cache import llm_cache
+from app.core.prompt_cache import (
+    PromptParts,
+    billed_input_tokens,
+    build_api_params,
+    create_message,
+    prompt_cache_stats,
+    prompt_text,
+    stream_message,
+)
+from app.core.rate_limiter import claude_limiter
+from app.core.tokens import estimate_tokens
 from app.schemas.question import QuestionType, Subject
 from app.db.models import Template
 
@@ -20,212 +39,323 @@ logging.basicConfig(level=logging.INFO)
 
 MODEL_NAME = LLM_MODEL_NAME
 _LLM_BUFFER_COUNT = 2
+_MAX_ATTEMPTS = 5
+
+# The parsing, validation and template-prompt helpers below do not call the
+# API; they are available in mock mode and shared with the batch generator.
+
+# ------------------------------------------------------------------ #
+#  JSON extraction helpers
+# ------------------------------------------------------------------ #
+def parse_questions_json(
+    raw: str,
+    count: int,
+    fallback_type: QuestionType,
+    validate_as: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Parse raw LLM text into a list of question dicts.
+
+    Accepts a bare array, a fenced code block, a {"questions": [...]} wrapper
+    or loose objects mixed with prose (see JsonObjectExtractor). With
+    `validate_as`, questions failing validate_question_format are dropped
+    before truncating to `count`, as the streaming variants do.
+    """
+    data = [q for q in extract_json_objects(raw) if isinstance(q, dict)]
+    if not data:
+        logger.error("No question objects found in response")
+        return []
+    if validate_as is not None:
+        data = validate_question_format(data, validate_as)
+        if len(data) < count:
+            logger.warning("Only %d/%d questions passed validation", len(data), count)
+
+    logger.info("Parsed %d questions from response", len(data))
+    for i, q in enumerate(data[:count]):
+        logger.debug(
+            "Question %d: prompt=%s, answer=%s",
+            i + 1,
+            str(q.get("prompt", "N/A"))[:80],
+            str(q.get("answer", "N/A"))[:80],
+        )
+    return data[:count]
+
+# ------------------------------------------------------------------ #
+#  Question-type detection
+# ------------------------------------------------------------------ #
+def detect_question_type_from_template(template_content: str) -> List[QuestionType]:
+    """Detect question types from template content keywords."""
+    lower = template_content.lower()
+    detected: List[QuestionType] = []
+
+    keyword_map = {
+        QuestionType.SINGLE_CHOICE: ["選擇", "choice", "選項", "option", "abcd", "a.", "b.", "c.", "d."],
+        QuestionType.CLOZE: ["填空", "cloze", "___", "____", "空格", "blank"],
+        QuestionType.SHORT_ANSWER: ["簡答", "short answer", "說明", "解釋", "描述"],
+        QuestionType.TRUE_FALSE: ["是非", "true false", "對錯", "正確錯誤", "true/false"],
+        QuestionType.MATCHING: ["配對", "matching", "連連看", "配連", "對應"],
+    }
+
+    for qtype, keywords in keyword_map.items():
+        if any(kw in lower for kw in keywords):
+            detected.append(qtype)
+
+    if not detected:
+        detected = [QuestionType.SINGLE_CHOICE, QuestionType.CLOZE, QuestionType.SHORT_ANSWER]
+
+    return detected
+
+# ------------------------------------------------------------------ #
+#  Question format validation
+# ------------------------------------------------------------------ #
+def validate_question_format(questions: List[Dict[str, Any]], question_type: str) -> List[Dict[str, Any]]:
+    """Validate generated questions match the expected format for the given type."""
+    validated = []
+
+    for q in questions:
+        if not q.get("prompt") or not q.get("answer") or not q.get("explanation"):
+            logger.warning("Question missing required fields: %s", list(q.keys()))
+            continue
+
+        if question_type == "true_false":
+            if str(q.get("answer", "")).lower() not in ("true", "false"):
+                logger.warning("True/false answer format invalid: %s", q.get("answer"))
+                continue
+
+        elif question_type == "matching":
+            qd = q.get("question_data")
+            # 容錯：如果 question_data 不存在，嘗試從頂層字段構建
+            if not qd:
+                left_top = q.get("left_items")
+                right_top = q.get("right_items")
+                if isinstance(left_top, list) and isinstance(right_top, list) and left_top and right_top:
+                    qd = {"left_items": left_top, "right_items": right_top}
+                    q["question_data"] = qd
+                    logger.info("Matching: auto-constructed question_data from top-level fields")
+                else:
+                    logger.warning("Matching question missing question_data and no fallback fields found: %s", list(q.keys()))
+                    continue
+            left = qd.get("left_items")
+            right = qd.get("right_items")
+            if not isinstance(left, list) or not isinstance(right, list) or not left or not right:
+                logger.warning("Matching question_data format invalid: left=%s, right=%s", type(left), type(right))
+                continue
+
+        elif question_type == "single_choice":
+            opts = q.get("options")
+            if not isinstance(opts, list) or len(opts) < 2:
+                logger.warning("Single-choice options invalid")
+                continue
+
+        elif question_type == "sequence":
+            items = q.get("items")
+            answer = q.get("answer")
+            if not isinstance(items, list) or not items:
+                logger.warning("Sequence question missing or invalid 'items' array")
+                continue
+            if not isinstance(answer, list) or not answer:
+                logger.warning("Sequence question missing or invalid 'answer' array")
+                continue
+
+        elif question_type == "enumeration":
+            answer = q.get("answer")
+            if not isinstance(answer, list) or not answer:
+                logger.warning("Enumeration question missing or invalid 'answer' array")
+                continue
+
+        elif question_type == "symbol_identification":
+            symbols = q.get("symbols")
+            if not isinstance(symbols, list) or not symbols:
+                logger.warning("Symbol identification question missing or invalid 'symbols' array")
+                continue
+
+        validated.append(q)
+
+    logger.info("Validation: %d/%d questions passed", len(validated), len(questions))
+    return validated
+
+
+# ------------------------------------------------------------------ #
+#  Shared JSON-format suffix
+# ------------------------------------------------------------------ #
+_JSON_FORMAT_SUFFIX = """
+請生成{count}道題目，並以 JSON 格式回傳，格式如下：
+
+[
+  {{
+    "prompt": "題目內容",
+    "options": ["A. 選項1", "B. 選項2", "C. 選項3", "D. 選項4"],  // 僅單選題需要，其他題型可省略
+    "answer": "正確答案",
+    "explanation": "詳細解釋"
+  }}
+]
+
+請確保生成的是有效的 JSON 格式。
+"""
+
+
+def template_prompt(context: str, template_content: str, count: int, hint: str = "") -> PromptParts:
+    """Template prompt: the template with {{context}} filled in, then the JSON-format suffix."""
+    return PromptParts(
+        template_content.replace("{{context}}", context),
+        _JSON_FORMAT_SUFFIX.format(count=count) + hint,
+    )
+
 
 if not USE_MOCK_API:
     from anthropic import AsyncAnthropic, APIError, APITimeoutError, RateLimitError
 
-    claude_client = AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
+    # Retries are handled below so that every 429 reaches the limiter
+    if LLM_BACKEND == "fake":
+        # Offline load testing: the real client talks to a deterministic fake
+        # server over an in-process transport (see app.core.fake_llm)
+        import httpx
+
+        from app.core.fake_llm import fake_llm_server
+
+        claude_client = AsyncAnthropic(
+            api_key=ANTHROPIC_API_KEY or "fake",
+            max_retries=0,
+            http_client=httpx.AsyncClient(transport=fake_llm_server.transport),
+        )
+        logger.warning("LLM_BACKEND=fake — Claude calls are served by the fake LLM server")
+    else:
+        claude_client = AsyncAnthropic(api_key=ANTHROPIC_API_KEY, base_url=ANTHROPIC_BASE_URL, max_retries=0)
 
     # ------------------------------------------------------------------ #
-    #  Retry wrapper — 3 attempts, exponential backoff (2s → 4s → 8s)
+    #  Retry wrapper — 5 attempts, exponential backoff (2s → 4s → 8s → 8s)
+    #  Rate-limited attempts retry immediately: claude_limiter already
+    #  pauses new calls until the retry-after deadline.
     # ------------------------------------------------------------------ #
+    _backoff = wait_exponential(multiplier=2, min=2, max=8)
+
+    def _retry_wait(retry_state) -> float:
+        if isinstance(retry_state.outcome.exception(), RateLimitError):
+            return 0
+        return _backoff(retry_state)
+
+    def _retry_after_seconds(exc: RateLimitError) -> Optional[float]:
+        try:
+            return float(exc.response.headers.get("retry-after"))
+        except (AttributeError, TypeError, ValueError):
+            return None
+
     @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=2, min=2, max=8),
+        stop=stop_after_attempt(_MAX_ATTEMPTS),
+        wait=_retry_wait,
         retry=retry_if_exception_type((APIError, APITimeoutError, RateLimitError)),
         before_sleep=lambda rs: logger.warning(
             f"Claude API call failed (attempt {rs.attempt_number}), retrying…"
         ),
         reraise=True,
     )
-    async def _call_claude(
-        prompt: str,
-        *,
-        model: str = MODEL_NAME,
-        max_tokens: int = 16384,
-        temperature: float = 0.7,
-        top_p: Optional[float] = None,
-    ) -> str:
-        """Send a single prompt to Claude and return the text response."""
-        api_params: Dict[str, Any] = {
-            "model": model,
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "messages": [{"role": "user", "content": prompt}],
-        }
-        if top_p is not None:
-            api_params["top_p"] = top_p
-
+    async def _request_claude(api_params: Dict[str, Any]) -> str:
+        """Send a single request to Claude and return the text response."""
+        prompt = prompt_text(api_params)
         logger.info("Sending request to Claude API…")
         logger.debug("Prompt length: %d chars", len(prompt))
         logger.debug("Prompt content:\n%s\n%s\n%s", "-" * 50, prompt, "-" * 50)
 
-        resp = await claude_client.messages.create(**api_params)
+        estimated = estimate_tokens(prompt)
+        async with claude_limiter.slot(estimated):
+            try:
+                resp = await create_message(claude_client, api_params)
+            except RateLimitError as exc:
+                claude_limiter.on_rate_limited(_retry_after_seconds(exc))
+                raise
+            claude_limiter.on_success(
+                billed_input_tokens(resp.usage), resp.usage.output_tokens, estimated
+            )
+        prompt_cache_stats.record(api_params, resp.usage)
         text = resp.content[0].text
 
         logger.info("Claude API responded (%d chars)", len(text))
         logger.debug("Response content:\n%s\n%s\n%s", "-" * 50, text, "-" * 50)
         return text
 
-    # ------------------------------------------------------------------ #
-    #  JSON extraction helpers
-    # ------------------------------------------------------------------ #
-    def _extract_json_from_response(response: str) -> Optional[str]:
-        """Extract JSON payload from an LLM response that may contain markdown."""
-        # Method 1: ```json … ``` code block
-        code_match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", response, re.IGNORECASE)
-        if code_match:
-            return code_match.group(1).strip()
-
-        # Method 2: balanced bracket matching for [ … ]
-        start = response.find("[")
-        if start != -1:
-            depth = 0
-            for i in range(start, len(response)):
-                if response[i] == "[":
-                    depth += 1
-                elif response[i] == "]":
-                    depth -= 1
-                    if depth == 0:
-                        return response[start : i + 1]
-
-        # Method 3: collect individual { … } objects
-        objects = re.findall(r"\{[\s\S]*?\}", response)
-        if objects:
-            return "[" + ",".join(objects) + "]"
-
-        logger.warning("Could not extract JSON from response")
-        return None
-
-    def _parse_questions_json(raw: str, count: int, fallback_type: QuestionType) -> List[Dict[str, Any]]:
-        """Parse raw LLM text into a list of question dicts with fallback."""
-        # Attempt 1: direct parse
-        try:
-            data = json.loads(raw)
-        except json.JSONDecodeError:
-            logger.debug("Direct JSON parse failed, attempting extraction…")
-            extracted = _extract_json_from_response(raw)
-            if not extracted:
-                logger.error("JSON extraction returned nothing")
-                return []
-            try:
-                data = json.loads(extracted)
-            except json.JSONDecodeError as exc:
-                logger.error("JSON parse failed after extraction: %s", exc)
-                return []
-
-        # Handle {"questions": [...]} wrapper format (backward compatibility)
-        if isinstance(data, dict) and "questions" in data:
-            logger.debug("Unwrapping 'questions' field from response object")
-            data = data["questions"]
-
-        if not isinstance(data, list):
-            logger.error("Expected list, got %s", type(data).__name__)
-            return []
-
-        logger.info("Parsed %d questions from response", len(data))
-        for i, q in enumerate(data[:count]):
-            logger.debug(
-                "Question %d: prompt=%s, answer=%s",
-                i + 1,
-                q.get("prompt", "N/A")[:80],
-                str(q.get("answer", "N/A"))[:80],
-            )
-        return data[:count]
-
-    # ------------------------------------------------------------------ #
-    #  Question-type detection
-    # ------------------------------------------------------------------ #
-    def detect_question_type_from_template(template_content: str) -> List[QuestionType]:
-        """Detect question types from template content keywords."""
-        lower = template_content.lower()
-        detected: List[QuestionType] = []
-
-        keyword_map = {
-            QuestionType.SINGLE_CHOICE: ["選擇", "choice", "選項", "option", "abcd", "a.", "b.", "c.", "d."],
-            QuestionType.CLOZE: ["填空", "cloze", "___", "____", "空格", "blank"],
-            QuestionType.SHORT_ANSWER: ["簡答", "short answer", "說明", "解釋", "描述"],
-            QuestionType.TRUE_FALSE: ["是非", "true false", "對錯", "正確錯誤", "true/false"],
-            QuestionType.MATCHING: ["配對", "matching", "連連看", "配連", "對應"],
+    def _cache_params(api_params: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "model": api_params["model"],
+            "prompt": prompt_text(api_params),
+            "max_tokens": api_params["max_tokens"],
+            "temperature": api_params["temperature"],
+            "top_p": api_params.get("top_p"),
         }
 
-        for qtype, keywords in keyword_map.items():
-            if any(kw in lower for kw in keywords):
-                detected.append(qtype)
-
-        if not detected:
-            detected = [QuestionType.SINGLE_CHOICE, QuestionType.CLOZE, QuestionType.SHORT_ANSWER]
-
-        return detected
-
-    # ------------------------------------------------------------------ #
-    #  Question format validation
-    # ------------------------------------------------------------------ #
-    def validate_question_format(questions: List[Dict[str, Any]], question_type: str) -> List[Dict[str, Any]]:
-        """Validate generated questions match the expected format for the given type."""
-        validated = []
-
-        for q in questions:
-            if not q.get("prompt") or not q.get("answer") or not q.get("explanation"):
-                logger.warning("Question missing required fields: %s", list(q.keys()))
-                continue
-
-            if question_type == "true_false":
-                if str(q.get("answer", "")).lower() not in ("true", "false"):
-                    logger.warning("True/false answer format invalid: %s", q.get("answer"))
-                    continue
-
-            elif question_type == "matching":
-                qd = q.get("question_data")
-                # 容錯：如果 question_data 不存在，嘗試從頂層字段構建
-                if not qd:
-                    left_top = q.get("left_items")
-                    right_top = q.get("right_items")
-                    if isinstance(left_top, list) and isinstance(right_top, list) and left_top and right_top:
-                        qd = {"left_items": left_top, "right_items": right_top}
-                        q["question_data"] = qd
-                        logger.info("Matching: auto-constructed question_data from top-level fields")
-                    else:
-                        logger.warning("Matching question missing question_data and no fallback fields found: %s", list(q.keys()))
-                        continue
-                left = qd.get("left_items")
-                right = qd.get("right_items")
-                if not isinstance(left, list) or not isinstance(right, list) or not left or not right:
-                    logger.warning("Matching question_data format invalid: left=%s, right=%s", type(left), type(right))
-                    continue
-
-            elif question_type == "single_choice":
-                opts = q.get("options")
-                if not isinstance(opts, list) or len(opts) < 2:
-                    logger.warning("Single-choice options invalid")
-                    continue
-
-            elif question_type == "sequence":
-                items = q.get("items")
-                answer = q.get("answer")
-                if not isinstance(items, list) or not items:
-                    logger.warning("Sequence question missing or invalid 'items' array")
-                    continue
-                if not isinstance(answer, list) or not answer:
-                    logger.warning("Sequence question missing or invalid 'answer' array")
-                    continue
-
-            elif question_type == "enumeration":
-                answer = q.get("answer")
-                if not isinstance(answer, list) or not answer:
-                    logger.warning("Enumeration question missing or invalid 'answer' array")
-                    continue
-
-            elif question_type == "symbol_identification":
-                symbols = q.get("symbols")
-                if not isinstance(symbols, list) or not symbols:
-                    logger.warning("Symbol identification question missing or invalid 'symbols' array")
-                    continue
+    async def _call_claude(
+        prompt: PromptParts,
+        *,
+        model: str = MODEL_NAME,
+        max_tokens: int = 16384,
+        temperature: float = 0.7,
+        top_p: Optional[float] = None,
+    ) -> str:
+        """Send a prompt to Claude, serving identical requests from the response cache.
 
-            validated.append(q)
+        The prompt prefix carries a prompt-caching breakpoint when it is long
+        enough (see app.core.prompt_cache).
+        """
+        api_params = build_api_params(
+            prompt, model=model, max_tokens=max_tokens, temperature=temperature, top_p=top_p
+        )
+        return await llm_cache.get_or_call(
+            _cache_params(api_params), lambda: _request_claude(api_params)
+        )
 
-        logger.info("Validation: %d/%d questions passed", len(validated), len(questions))
-        return validated
+    async def _stream_claude(
+        prompt: PromptParts,
+        *,
+        model: str = MODEL_NAME,
+        max_tokens: int = 16384,
+        temperature: float = 0.7,
+        top_p: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Stream text deltas from Claude.
+
+        A cached response is yielded as a single delta. Failures are retried
+        like _call_claude only while nothing has been yielded yet; the full
+        text is cached once the stream completes.
+        """
+        api_params = build_api_params(
+            prompt, model=model, max_tokens=max_tokens, temperature=temperature, top_p=top_p
+        )
+        cache_params = _cache_params(api_params)
+        cached = await llm_cache.lookup(cache_params)
+        if cached is not None:
+            yield cached
+            return
+
+        parts: List[str] = []
+        estimated = estimate_tokens(cache_params["prompt"])
+        for attempt in range(1, _MAX_ATTEMPTS + 1):
+            try:
+                async with claude_limiter.slot(estimated):
+                    logger.info("Streaming request to Claude API…")
+                    try:
+                        async with stream_message(claude_client, api_params) as stream:
+                            async for text in stream.text_stream:
+                                parts.append(text)
+                                yield text
+                            final = await stream.get_final_message()
+                    except RateLimitError as exc:
+                        claude_limiter.on_rate_limited(_retry_after_seconds(exc))
+                        raise
+                    claude_limiter.on_success(
+                        billed_input_tokens(final.usage), final.usage.output_tokens, estimated
+                    )
+                prompt_cache_stats.record(api_params, final.usage)
+                break
+            except (APIError, APITimeoutError) as exc:
+                if parts or attempt == _MAX_ATTEMPTS:
+                    raise
+                delay = 0 if isinstance(exc, RateLimitError) else min(8, 2 ** attempt)
+                logger.warning(
+                    "Claude streaming call failed (attempt %d), retrying in %ds…", attempt, delay
+                )
+                await asyncio.sleep(delay)
+
+        text = "".join(parts)
+        logger.info("Claude API stream finished (%d chars)", len(text))
+        await llm_cache.store(cache_params, text)
 
     # ------------------------------------------------------------------ #
     #  Type hints for prompt-mode generation
@@ -289,22 +419,65 @@ if not USE_MOCK_API:
     }
 
     # ------------------------------------------------------------------ #
-    #  Shared JSON-format suffix
+    #  Prompt builders (shared by the blocking and streaming variants)
     # ------------------------------------------------------------------ #
-    _JSON_FORMAT_SUFFIX = """
-請生成{count}道題目，並以 JSON 格式回傳，格式如下：
+    # The template and document context form the cacheable prefix; counts,
+    # type hints and fan-out hints go into the suffix after the breakpoint.
+    # prefix + suffix is exactly the prompt text sent before the split.
+    def _free_prompt(prompt: str, question_type: str, buffer_count: int, hint: str = "") -> PromptParts:
+        suffix = hint
+        if question_type in _TYPE_HINTS:
+            suffix += f"\n\n格式要求：{_TYPE_HINTS[question_type]}"
+        suffix += f"\n\nIMPORTANT: Please generate exactly {buffer_count} questions in total."
+        return PromptParts(prompt, suffix)
+
+    def _type_prompt(
+        context: str,
+        question_type: QuestionType,
+        count: int,
+        subject: Optional[Subject],
+    ) -> PromptParts:
+        if subject is None:
+            return PromptParts(context, _JSON_FORMAT_SUFFIX.format(count=count))
+
+        type_prompts = {
+            QuestionType.SINGLE_CHOICE: "單選題，需要提供4個選項（A、B、C、D）",
+            QuestionType.CLOZE: "完形填空題，在適當位置留下空格",
+            QuestionType.SHORT_ANSWER: "簡答題，需要簡短但完整的答案",
+            QuestionType.TRUE_FALSE: "是非題，學生需判斷陳述正確或錯誤",
+            QuestionType.MATCHING: "配對題，提供左右兩列項目供學生配對，需包含question_data欄位",
+        }
+        subject_names = {
+            Subject.HEALTH: "健康",
+            Subject.ENGLISH: "英文",
+            Subject.HISTORY: "歷史",
+        }
+        # 題數在開頭，prefix 只在同一科目、題型與題數間共用；文字與拆分前完全相同
+        prefix = f"""
+你是一位專業的{subject_names[subject]}老師。基於以下教材內容，製作{count}道{type_prompts[question_type]}。
+
+教材內容：
+{context}
+"""
+        suffix = f"""
+要求：
+1. 題目必須基於提供的教材內容
+2. 生成{count}道{question_type.value}題目
+3. 每題都要包含詳細解釋
+4. 請以 JSON 格式回傳，格式如下：
 
 [
-  {{
+  {{{{
     "prompt": "題目內容",
-    "options": ["A. 選項1", "B. 選項2", "C. 選項3", "D. 選項4"],  // 僅單選題需要，其他題型可省略
+    "options": ["A. 選項1", "B. 選項2", "C. 選項3", "D. 選項4"],  // 僅單選題需要
     "answer": "正確答案",
     "explanation": "詳細解釋"
-  }}
+  }}}}
 ]
 
 請確保生成的是有效的 JSON 格式。
 """
+        return PromptParts(prefix, suffix)
 
     # ------------------------------------------------------------------ #
     #  Public generation functions
@@ -314,16 +487,25 @@ if not USE_MOCK_API:
         template_content: str,
         count: int,
     ) -> List[Dict[str, Any]]:
-        """Generate questions based on a template."""
+        """Generate questions based on a template.
+
+        Large counts are fanned out into concurrent shards, each with its own
+        slice of the context (see app.core.fanout).
+        """
         logger.info("Template generation — requesting %d questions", count)
 
-        full_prompt = (
-            template_content.replace("{{context}}", context)
-            + _JSON_FORMAT_SUFFIX.format(count=count)
-        )
+        shard_counts = plan_shards(count)
+        if len(shard_counts) > 1:
+            async def generate_shard(shard: Shard) -> List[Dict[str, Any]]:
+                raw = await _call_claude(
+                    template_prompt(shard.context, template_content, shard.count, shard.hint)
+                )
+                return parse_questions_json(raw, shard.count, QuestionType.SINGLE_CHOICE, "auto")
+
+            return await fan_out(count, generate_shard, context=context, shard_counts=shard_counts)
 
-        raw = await _call_claude(full_prompt)
-        return _parse_questions_json(raw, count, QuestionType.SINGLE_CHOICE)
+        raw = await _call_claude(template_prompt(context, template_content, count))
+        return parse_questions_json(raw, count, QuestionType.SINGLE_CHOICE, "auto")
 
     async def generate_questions_by_prompt(
         prompt: str,
@@ -335,7 +517,13 @@ if not USE_MOCK_API:
         top_p: Optional[float] = None,
         frequency_penalty: Optional[float] = None,
     ) -> List[Dict[str, Any]]:
-        """Generate questions from a free-form prompt with optional type hints."""
+        """Generate questions from a free-form prompt with optional type hints.
+
+        Large counts are fanned out into concurrent shards that differ only by
+        a diversity hint, since the prompt already carries its own context.
+        frequency_penalty is accepted for template compatibility; the Claude
+        Messages API has no such parameter, so it is not sent.
+        """
         detected_type = question_type or "single_choice"
         buffer_count = count + _LLM_BUFFER_COUNT
         logger.info(
@@ -343,22 +531,23 @@ if not USE_MOCK_API:
             count, detected_type, buffer_count,
         )
 
-        final_prompt = prompt
-        if detected_type in _TYPE_HINTS:
-            final_prompt += f"\n\n格式要求：{_TYPE_HINTS[detected_type]}"
-        final_prompt += f"\n\nIMPORTANT: Please generate exactly {buffer_count} questions in total."
-
-        raw = await _call_claude(
-            final_prompt,
-            model=model,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            top_p=top_p,
-        )
-
-        questions = _parse_questions_json(raw, buffer_count, QuestionType.SINGLE_CHOICE)
+        async def generate_shard(shard: Shard) -> List[Dict[str, Any]]:
+            shard_buffer = shard.count + _LLM_BUFFER_COUNT
+            raw = await _call_claude(
+                _free_prompt(prompt, detected_type, shard_buffer, shard.hint),
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+            )
+            questions = parse_questions_json(raw, shard_buffer, QuestionType.SINGLE_CHOICE)
+            return validate_question_format(questions, detected_type)
 
-        validated = validate_question_format(questions, detected_type)
+        shard_counts = plan_shards(count)
+        if len(shard_counts) > 1:
+            validated = await fan_out(count, generate_shard, shard_counts=shard_counts)
+        else:
+            validated = await generate_shard(Shard(0, 1, count, "", ""))
         if not validated:
             logger.warning("All questions failed validation, returning empty list")
             return []
@@ -375,45 +564,92 @@ if not USE_MOCK_API:
         subject: Optional[Subject] = None,
     ) -> List[Dict[str, Any]]:
         """Generate questions by type — traditional mode or template-passthrough."""
-        if subject is None:
-            full_prompt = context + _JSON_FORMAT_SUFFIX.format(count=count)
-        else:
-            type_prompts = {
-                QuestionType.SINGLE_CHOICE: "單選題，需要提供4個選項（A、B、C、D）",
-                QuestionType.CLOZE: "完形填空題，在適當位置留下空格",
-                QuestionType.SHORT_ANSWER: "簡答題，需要簡短但完整的答案",
-                QuestionType.TRUE_FALSE: "是非題，學生需判斷陳述正確或錯誤",
-                QuestionType.MATCHING: "配對題，提供左右兩列項目供學生配對，需包含question_data欄位",
-            }
-            subject_names = {
-                Subject.HEALTH: "健康",
-                Subject.ENGLISH: "英文",
-                Subject.HISTORY: "歷史",
-            }
-            full_prompt = f"""
-你是一位專業的{subject_names[subject]}老師。基於以下教材內容，製作{count}道{type_prompts[question_type]}。
-
-教材內容：
-{context}
+        logger.info("Type generation (%s) — requesting %d questions", question_type.value, count)
+        raw = await _call_claude(_type_prompt(context, question_type, count, subject))
+        return parse_questions_json(raw, count, question_type, question_type.value)
 
-要求：
-1. 題目必須基於提供的教材內容
-2. 生成{count}道{question_type.value}題目
-3. 每題都要包含詳細解釋
-4. 請以 JSON 格式回傳，格式如下：
+    # ------------------------------------------------------------------ #
+    #  Streaming generation — yield each question as soon as it is parsed
+    # ------------------------------------------------------------------ #
+    async def _stream_questions(
+        prompt: PromptParts,
+        count: int,
+        question_type: str,
+        **call_kwargs: Any,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a completion and yield up to `count` validated questions.
+
+        Questions are extracted incrementally with JsonObjectExtractor, which
+        accepts the same response shapes as parse_questions_json. Reaching
+        `count` closes the stream early.
+        """
+        extractor = JsonObjectExtractor()
+        emitted = 0
+        stream = _stream_claude(prompt, **call_kwargs)
+        try:
+            async for delta in stream:
+                for question in extractor.feed(delta):
+                    if not isinstance(question, dict):
+                        continue
+                    if not validate_question_format([question], question_type):
+                        continue
+                    yield question
+                    emitted += 1
+                    if emitted >= count:
+                        return
+        finally:
+            await stream.aclose()
+
+        if emitted == 0:
+            logger.error(
+                "No valid questions in streamed response (%d parse errors, truncated=%s)",
+                len(extractor.errors),
+                extractor.truncated,
+            )
 
-[
-  {{{{
-    "prompt": "題目內容",
-    "options": ["A. 選項1", "B. 選項2", "C. 選項3", "D. 選項4"],  // 僅單選題需要
-    "answer": "正確答案",
-    "explanation": "詳細解釋"
-  }}}}
-]
+    def stream_questions_by_template(
+        context: str,
+        template_content: str,
+        count: int,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of generate_questions_by_template."""
+        logger.info("Template generation (stream) — requesting %d questions", count)
+        return _stream_questions(template_prompt(context, template_content, count), count, "auto")
 
-請確保生成的是有效的 JSON 格式。
-"""
+    def stream_questions_by_prompt(
+        prompt: str,
+        count: int,
+        temperature: float = 0.7,
+        max_tokens: int = 16384,
+        model: str = MODEL_NAME,
+        question_type: Optional[str] = None,
+        top_p: Optional[float] = None,
+        frequency_penalty: Optional[float] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of generate_questions_by_prompt (same parameters)."""
+        detected_type = question_type or "single_choice"
+        buffer_count = count + _LLM_BUFFER_COUNT
+        logger.info(
+            "Prompt generation (stream) — requesting %d questions (type=%s)", count, detected_type
+        )
+        return _stream_questions(
+            _free_prompt(prompt, detected_type, buffer_count),
+            count,
+            detected_type,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+        )
 
-        logger.info("Type generation (%s) — requesting %d questions", question_type.value, count)
-        raw = await _call_claude(full_prompt)
-        return _parse_questions_json(raw, count, question_type)
+    def stream_questions_by_type(
+        context: str,
+        question_type: QuestionType,
+        count: int,
+        subject: Optional[Subject] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of generate_questions_by_type."""
+        logger.info("Type generation (%s, stream) — requesting %d questions", question_type.value, count)
+        return _stream_questions(
+            _type_prompt(context, question_type, count, subject), count, question_type.value
+        )
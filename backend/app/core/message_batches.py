@@ -0,0 +1,135 @@
+# app/core/message_batches.py
+"""
+Anthropic Message Batches API client — 離線大量生成用。
+
+批次請求以較低優先權非同步處理（通常一小時內、最長 24 小時完成），
+價格約為即時請求的一半，也不佔用即時請求的速率額度。anthropic 0.34
+SDK 尚未包含 batches，這裡直接以 httpx 呼叫 REST API：
+
+- create(requests)：``POST /v1/messages/batches``，每個請求為
+  ``{"custom_id": ..., "params": <messages.create 參數>}``
+- wait(batch_id)：每 MESSAGE_BATCH_POLL_SECONDS 秒查詢一次，直到
+  processing_status 為 ended；on_poll 可用來回報進度（或中止）
+- results(batch)：以串流逐行讀取 results_url 的 JSONL，不把整份結果載入記憶體
+
+transport 參數可換成 httpx.MockTransport（見 FakeMessageBatchServer），
+測試與離線環境不需要網路。
+"""
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from app.core.config import ANTHROPIC_API_KEY, ANTHROPIC_BASE_URL, LLM_BACKEND, MESSAGE_BATCH_POLL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.anthropic.com"
+API_VERSION = "2023-06-01"
+BETA_FEATURES = "message-batches-2024-09-24,prompt-caching-2024-07-31"
+_BATCHES_PATH = "/v1/messages/batches"
+
+
+class MessageBatchError(RuntimeError):
+    """Message Batches API 回應錯誤"""
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    """取出 message 物件中所有 text 區塊的文字"""
+    return "".join(
+        block.get("text", "") for block in message.get("content") or [] if block.get("type") == "text"
+    )
+
+
+class MessageBatchClient:
+    def __init__(
+        self,
+        api_key: Optional[str] = ANTHROPIC_API_KEY,
+        base_url: Optional[str] = ANTHROPIC_BASE_URL,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        timeout: float = 60.0,
+    ):
+        self._client = httpx.AsyncClient(
+            base_url=base_url or DEFAULT_BASE_URL,
+            headers={
+                "x-api-key": api_key or "",
+                "anthropic-version": API_VERSION,
+                "anthropic-beta": BETA_FEATURES,
+            },
+            transport=transport,
+            timeout=timeout,
+        )
+
+    async def __aenter__(self) -> "MessageBatchClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    # ------------------------------------------------------------------ #
+    #  Public API
+    # ------------------------------------------------------------------ #
+    async def create(self, requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """建立批次；回傳 message_batch 物件"""
+        batch = await self._request("POST", _BATCHES_PATH, json={"requests": requests})
+        logger.info("建立 message batch %s（%d 個請求）", batch["id"], len(requests))
+        return batch
+
+    async def retrieve(self, batch_id: str) -> Dict[str, Any]:
+        return await self._request("GET", f"{_BATCHES_PATH}/{batch_id}")
+
+    async def cancel(self, batch_id: str) -> Dict[str, Any]:
+        logger.info("取消 message batch %s", batch_id)
+        return await self._request("POST", f"{_BATCHES_PATH}/{batch_id}/cancel")
+
+    async def wait(
+        self,
+        batch_id: str,
+        poll_interval: float = MESSAGE_BATCH_POLL_SECONDS,
+        on_poll: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    ) -> Dict[str, Any]:
+        """輪詢直到批次結束，回傳最終的 message_batch 物件"""
+        while True:
+            batch = await self.retrieve(batch_id)
+            if on_poll is not None:
+                await on_poll(batch)
+            if batch["processing_status"] == "ended":
+                return batch
+            await asyncio.sleep(poll_interval)
+
+    async def results(self, batch: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """逐筆產生批次結果 ``{"custom_id", "result": {"type", "message" | "error"}}``"""
+        url = batch.get("results_url")
+        if not url:
+            raise MessageBatchError(f"批次 {batch.get('id')} 尚未產生結果")
+        async with self._client.stream("GET", url) as resp:
+            if resp.status_code >= 400:
+                await resp.aread()
+                raise MessageBatchError(f"讀取批次結果失敗 ({resp.status_code}): {resp.text[:200]}")
+            async for line in resp.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+    # ------------------------------------------------------------------ #
+    #  Internals
+    # ------------------------------------------------------------------ #
+    async def _request(self, method: str, url: str, **kwargs: Any) -> Dict[str, Any]:
+        resp = await self._client.request(method, url, **kwargs)
+        if resp.status_code >= 400:
+            raise MessageBatchError(f"Message Batches API 錯誤 ({resp.status_code}): {resp.text[:200]}")
+        return resp.json()
+
+
+def message_batch_client() -> MessageBatchClient:
+    """建立連到設定中 API 的 client；LLM_BACKEND=fake 時改接本機的假批次服務"""
+    if LLM_BACKEND == "fake":
+        from app.core.fake_llm import fake_llm_server
+        from app.core.fake_message_batches import FakeMessageBatchServer
+
+        return MessageBatchClient(transport=FakeMessageBatchServer(responder=fake_llm_server.respond).transport)
+    return MessageBatchClient()
@@ -0,0 +1,131 @@
+# app/core/prompt_cache.py
+"""
+Claude prompt caching — 穩定前綴加 cache_control 斷點。
+
+同一個模板與文件組合常在短時間內重複生成（老師反覆調整同一章節），
+每次都重新處理整份模板與教材的輸入 token。prompt 因此拆成兩段：
+
+- prefix：模板與文件內容，在同一組模板 / 文件間不變，
+  區塊加上 ``cache_control: {"type": "ephemeral"}``
+- suffix：題數、題型提示、分片提示等每次不同的部分，放在斷點之後
+
+兩段依序放在同一則 user 訊息的兩個 text 區塊，合起來就是拆分前的 prompt
+文字，不另加系統指示。prefix 估計不足 PROMPT_CACHE_MIN_TOKENS 時不加斷點——
+Claude 不快取過短的前綴，加了也只是多走 beta 端點。有斷點的請求走
+``client.beta.prompt_caching.messages``（anthropic 0.34 的 prompt caching
+端點），usage 中的 cache_read / cache_creation token 由
+prompt_cache_stats 累計，供 /api/generate/prompt-cache/stats。
+"""
+from typing import Any, Dict, NamedTuple, Optional
+
+from app.core.config import PROMPT_CACHE_ENABLED, PROMPT_CACHE_MIN_TOKENS
+from app.core.tokens import estimate_tokens
+
+_EPHEMERAL = {"type": "ephemeral"}
+
+
+class PromptParts(NamedTuple):
+    prefix: str  # 穩定部分：模板、文件內容
+    suffix: str = ""  # 變動部分：題數、題型與分片提示
+
+    @property
+    def text(self) -> str:
+        return self.prefix + self.suffix
+
+
+def build_api_params(
+    parts: PromptParts,
+    *,
+    model: str,
+    max_tokens: int,
+    temperature: float,
+    top_p: Optional[float] = None,
+    cache_enabled: bool = PROMPT_CACHE_ENABLED,
+    min_tokens: int = PROMPT_CACHE_MIN_TOKENS,
+) -> Dict[str, Any]:
+    """組出 messages.create 的參數；prefix 夠長時在 prefix 區塊加上快取斷點"""
+    prefix_block: Dict[str, Any] = {"type": "text", "text": parts.prefix}
+    if cache_enabled and parts.prefix and estimate_tokens(parts.prefix) >= min_tokens:
+        prefix_block["cache_control"] = _EPHEMERAL
+    content = [
+        block
+        for block in (prefix_block, {"type": "text", "text": parts.suffix})
+        if block["text"]  # API 不接受空白的 text 區塊
+    ]
+    api_params: Dict[str, Any] = {
+        "model": model,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "messages": [{"role": "user", "content": content}],
+    }
+    if top_p is not None:
+        api_params["top_p"] = top_p
+    return api_params
+
+
+def uses_prompt_cache(api_params: Dict[str, Any]) -> bool:
+    return any("cache_control" in block for block in api_params["messages"][0]["content"])
+
+
+def prompt_text(api_params: Dict[str, Any]) -> str:
+    """請求的完整 prompt 文字（即 PromptParts.text），用於記錄、token 估算與回應快取 key"""
+    return "".join(block["text"] for block in api_params["messages"][0]["content"])
+
+
+async def create_message(client: Any, api_params: Dict[str, Any]) -> Any:
+    """送出請求；有快取斷點時走 prompt caching 端點"""
+    if uses_prompt_cache(api_params):
+        return await client.beta.prompt_caching.messages.create(**api_params)
+    return await client.messages.create(**api_params)
+
+
+def stream_message(client: Any, api_params: Dict[str, Any]) -> Any:
+    """串流版本的 create_message，回傳 ``async with`` 用的 stream manager"""
+    if uses_prompt_cache(api_params):
+        return client.beta.prompt_caching.messages.stream(**api_params)
+    return client.messages.stream(**api_params)
+
+
+def billed_input_tokens(usage: Any) -> int:
+    """計入速率限制的輸入 token：未快取部分加上寫入快取的部分"""
+    return (usage.input_tokens or 0) + (getattr(usage, "cache_creation_input_tokens", None) or 0)
+
+
+class PromptCacheStats:
+    def __init__(self):
+        self.requests = 0
+        self.cacheable_requests = 0  # 帶快取斷點的請求
+        self.cache_hits = 0  # 有讀到快取的請求
+        self.input_tokens = 0  # 未快取的輸入 token
+        self.cache_read_input_tokens = 0
+        self.cache_creation_input_tokens = 0
+        self.output_tokens = 0
+
+    def record(self, api_params: Dict[str, Any], usage: Any) -> None:
+        read = getattr(usage, "cache_read_input_tokens", None) or 0
+        created = getattr(usage, "cache_creation_input_tokens", None) or 0
+        self.requests += 1
+        self.cacheable_requests += uses_prompt_cache(api_params)
+        self.cache_hits += read > 0
+        self.input_tokens += usage.input_tokens or 0
+        self.cache_read_input_tokens += read
+        self.cache_creation_input_tokens += created
+        self.output_tokens += usage.output_tokens or 0
+
+    def stats(self) -> Dict[str, Any]:
+        total_input = self.input_tokens + self.cache_read_input_tokens + self.cache_creation_input_tokens
+        return {
+            "enabled": PROMPT_CACHE_ENABLED,
+            "min_prefix_tokens": PROMPT_CACHE_MIN_TOKENS,
+            "requests": self.requests,
+            "cacheable_requests": self.cacheable_requests,
+            "cache_hits": self.cache_hits,
+            "input_tokens": self.input_tokens,
+            "cache_read_input_tokens": self.cache_read_input_tokens,
+            "cache_creation_input_tokens": self.cache_creation_input_tokens,
+            "output_tokens": self.output_tokens,
+            "cache_read_ratio": self.cache_read_input_tokens / total_input if total_input else 0.0,
+        }
+
+
+prompt_cache_stats = PromptCacheStats()
@@ -0,0 +1,192 @@
+# app/core/rate_limiter.py
+"""
+Claude API 的程序內速率限制 — 所有 _call_claude 共用一個 limiter。
+
+- 並行上限以 AIMD 自動調整：每次成功 +1/limit（約每輪 +1），收到 429
+  時乘以 decrease_factor（冷卻時間內只減一次，避免同一波 429 把上限
+  打到底），並依 retry-after 暫停所有新請求
+- 另以 token bucket 限制每分鐘的請求數、輸入 token（送出前以
+  estimate_tokens 預估，回應後以實際用量校正）與輸出 token（回應後扣除，
+  可以欠額，欠額期間新請求等待）
+- stats() 提供目前上限、執行中與排隊數、等待時間，供 /api/generate/limiter/stats
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.core.config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_MIN_CONCURRENCY,
+    LLM_INITIAL_CONCURRENCY,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_INPUT_TOKENS_PER_MINUTE,
+    LLM_OUTPUT_TOKENS_PER_MINUTE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """每分鐘補充 per_minute 單位的 token bucket（容量為一分鐘額度）；per_minute <= 0 表示不限制"""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.capacity = float(max(per_minute, 0))
+        self._tokens = self.capacity
+        self._rate = self.capacity / 60.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()  # 依序服務等待者
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    async def acquire(self, amount: float) -> None:
+        """等到有 amount 單位可用後扣除（amount 為 0 時只等待欠額補回）"""
+        if not self.enabled:
+            return
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self._rate)
+
+    def charge(self, amount: float) -> None:
+        """事後扣除（可為負數以退回多扣的額度）；餘額可以變成負的"""
+        if not self.enabled:
+            return
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens - amount)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        min_concurrency: int = LLM_MIN_CONCURRENCY,
+        initial_concurrency: int = LLM_INITIAL_CONCURRENCY,
+        requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+        input_tokens_per_minute: int = LLM_INPUT_TOKENS_PER_MINUTE,
+        output_tokens_per_minute: int = LLM_OUTPUT_TOKENS_PER_MINUTE,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 2.0,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency))
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.requests = TokenBucket(requests_per_minute)
+        self.input_tokens = TokenBucket(input_tokens_per_minute)
+        self.output_tokens = TokenBucket(output_tokens_per_minute)
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.completed = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._cond = asyncio.Condition()
+
+    # ------------------------------------------------------------------ #
+    #  Public API
+    # ------------------------------------------------------------------ #
+    @asynccontextmanager
+    async def slot(self, estimated_input_tokens: int = 0) -> AsyncIterator["AdaptiveLimiter"]:
+        """取得一個呼叫名額；離開時釋放"""
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self._cond:
+                await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+                self.in_flight += 1
+        finally:
+            self.waiting -= 1
+
+        try:
+            await self._wait_until_resumed()
+            await self.requests.acquire(1)
+            await self.input_tokens.acquire(estimated_input_tokens)
+            await self.output_tokens.acquire(0)
+            waited = time.monotonic() - start
+            self.acquired += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            yield self
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(
+        self,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        estimated_input_tokens: int = 0,
+    ) -> None:
+        """呼叫成功：加法增加並行上限，並以實際用量校正 token 額度"""
+        self.completed += 1
+        self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+        if input_tokens:
+            self.input_tokens.charge(input_tokens - estimated_input_tokens)
+        self.output_tokens.charge(output_tokens)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """收到 429：乘法減少並行上限，並暫停新請求 retry_after 秒"""
+        self.rate_limited += 1
+        now = time.monotonic()
+        if now - self._last_decrease >= self.decrease_cooldown:
+            self._last_decrease = now
+            previous = self.limit
+            self.limit = max(float(self.min_concurrency), self.limit * self.decrease_factor)
+            logger.warning("Claude API 速率限制，並行上限 %.1f → %.1f", previous, self.limit)
+        self._paused_until = max(self._paused_until, now + (retry_after if retry_after is not None else 1.0))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": int(self.limit),
+            "concurrency_limit_exact": round(self.limit, 2),
+            "max_concurrency": self.max_concurrency,
+            "min_concurrency": self.min_concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "completed": self.completed,
+            "rate_limited": self.rate_limited,
+            "avg_wait_seconds": self.total_wait / self.acquired if self.acquired else 0.0,
+            "max_wait_seconds": self.max_wait,
+            "paused_for_seconds": max(0.0, self._paused_until - time.monotonic()),
+            "requests_available": self.requests.available if self.requests.enabled else None,
+            "input_tokens_available": self.input_tokens.available if self.input_tokens.enabled else None,
+            "output_tokens_available": self.output_tokens.available if self.output_tokens.enabled else None,
+        }
+
+    # ------------------------------------------------------------------ #
+    #  Internals
+    # ------------------------------------------------------------------ #
+    async def _wait_until_resumed(self) -> None:
+        while True:
+            remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+
+claude_limiter = AdaptiveLimiter()
@@ -0,0 +1,25 @@
+# app/core/sse.py
+"""
+Server-Sent Events 輔助函式 — 串流生成端點共用。
+
+每個事件為 ``event: <name>`` 加上一行 JSON ``data:``；回應標頭關閉
+快取與 nginx 緩衝，讓事件一產生就送到瀏覽器。
+"""
+import json
+from typing import Any, AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # 關閉 nginx proxy 緩衝
+}
+
+
+def format_sse(event: str, data: Any) -> str:
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
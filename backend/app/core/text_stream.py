@@ -0,0 +1,114 @@
+# app/core/text_stream.py
+"""
+HTTP 請求本文的串流解碼 — 供 /api/ingest/stream 使用。
+
+請求本文以 bytes 片段逐塊到達，這裡把它轉成文字片段的 async iterator，
+不會把整個本文讀進記憶體：
+
+- text/plain：以增量 UTF-8 解碼器處理，多位元組字元被切在兩個片段之間
+  也能正確解碼
+- application/x-ndjson（或 application/jsonl）：每行一筆 JSON，可以是字串
+  或 ``{"text": "..."}`` 物件；各行的文字依序直接串接（不另加換行）
+
+本文超過 max_bytes、或單行 NDJSON 超過 max_line_bytes 時拋出
+PayloadTooLarge；格式錯誤拋出 ValueError。
+"""
+import codecs
+import json
+from typing import AsyncIterable, AsyncIterator, Optional
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+TEXT_CONTENT_TYPES = ("text/plain",)
+
+
+class PayloadTooLarge(ValueError):
+    """請求本文超過允許的大小"""
+
+
+def media_type(content_type: Optional[str]) -> str:
+    """去掉 charset 等參數，回傳小寫的 media type"""
+    return (content_type or "").split(";", 1)[0].strip().lower()
+
+
+async def iter_text_pieces(
+    body: AsyncIterable[bytes],
+    content_type: Optional[str],
+    max_bytes: int,
+    max_line_bytes: int,
+) -> AsyncIterator[str]:
+    """依 Content-Type 把 bytes 片段解成文字片段"""
+    kind = media_type(content_type)
+    limited = _limit_size(body, max_bytes)
+    if kind in NDJSON_CONTENT_TYPES:
+        async for piece in iter_ndjson_texts(limited, max_line_bytes):
+            yield piece
+    elif kind in TEXT_CONTENT_TYPES or not kind:
+        async for piece in decode_utf8(limited):
+            yield piece
+    else:
+        raise ValueError(f"不支援的 Content-Type: {kind}（請使用 text/plain 或 application/x-ndjson）")
+
+
+async def decode_utf8(body: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """增量 UTF-8 解碼（忽略開頭的 BOM）"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    try:
+        async for data in body:
+            text = decoder.decode(data)
+            if text:
+                yield text
+        text = decoder.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        raise ValueError(f"本文不是有效的 UTF-8: {e}") from e
+    if text:
+        yield text
+
+
+async def iter_ndjson_texts(body: AsyncIterable[bytes], max_line_bytes: int) -> AsyncIterator[str]:
+    """逐行解析 NDJSON，產生每筆的文字"""
+    pending = bytearray()
+    line_number = 0
+    async for data in body:
+        pending += data
+        start = 0
+        while True:
+            newline = pending.find(b"\n", start)
+            if newline < 0:
+                break
+            line_number += 1
+            text = _parse_ndjson_line(bytes(pending[start:newline]), line_number)
+            if text:
+                yield text
+            start = newline + 1
+        del pending[:start]
+        if len(pending) > max_line_bytes:
+            raise PayloadTooLarge(f"NDJSON 第 {line_number + 1} 行超過 {max_line_bytes} bytes")
+    if pending.strip():
+        text = _parse_ndjson_line(bytes(pending), line_number + 1)
+        if text:
+            yield text
+
+
+def _parse_ndjson_line(line: bytes, line_number: int) -> Optional[str]:
+    if not line.strip():
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"NDJSON 第 {line_number} 行不是有效的 JSON: {e}") from e
+    if isinstance(record, dict):
+        record = record.get("text")
+    if record is None:
+        return None
+    if not isinstance(record, str):
+        raise ValueError(f"NDJSON 第 {line_number} 行的 text 必須是字串")
+    return record
+
+
+async def _limit_size(body: AsyncIterable[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    received = 0
+    async for data in body:
+        received += len(data)
+        if received > max_bytes:
+            raise PayloadTooLarge(f"本文超過 {max_bytes} bytes 上限")
+        yield data
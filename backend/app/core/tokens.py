@@ -0,0 +1,22 @@
+# app/core/tokens.py
+"""
+Token 數估算 — 不呼叫 API，供速率限制與 context 預算使用。
+
+Claude 的 tokenizer 大致上：英文等 ASCII 文字約 4 個字元一個 token，
+中日韓等非 ASCII 字元約一個字元一個 token。估算值刻意偏高，寧可多
+保留額度也不要超過上限。
+"""
+import math
+import re
+
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文字的 token 數"""
+    if not text:
+        return 0
+    if text.isascii():
+        return math.ceil(len(text) / 4)
+    ascii_chars = len(_NON_ASCII_RE.sub("", text))
+    return (len(text) - ascii_chars) + math.ceil(ascii_chars / 4)
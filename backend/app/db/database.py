@@ -7,8 +7,8 @@ from app.core.config import DATABASE_URL, USE_MOCK_API
 # 無論 mock 或真實模式，都要有 Base 讓 models.py 能正常繼承
 Base = declarative_base()
 
-if not USE_MOCK_API:
-    # 真實模式：初始化資料庫連線
+if not USE_MOCK_API and DATABASE_URL:
+    # 真實模式：初始化資料庫連線（CLI 以 --database-url 自行連線時可不設定 DATABASE_URL）
     engine = create_async_engine(DATABASE_URL, echo=True)
     AsyncSessionLocal = sessionmaker(
         engine, class_=AsyncSession, expire_on_commit=False
@@ -19,7 +19,7 @@ if not USE_MOCK_API:
             yield session
 
 else:
-    # Mock 模式：不建立任何 DB 連線，呼叫 get_db 時回 503
+    # Mock 模式（或未設定 DATABASE_URL）：不建立任何 DB 連線，呼叫 get_db 時回 503
     engine = None
     AsyncSessionLocal = None
 
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, ARRAY, TIMESTAMP, ForeignKey, JSON, Boolean, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, Text, ARRAY, TIMESTAMP, ForeignKey, JSON, Boolean, UniqueConstraint, Index
+from sqlalchemy.dialects import postgresql
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -18,9 +19,20 @@ class Document(Base):
     image_data = Column(Text, nullable=True)  # base64 儲存
     import_source = Column(String(100), default='manual')
     grade = Column(String(50), nullable=True)  # 年級（任意格式）
+    # 去重指紋（見 app/core/dedup.py）
+    content_hash = Column(String(64), nullable=True, index=True)  # 正規化內容的 SHA-256
+    simhash = Column(BigInteger, nullable=True)  # 64-bit SimHash
+    simhash_bands = Column(postgresql.ARRAY(Integer), nullable=True)  # SimHash 分段，GIN 索引查近似重複
+    # 產生現有 embeddings 時的分塊參數；NULL 表示依 import_source 的預設值（見 document_chunk_params）
+    chunk_size = Column(Integer, nullable=True)
+    chunk_overlap = Column(Integer, nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    __table_args__ = (
+        Index("ix_documents_simhash_bands", "simhash_bands", postgresql_using="gin"),
+    )
+
     # 關係定義
     questions = relationship("Question", back_populates="document")
 
@@ -71,9 +83,14 @@ class Embedding(Base):
     id = Column(Integer, primary_key=True, index=True)
     document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"))
     slice_text = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=True)  # slice_text 的 SHA-256，供增量重建索引比對
     vector = Column(Vector(1536))
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_embeddings_document_id_content_hash", "document_id", "content_hash"),
+    )
+
 class Question(Base):
     __tablename__ = "questions"
     __table_args__ = {"extend_existing": True}
@@ -289,3 +306,60 @@ class ImageQuestion(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
+
+
+class BackgroundJob(Base):
+    """背景工作模型 - 記錄匯入、向量化、批次生成等長時間工作的狀態"""
+    __tablename__ = "jobs"
+
+    id = Column(String(36), primary_key=True)  # UUID
+    job_type = Column(String(50), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default='pending', index=True)  # pending/running/succeeded/failed/cancelled
+    params = Column(JSON, nullable=True)  # 工作參數（JSON 可序列化）
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    progress_done = Column(Integer, default=0)
+    progress_total = Column(Integer, default=0)
+    message = Column(String(255), nullable=True)
+    cancel_requested = Column(Boolean, default=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    started_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    finished_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<BackgroundJob(id='{self.id}', job_type='{self.job_type}', status='{self.status}')>"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "job_type": self.job_type,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "progress_done": self.progress_done or 0,
+            "progress_total": self.progress_total or 0,
+            "message": self.message,
+            "cancel_requested": bool(self.cancel_requested),
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class LLMResponseCache(Base):
+    """LLM 回應快取 - 以請求參數的 SHA-256 為 key（見 app/core/llm_cache.py）"""
+    __tablename__ = "llm_response_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256(model, prompt, max_tokens, temperature, top_p)
+    model = Column(String(100), nullable=False)
+    response = Column(Text, nullable=False)
+    prompt_chars = Column(Integer, default=0)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    last_hit_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), index=True)  # 超過筆數上限時依此淘汰
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<LLMResponseCache(key='{self.key[:12]}', model='{self.model}', hit_count={self.hit_count})>"
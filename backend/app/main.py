@@ -1,8 +1,11 @@
 import uvicorn
 from fastapi import FastAPI
-from app.core.config import USE_MOCK_API, CORS_ORIGINS
-from app.db.database import engine, Base
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.config import USE_MOCK_API, CORS_ORIGINS, check_required_settings
+
+check_required_settings()
+
+from app.db.database import engine, Base  # noqa: E402
 
 
 app = FastAPI(title="EduRAG Backend", debug=True)
@@ -17,10 +20,19 @@ app.add_middleware(
  )
 # 只有在真實模式才自動建立資料表
 if not USE_MOCK_API:
+    from app.core.jobs import job_manager
+    from app.core.executors import shutdown_process_pool
+
     @app.on_event("startup")
     async def on_startup():
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+        await job_manager.start()
+
+    @app.on_event("shutdown")
+    async def on_shutdown():
+        await job_manager.stop()
+        shutdown_process_pool()
 
 # 註冊路由
 from app.routers import health
@@ -40,7 +52,7 @@ if USE_MOCK_API:
     app.include_router(templates_router)
     app.include_router(dashboard_router)
 else:
-    from app.routers import ingest, generate, templates, documents, upload, dashboard, questions, subjects, image_questions, images
+    from app.routers import ingest, generate, templates, documents, upload, dashboard, questions, subjects, image_questions, images, jobs
     app.include_router(ingest.router)
     app.include_router(generate.router)
     app.include_router(templates.router)
@@ -51,6 +63,7 @@ else:
     app.include_router(subjects.router, tags=["subjects"])
     app.include_router(image_questions.router)
     app.include_router(images.router)
+    app.include_router(jobs.router)
 
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -2,10 +2,17 @@ import asyncio
 import time
 import logging
 
+from typing import AsyncIterator
+
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import database
+from app.core.jobs import job_manager
+from app.core.llm_cache import llm_cache, llm_cache_control
+from app.core.prompt_cache import prompt_cache_stats
+from app.core.rate_limiter import claude_limiter
+from app.core.sse import format_sse, sse_response
 from app.schemas.question import (
     GenerateRequest,
     GenerateResponse,
@@ -15,16 +22,23 @@ from app.schemas.question import (
     TemplateGenerateResponse,
     BatchTemplateGenerateRequest,
     BatchTemplateGenerateResponse,
+    BulkGenerateRequest,
     PromptGenerateRequest,
     PromptGenerateResponse,
     TemplateEnhancedGenerateRequest,
     TemplateEnhancedGenerateResponse,
 )
-from app.services.generate_service import GenerateService
+from app.services import bulk_generate_service  # noqa: F401  註冊 bulk_generate 背景工作
+from app.services.generate_service import GenerateService, GenerationStream
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/generate", tags=["generate"])
+
+router = APIRouter(
+    prefix="/api/generate",
+    tags=["generate"],
+    dependencies=[Depends(llm_cache_control)],
+)
 
 
 def _get_service(db: AsyncSession = Depends(database.get_db)) -> GenerateService:
@@ -77,6 +91,58 @@ async def generate_batch(
     )
 
 
+@router.post("/batch/jobs", status_code=202)
+async def submit_generate_batch_job(
+    req: BatchGenerateRequest, bypass_cache: bool = Depends(llm_cache_control)
+):
+    """把批次生成送進背景工作，立即回傳 job ID（以 /api/jobs/{job_id} 查詢結果）"""
+    job_id = await job_manager.submit(
+        "generate_batch",
+        generations=[gen_req.model_dump(mode="json") for gen_req in req.generations],
+        bypass_cache=bypass_cache,
+    )
+    return {"job_id": job_id, "status": "pending"}
+
+
+@router.post("/bulk/jobs", status_code=202)
+async def submit_bulk_generate_job(req: BulkGenerateRequest):
+    """
+    以 Message Batches API 離線大量生成題目並直接寫入題庫
+
+    批次通常在一小時內完成，價格約為即時請求的一半；立即回傳 job ID
+    （以 /api/jobs/{job_id} 查詢進度與結果）
+    """
+    job_id = await job_manager.submit(
+        "bulk_generate",
+        generations=[gen_req.model_dump(mode="json") for gen_req in req.generations],
+    )
+    return {"job_id": job_id, "status": "pending"}
+
+
+@router.get("/cache/stats")
+async def get_llm_cache_stats():
+    """LLM 回應快取的命中率與項目統計"""
+    return await llm_cache.stats()
+
+
+@router.get("/limiter/stats")
+async def get_llm_limiter_stats():
+    """Claude 呼叫限流狀態：目前並行上限、排隊數與等待時間"""
+    return claude_limiter.stats()
+
+
+@router.get("/prompt-cache/stats")
+async def get_prompt_cache_stats():
+    """Claude prompt caching 統計：快取讀取與寫入的輸入 token"""
+    return prompt_cache_stats.stats()
+
+
+@router.delete("/cache")
+async def clear_llm_cache():
+    """清除所有 LLM 回應快取"""
+    return {"removed": await llm_cache.clear()}
+
+
 @router.post("/template", response_model=TemplateGenerateResponse)
 async def generate_template(
     req: TemplateGenerateRequest, service: GenerateService = Depends(_get_service)
@@ -148,3 +214,90 @@ async def generate_template_enhanced(
     except Exception as e:
         logger.error("模板生成失敗: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"模板生成失敗: {str(e)}")
+
+
+# ------------------------------------------------------------------ #
+#  串流生成（SSE）
+#
+#  事件依序為 start → question（每題一次）→ done；生成中途失敗時送出
+#  error 事件後結束。DB 查詢與驗證錯誤在串流開始前以一般 HTTP 錯誤回應。
+# ------------------------------------------------------------------ #
+async def _question_events(
+    stream: GenerationStream, start_time: float
+) -> AsyncIterator[str]:
+    yield format_sse("start", {**stream.meta, "requested": stream.requested})
+
+    count = 0
+    first_question_time = None
+    try:
+        async for item in stream.items:
+            if first_question_time is None:
+                first_question_time = time.time() - start_time
+            yield format_sse("question", {"index": count, "item": item.model_dump(mode="json")})
+            count += 1
+    except Exception as e:
+        logger.error("串流生成失敗: %s", e, exc_info=True)
+        yield format_sse("error", {"detail": f"題目生成失敗: {str(e)}", "count": count})
+        return
+
+    done = {
+        "count": count,
+        "requested": stream.requested,
+        "generation_time": time.time() - start_time,
+        "time_to_first_question": first_question_time,
+    }
+    if stream.summarize is not None:
+        done.update(stream.summarize(count))
+    logger.info(
+        "串流生成完成：%d/%d 題，首題 %.2f 秒",
+        count, stream.requested, first_question_time or 0.0,
+    )
+    yield format_sse("done", done)
+
+
+@router.post("/stream")
+async def generate_stream(
+    req: GenerateRequest, service: GenerateService = Depends(_get_service)
+):
+    """基本生成的串流版本（SSE）"""
+    start_time = time.time()
+    try:
+        stream = await service.stream_basic(req)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return sse_response(_question_events(stream, start_time))
+
+
+@router.post("/template/stream")
+async def generate_template_stream(
+    req: TemplateGenerateRequest, service: GenerateService = Depends(_get_service)
+):
+    """模板生成的串流版本（SSE）"""
+    start_time = time.time()
+    try:
+        stream = await service.stream_from_template(req)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return sse_response(_question_events(stream, start_time))
+
+
+@router.post("/prompt/stream")
+async def generate_prompt_stream(
+    req: PromptGenerateRequest, service: GenerateService = Depends(_get_service)
+):
+    """Prompt 生成的串流版本（SSE）"""
+    start_time = time.time()
+    stream = await service.stream_from_prompt(req)
+    return sse_response(_question_events(stream, start_time))
+
+
+@router.post("/template-enhanced/stream")
+async def generate_template_enhanced_stream(
+    req: TemplateEnhancedGenerateRequest,
+    service: GenerateService = Depends(_get_service),
+):
+    """增強模板生成的串流版本（SSE）；done 事件附帶 warning / is_fallback"""
+    start_time = time.time()
+    stream = await service.stream_template_enhanced(req)
+    return sse_response(_question_events(stream, start_time))
+
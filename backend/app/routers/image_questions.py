@@ -6,7 +6,12 @@ import logging
 
 from app.db.database import get_db
 from app.core.config import USE_MOCK_API
-from app.services.image_question_service import ImageQuestionService, MockImageQuestionService
+from app.core.executors import run_cpu_bound
+from app.services.image_question_service import (
+    ImageQuestionService,
+    MockImageQuestionService,
+    parse_image_question_excel,
+)
 from app.services.subject_service import SubjectService
 from app.schemas.image_question import (
     ImageQuestionCreate,
@@ -95,7 +100,11 @@ async def upload_excel(
                 detail=f"檔案太大，最大允許 {MAX_FILE_SIZE // (1024 * 1024)}MB"
             )
 
-        preview = service.parse_excel(contents, file.filename)
+        if isinstance(service, MockImageQuestionService):
+            preview = service.parse_excel(contents, file.filename)
+        else:
+            # 解析在 process pool 執行，不阻塞 event loop
+            preview = await run_cpu_bound(parse_image_question_excel, contents, file.filename)
 
         if preview_only:
             return preview
@@ -1,54 +1,56 @@
 import time
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import models, database
-from app.schemas.ingest import IngestRequest, IngestResponse, ChunkInfo
-from app.core.embeddings import create_embedding
-from app.core.config import DEFAULT_CHUNK_SIZE, CHUNK_OVERLAP
+from app.schemas.ingest import IngestRequest, IngestResponse, ChunkInfo, NearDuplicate, StreamIngestResponse
+from app.schemas.question import Subject
+from app.core.dedup import document_fingerprint
+from app.services.document_service import DocumentService
+from app.core.embeddings import create_embeddings
+from app.services.indexing_service import store_chunk_embeddings
+from app.core.chunking import iter_chunks
+from app.core.config import STREAM_INGEST_MAX_BYTES, STREAM_INGEST_MAX_LINE_BYTES
+from app.core.text_stream import PayloadTooLarge, iter_text_pieces
+from app.services.stream_ingest_service import StreamIngestor
 
 router = APIRouter(prefix="/api/ingest", tags=["ingest"])
 
-def smart_text_chunking(text: str, max_chunk_size: int = DEFAULT_CHUNK_SIZE, overlap_size: int = CHUNK_OVERLAP) -> List[str]:
-    """智能文本分塊，優於簡單句號分割"""
-    # 先按句號分割
-    sentences = [s.strip() for s in text.split("。") if s.strip()]
-    
-    chunks = []
-    current_chunk = ""
-    
-    for sentence in sentences:
-        # 如果當前塊加上新句子不超過最大長度，就添加
-        if len(current_chunk + sentence) <= max_chunk_size:
-            current_chunk = current_chunk + sentence + "。" if current_chunk else sentence + "。"
-        else:
-            # 否則儲存當前塊並開始新塊
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = sentence + "。"
-    
-    # 添加最後一塊
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-    
-    return chunks
-
 @router.post("/", response_model=IngestResponse)
 async def ingest(request: IngestRequest, db: AsyncSession = Depends(database.get_db)):
     start_time = time.time()
     
     try:
-        # 1. 儲存文件
-        doc = models.Document(
-            subject=request.subject.value,
-            content=request.text,
-            title=request.title
+        # 0. 同科目中內容完全相同的文件已存在時直接回傳（冪等），不重複建立文件與向量
+        service = DocumentService(db)
+        fingerprint = document_fingerprint(request.text)
+        existing = await service.find_documents_by_content_hash(
+            [fingerprint["content_hash"]], subject=request.subject.value
         )
-        db.add(doc)
-        await db.flush()  # 取得 doc.id
-        
-        # 2. 智能文本分塊
-        chunks_text = smart_text_chunking(request.text)
+        if existing:
+            document_id = existing[fingerprint["content_hash"]]
+            result = await db.execute(
+                select(models.Embedding.id, models.Embedding.slice_text)
+                .where(models.Embedding.document_id == document_id)
+                .order_by(models.Embedding.id)
+            )
+            chunk_infos = [
+                ChunkInfo(chunk_id=embedding_id, text=chunk_text, token_count=len(chunk_text))
+                for embedding_id, chunk_text in result.all()
+            ]
+            return IngestResponse(
+                document_id=document_id,
+                chunks=chunk_infos,
+                total_chunks=len(chunk_infos),
+                processing_time=time.time() - start_time,
+                duplicate=True,
+            )
+
+        near_duplicates = await service.find_near_duplicates(fingerprint["simhash"])
+
+        # 1. 智能文本分塊（多分隔符、含重疊）
+        chunks_text = [chunk.text for chunk in iter_chunks(request.text)]
         
         if not chunks_text:
             raise HTTPException(
@@ -56,35 +58,36 @@ async def ingest(request: IngestRequest, db: AsyncSession = Depends(database.get
                 detail="文本內容無法分塊處理"
             )
         
-        # 3. 為每個塊生成embedding並存入資料庫
-        chunk_infos = []
-        for i, chunk_text in enumerate(chunks_text):
-            try:
-                # 生成向量
-                vector = await create_embedding(chunk_text)
-                
-                # 儲存 embedding
-                embedding = models.Embedding(
-                    document_id=doc.id,
-                    slice_text=chunk_text,
-                    vector=vector
-                )
-                db.add(embedding)
-                await db.flush()  # 取得 embedding.id
-                
-                # 建立回傳資訊
-                chunk_info = ChunkInfo(
-                    chunk_id=embedding.id,
-                    text=chunk_text,
-                    token_count=len(chunk_text)  # 簡單的字元計數
-                )
-                chunk_infos.append(chunk_info)
-                
-            except Exception as e:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"處理文本塊 {i+1} 時發生錯誤: {str(e)}"
-                )
+        # 2. 批次生成所有塊的 embedding（在開啟寫入交易之前完成）
+        try:
+            vectors = await create_embeddings(chunks_text)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"生成文本向量時發生錯誤: {str(e)}"
+            )
+
+        # 3. 儲存文件
+        doc = models.Document(
+            subject=request.subject.value,
+            content=request.text,
+            title=request.title,
+            **fingerprint
+        )
+        db.add(doc)
+        await db.flush()  # 取得 doc.id
+
+        # 4. 單一多列 INSERT 寫入所有 embedding，並取得 chunk ID
+        embedding_ids = await store_chunk_embeddings(db, doc.id, chunks_text, vectors)
+
+        chunk_infos = [
+            ChunkInfo(
+                chunk_id=embedding_id,
+                text=chunk_text,
+                token_count=len(chunk_text)  # 簡單的字元計數
+            )
+            for embedding_id, chunk_text in zip(embedding_ids, chunks_text)
+        ]
         
         await db.commit()
         processing_time = time.time() - start_time
@@ -93,7 +96,8 @@ async def ingest(request: IngestRequest, db: AsyncSession = Depends(database.get
             document_id=doc.id,
             chunks=chunk_infos,
             total_chunks=len(chunk_infos),
-            processing_time=processing_time
+            processing_time=processing_time,
+            near_duplicates=[NearDuplicate(**match) for match in near_duplicates]
         )
         
     except HTTPException:
@@ -104,3 +108,53 @@ async def ingest(request: IngestRequest, db: AsyncSession = Depends(database.get
             status_code=500,
             detail=f"文件處理失敗: {str(e)}"
         )
+
+
+@router.post("/stream", response_model=StreamIngestResponse)
+async def ingest_stream(
+    request: Request,
+    subject: Subject = Query(..., description="科目"),
+    title: Optional[str] = Query(None, max_length=200, description="文件標題"),
+    db: AsyncSession = Depends(database.get_db),
+):
+    """
+    串流 ingest：本文為 text/plain 或 NDJSON（每行一個字串或 {"text": ...}）
+
+    邊接收邊分塊、生成向量並分頁寫入，記憶體用量與文本大小無關，
+    適合教科書等級的大型文本；回應只包含統計，不列出每個文本塊。
+    """
+    start_time = time.time()
+    pieces = iter_text_pieces(
+        request.stream(),
+        request.headers.get("content-type"),
+        max_bytes=STREAM_INGEST_MAX_BYTES,
+        max_line_bytes=STREAM_INGEST_MAX_LINE_BYTES,
+    )
+
+    try:
+        result = await StreamIngestor(db).ingest(pieces, subject.value, title)
+        if result["duplicate"]:
+            await db.rollback()
+        else:
+            await db.commit()
+    except PayloadTooLarge as e:
+        await db.rollback()
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"文件處理失敗: {str(e)}"
+        )
+
+    return StreamIngestResponse(
+        processing_time=time.time() - start_time,
+        **{
+            **result,
+            "near_duplicates": [NearDuplicate(**match) for match in result["near_duplicates"]],
+        },
+    )
+
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app.db.database import get_db
+from app.core.jobs import job_manager
+from app.services.job_service import JobService
+from app.schemas.job import JobResponse, JobsListResponse
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+@router.get("/", response_model=JobsListResponse)
+async def get_jobs(
+    job_type: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """取得背景工作清單（新到舊）"""
+    service = JobService(db)
+    result = await service.get_jobs(job_type=job_type, status=status_filter, skip=skip, limit=limit)
+    return JobsListResponse(
+        jobs=[JobResponse.from_orm(job) for job in result["jobs"]],
+        total=result["total"]
+    )
+
+
+@router.get("/stats")
+async def get_job_stats():
+    """本程序的 worker / 佇列狀態"""
+    return job_manager.stats()
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """查詢單一背景工作的狀態、進度與結果"""
+    job = await JobService(db).get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"工作 {job_id} 不存在"
+        )
+    return JobResponse.from_orm(job)
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    取消背景工作
+
+    pending 工作直接標記為 cancelled；running 工作設定取消旗標，
+    由 worker 在下一次回報進度時中止（若在本程序執行則立即中止）。
+    """
+    job = await JobService(db).request_cancel(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"工作 {job_id} 不存在"
+        )
+    if job.status == "running":
+        job_manager.cancel_local(job_id)
+    return JobResponse.from_orm(job)
@@ -1,5 +1,7 @@
+import asyncio
 from fastapi import APIRouter
 from typing import List
+from app.core.sse import format_sse, sse_response
 from app.schemas.question import (
     GenerateRequest, 
     GenerateResponse, 
@@ -31,6 +33,29 @@ async def mock_generate(req: GenerateRequest):
         generation_time=0.8
     )
 
+@router.post("/stream")
+async def mock_generate_stream(req: GenerateRequest):
+    """Mock串流生成API（SSE），事件格式與真實API相同，每題間隔模擬生成延遲"""
+
+    async def events():
+        requested = sum(count for count in req.types.values() if count > 0)
+        yield format_sse("start", {"document_id": req.document_id, "requested": requested})
+        index = 0
+        for question_type, count in req.types.items():
+            for i in range(count):
+                await asyncio.sleep(0.2)
+                item = _create_mock_question(question_type, i + 1, req.subject.value, req.document_id)
+                yield format_sse("question", {"index": index, "item": item.model_dump(mode="json")})
+                index += 1
+        yield format_sse("done", {
+            "count": index,
+            "requested": requested,
+            "generation_time": 0.2 * index,
+            "time_to_first_question": 0.2 if index else None,
+        })
+
+    return sse_response(events())
+
 def _create_mock_question(question_type: QuestionType, index: int, subject: str, document_id: int) -> QuestionItem:
     """建立單個模擬題目"""
     
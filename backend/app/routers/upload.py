@@ -2,9 +2,14 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
+from app.core.executors import run_cpu_bound
 from app.services.document_service import DocumentService
 from app.services.subject_service import SubjectService
-from app.services.upload_service import parse_excel, save_documents
+from app.services.upload_service import (
+    parse_excel,
+    save_documents,
+    enqueue_embedding_job,
+)
 from typing import Dict, Any
 import pandas as pd
 import io
@@ -42,7 +47,10 @@ async def upload_excel(
 
     try:
         contents = await file.read()
-        processed_documents = parse_excel(contents, file.filename)
+        # 解析在 process pool 執行，不阻塞 event loop
+        processed_documents, row_errors = await run_cpu_bound(
+            parse_excel, contents, file.filename
+        )
 
         if preview_only:
             return {
@@ -50,19 +58,26 @@ async def upload_excel(
                 "file_name": file.filename,
                 "total_documents": len(processed_documents),
                 "documents": processed_documents,
+                "row_errors": row_errors,
                 "preview_mode": True,
             }
 
-        saved_count = await save_documents(
+        saved, failed = await save_documents(
             processed_documents, service, subject_service
         )
+        row_errors.extend(failed)
+
+        # 向量化與索引在背景執行，上傳請求不等待
+        embedding_job_id = await enqueue_embedding_job(saved)
 
         return {
-            "message": f"成功上傳並儲存 {saved_count} 筆文件",
+            "message": f"成功上傳並儲存 {len(saved)} 筆文件",
             "file_name": file.filename,
             "total_documents": len(processed_documents),
-            "saved_documents": saved_count,
+            "saved_documents": len(saved),
             "documents": processed_documents[:5],
+            "embedding_job_id": embedding_job_id,
+            "row_errors": row_errors,
             "preview_mode": False,
         }
 
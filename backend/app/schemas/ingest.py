@@ -18,8 +18,23 @@ class ChunkInfo(BaseModel):
     text: str
     token_count: int
 
+class NearDuplicate(BaseModel):
+    document_id: int
+    title: Optional[str] = None
+    distance: int = Field(..., description="SimHash 漢明距離（越小越相似）")
+
 class IngestResponse(BaseModel):
     document_id: int
     chunks: List[ChunkInfo]
     total_chunks: int
     processing_time: float = Field(..., description="處理耗時（秒）")
+    duplicate: bool = Field(False, description="內容與同科目的既有文件完全相同，未重複建立")
+    near_duplicates: List[NearDuplicate] = Field(default_factory=list, description="內容相近的既有文件")
+
+class StreamIngestResponse(BaseModel):
+    document_id: int
+    total_chunks: int
+    total_chars: int
+    processing_time: float = Field(..., description="處理耗時（秒）")
+    duplicate: bool = Field(False, description="內容與同科目的既有文件完全相同，未重複建立")
+    near_duplicates: List[NearDuplicate] = Field(default_factory=list, description="內容相近的既有文件")
@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import Any, Optional, List
+from datetime import datetime
+
+
+class JobResponse(BaseModel):
+    """背景工作狀態"""
+    id: str
+    job_type: str
+    status: str = Field(..., description="pending / running / succeeded / failed / cancelled")
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    progress_done: int = 0
+    progress_total: int = 0
+    message: Optional[str] = None
+    cancel_requested: bool = False
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class JobsListResponse(BaseModel):
+    """背景工作清單回應"""
+    jobs: List[JobResponse]
+    total: int
@@ -115,6 +115,16 @@ class TemplateEnhancedGenerateRequest(BaseModel):
     max_tokens: Optional[int] = Field(None, ge=100, le=16384, description="最大token數（會被模板params覆蓋）")
     model: str = Field(default="claude-sonnet-4-20250514", description="使用的模型")
 
+# 離線大量生成請求（Message Batches API）
+class BulkGenerateRequest(BaseModel):
+    """以 Message Batches API 執行的大量模板生成請求，結果直接寫入題庫"""
+    generations: List[TemplateGenerateRequest] = Field(
+        ...,
+        description="模板生成請求列表",
+        min_items=1,
+        max_items=10000,
+    )
+
 # 批次模板生成請求
 class BatchTemplateGenerateRequest(BaseModel):
     """批次模板驅動生成請求"""
@@ -174,6 +184,7 @@ class TemplateGenerateResponse(BaseModel):
     items: List[QuestionItem]
     count: int
     generation_time: float
+    context_stats: Optional[Dict] = Field(None, description="context 打包統計（token 預算、用量與被捨棄的段落）")
 
 # Prompt 驅動生成結果  
 class PromptGenerateResponse(BaseModel):
@@ -197,6 +208,7 @@ class TemplateEnhancedGenerateResponse(BaseModel):
     params_used: Dict = Field(..., description="實際使用的生成參數")
     warning: Optional[str] = Field(None, description="警告訊息（例如：使用了 fallback 題目）")
     is_fallback: bool = Field(default=False, description="是否使用了備用題目")
+    context_stats: Optional[Dict] = Field(None, description="context 打包統計（token 預算、用量與被捨棄的段落）")
 
 # 批次模板生成結果
 class BatchTemplateGenerateResponse(BaseModel):
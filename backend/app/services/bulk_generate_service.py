@@ -0,0 +1,246 @@
+"""
+離線大量生成 Service — 以 Message Batches API 建立題庫（bulk_generate 背景工作）。
+
+整學期的題庫需要數百次模板生成；走即時 API 既貴又會搶走互動請求的
+速率額度。bulk_generate 工作：
+
+1. 以與 /api/generate/template 相同的方式組 prompt（模板 + 打包後的文件
+   內容，含 prompt caching 斷點），每個生成請求成為批次中的一個請求
+2. 每 MESSAGE_BATCH_MAX_REQUESTS 個請求建立一個批次，輪詢到全部結束，
+   輪詢時回報進度；建立中途失敗或工作被取消時，一併取消已送出但尚未結束的批次
+3. 逐筆讀取結果，以與即時生成相同的 parse_questions_json（先驗證再取前
+   count 題）解析後，每個批次以一次多列 INSERT 寫入 questions 並 commit
+
+單一請求失敗（模板不存在、批次回報 errored / expired、解析不到題目）
+只記錄在 errors，不中止整批。
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.core.config import MESSAGE_BATCH_MAX_REQUESTS, MESSAGE_BATCH_POLL_SECONDS
+from app.core.jobs import Job, job_manager
+from app.core.llm_client import MODEL_NAME, parse_questions_json, template_prompt
+from app.core.message_batches import MessageBatchClient, message_batch_client, message_text
+from app.core.prompt_cache import build_api_params
+from app.db import database
+from app.db.models import Question
+from app.schemas.question import QuestionType, TemplateGenerateRequest
+
+logger = logging.getLogger(__name__)
+
+_QUESTION_TYPES = {qt.value for qt in QuestionType}
+_MAX_TOKENS = 16384
+_TEMPERATURE = 0.7
+
+
+async def bulk_generate_job(
+    job: Job,
+    generations: List[Dict[str, Any]],
+    poll_interval: float = MESSAGE_BATCH_POLL_SECONDS,
+) -> Dict[str, Any]:
+    """背景工作：以 Message Batches API 執行所有模板生成請求並寫入 questions"""
+    start_time = time.time()
+    errors: List[str] = []
+    plans, requests = await _prepare_requests(generations, errors)
+    if not requests:
+        return _summary(start_time, [], len(generations), 0, 0, errors)
+
+    pages = [
+        requests[i : i + MESSAGE_BATCH_MAX_REQUESTS]
+        for i in range(0, len(requests), MESSAGE_BATCH_MAX_REQUESTS)
+    ]
+    batch_ids: List[str] = []
+    succeeded = 0
+    inserted = 0
+    async with message_batch_client() as client:
+        finished: List[Dict[str, Any]] = []
+        try:
+            for page in pages:
+                batch = await client.create(page)
+                batch_ids.append(batch["id"])
+            await job.set_progress(0, len(requests), message=f"已送出 {len(batch_ids)} 個批次", force=True)
+            await _wait_all(job, client, batch_ids, len(requests), poll_interval, finished)
+        except (Exception, asyncio.CancelledError):
+            # 建立到一半失敗或工作被取消：已送出但尚未結束的批次會繼續執行並計費，一併取消
+            ended = {batch["id"] for batch in finished}
+            await _cancel_batches(client, [batch_id for batch_id in batch_ids if batch_id not in ended])
+            raise
+
+        for batch in finished:
+            batch_succeeded, batch_inserted = await _store_results(client, batch, plans, errors)
+            succeeded += batch_succeeded
+            inserted += batch_inserted
+
+    logger.info(
+        "大量生成完成：%d 個批次、%d/%d 個請求成功、寫入 %d 道題目",
+        len(batch_ids), succeeded, len(generations), inserted,
+    )
+    return _summary(start_time, batch_ids, len(generations), succeeded, inserted, errors)
+
+
+# ------------------------------------------------------------------ #
+#  Internals
+# ------------------------------------------------------------------ #
+async def _prepare_requests(generations: List[Dict[str, Any]], errors: List[str]):
+    """組出每個生成請求的批次參數；plans 記錄寫入題目時需要的來源資訊"""
+    # generate_service 依賴只在真實模式定義的 llm_client API 函式
+    from app.services.generate_service import GenerateService
+
+    plans: Dict[str, Dict[str, Any]] = {}
+    requests: List[Dict[str, Any]] = []
+    async with database.AsyncSessionLocal() as db:
+        service = GenerateService(db)
+        for i, gen_data in enumerate(generations):
+            gen_req = TemplateGenerateRequest(**gen_data)
+            try:
+                template, detected_types, documents_content, combined_context, _ = (
+                    await service._template_context(gen_req)
+                )
+            except ValueError as e:
+                errors.append(f"請求 {i+1} 失敗: {e}")
+                continue
+            custom_id = f"gen-{i}"
+            plans[custom_id] = {
+                "index": i,
+                "count": gen_req.count,
+                "template_id": template.id,
+                "subject": template.subject,
+                "detected_types": [qt.value for qt in detected_types],
+                "document_ids": [doc["id"] for doc in documents_content],
+            }
+            requests.append({
+                "custom_id": custom_id,
+                "params": build_api_params(
+                    template_prompt(combined_context, template.content, gen_req.count),
+                    model=MODEL_NAME,
+                    max_tokens=_MAX_TOKENS,
+                    temperature=_TEMPERATURE,
+                ),
+            })
+    return plans, requests
+
+
+async def _wait_all(
+    job: Job,
+    client: MessageBatchClient,
+    batch_ids: List[str],
+    total: int,
+    poll_interval: float,
+    finished: List[Dict[str, Any]],
+) -> None:
+    """依序等待每個批次結束並加入 finished；進度為所有批次已處理完的請求數"""
+    done_by_batch: Dict[str, int] = {}
+
+    async def report(batch: Dict[str, Any]) -> None:
+        counts = batch["request_counts"]
+        done_by_batch[batch["id"]] = sum(counts.values()) - counts.get("processing", 0)
+        done = sum(done_by_batch.values())
+        await job.set_progress(done, total, message=f"批次已處理 {done}/{total} 個請求")
+
+    for batch_id in batch_ids:
+        finished.append(await client.wait(batch_id, poll_interval, on_poll=report))
+
+
+async def _cancel_batches(client: MessageBatchClient, batch_ids: List[str]) -> None:
+    for batch_id in batch_ids:
+        try:
+            await client.cancel(batch_id)
+        except Exception as e:
+            logger.warning("取消批次 %s 失敗: %s", batch_id, e)
+
+
+async def _store_results(
+    client: MessageBatchClient,
+    batch: Dict[str, Any],
+    plans: Dict[str, Dict[str, Any]],
+    errors: List[str],
+):
+    """解析一個批次的結果並寫入 questions；回傳 (成功的請求數, 寫入題數)"""
+    rows: List[Dict[str, Any]] = []
+    succeeded = 0
+    async for entry in client.results(batch):
+        plan = plans.get(entry.get("custom_id"))
+        if plan is None:
+            continue
+        result = entry.get("result") or {}
+        if result.get("type") != "succeeded":
+            detail = (result.get("error") or {}).get("message", "")
+            errors.append(f"請求 {plan['index']+1} 失敗: 批次結果為 {result.get('type')} {detail}".rstrip())
+            continue
+
+        raw = message_text(result["message"])
+        questions = parse_questions_json(raw, plan["count"], QuestionType.SINGLE_CHOICE, "auto")
+        if not questions:
+            errors.append(f"請求 {plan['index']+1} 失敗: 回應中沒有有效的題目")
+            continue
+        succeeded += 1
+        rows.extend(_question_row(q, i, plan, batch["id"]) for i, q in enumerate(questions))
+
+    if rows:
+        async with database.AsyncSessionLocal() as db:
+            await db.execute(insert(Question), rows)
+            await db.commit()
+    return succeeded, len(rows)
+
+
+def _question_row(q: Dict[str, Any], i: int, plan: Dict[str, Any], batch_id: str) -> Dict[str, Any]:
+    document_ids = plan["document_ids"]
+    answer = q["answer"]
+    options = q.get("options")
+    return {
+        "question_type": _infer_question_type(q, plan["detected_types"]),
+        "stem": q["prompt"],
+        "options": [str(o) for o in options] if isinstance(options, list) else None,
+        "answer": answer if isinstance(answer, str) else json.dumps(answer, ensure_ascii=False),
+        "explanation": q["explanation"],
+        "question_data": q.get("question_data"),
+        "document_id": document_ids[i % len(document_ids)] if document_ids else None,
+        "template_id": plan["template_id"],
+        "source_metadata": {
+            "subject": plan["subject"],
+            "source": "message_batch",
+            "batch_id": batch_id,
+        },
+    }
+
+
+def _infer_question_type(q: Dict[str, Any], detected_types: List[str]) -> str:
+    declared: Optional[str] = q.get("type")
+    if declared in _QUESTION_TYPES and declared not in ("auto", "mixed"):
+        return declared
+    if isinstance(q.get("options"), list):
+        return QuestionType.SINGLE_CHOICE.value
+    if q.get("question_data"):
+        return QuestionType.MATCHING.value
+    if str(q.get("answer", "")).lower() in ("true", "false"):
+        return QuestionType.TRUE_FALSE.value
+    if len(detected_types) == 1:
+        return detected_types[0]
+    return QuestionType.SHORT_ANSWER.value
+
+
+def _summary(
+    start_time: float,
+    batch_ids: List[str],
+    total: int,
+    succeeded: int,
+    inserted: int,
+    errors: List[str],
+) -> Dict[str, Any]:
+    return {
+        "batch_ids": batch_ids,
+        "total_requests": total,
+        "success_count": succeeded,
+        "error_count": len(errors),
+        "inserted_questions": inserted,
+        "total_time": time.time() - start_time,
+        "errors": errors,
+    }
+
+
+job_manager.register("bulk_generate", bulk_generate_job)
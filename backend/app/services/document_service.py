@@ -1,11 +1,29 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, and_
+from sqlalchemy import select, func, or_, and_, insert
 from app.db.models import Document, Embedding, Question
-from typing import List, Optional, Dict, Any
+from app.core.dedup import document_fingerprint, hamming_distance, simhash_bands, SIMHASH_MAX_DISTANCE
+from app.services.indexing_service import document_chunk_params, reindex_document
+from typing import List, Optional, Dict, Any, Sequence
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 批次匯入時寫入的欄位
+DOCUMENT_IMPORT_FIELDS = ('title', 'content', 'subject', 'grade', 'chapter', 'page_number', 'image_filename')
+
+
+def validate_document_row(row: Dict[str, Any]) -> Optional[str]:
+    """檢查單列文件資料；通過回傳 None，否則回傳錯誤訊息"""
+    if not row.get('subject') or not str(row['subject']).strip():
+        return "科目不能為空"
+    if not row.get('content') or not str(row['content']).strip():
+        return "文件內容不能為空"
+    for key, value in row.items():
+        max_length = getattr(Document.__table__.c[key].type, 'length', None)
+        if value is not None and max_length and len(value) > max_length:
+            return f"{key} 長度超過 {max_length} 字元"
+    return None
+
 class DocumentService:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -242,7 +260,8 @@ class DocumentService:
             chapter=document_data.get('chapter'),
             page_number=document_data.get('page_number'),
             image_filename=document_data.get('image_filename'),
-            import_source=document_data.get('import_source', 'manual')
+            import_source=document_data.get('import_source', 'manual'),
+            **document_fingerprint(document_data['content'])
         )
 
         self.db.add(document)
@@ -263,10 +282,136 @@ class DocumentService:
             'updated_at': document.updated_at.isoformat() if document.updated_at else None
         }
 
+    async def find_documents_by_content_hash(self, hashes, subject: Optional[str] = None) -> Dict[str, int]:
+        """
+        以內容 hash 查詢既有文件，回傳 {content_hash: document_id}（索引等值查詢）
+
+        指定 subject 時只比對同科目的文件：相同內容放在不同科目是不同的文件。
+        """
+        unique_hashes = list(set(hashes))
+        if not unique_hashes:
+            return {}
+        query = select(Document.content_hash, func.min(Document.id)).where(
+            Document.content_hash.in_(unique_hashes)
+        )
+        if subject is not None:
+            query = query.where(Document.subject == subject)
+        result = await self.db.execute(query.group_by(Document.content_hash))
+        return {content_hash: document_id for content_hash, document_id in result.all()}
+
+    async def find_near_duplicates(
+        self,
+        simhash: int,
+        max_distance: int = SIMHASH_MAX_DISTANCE,
+        exclude_id: Optional[int] = None,
+        limit: int = 10,
+    ) -> List[Dict[str, Any]]:
+        """
+        查詢 SimHash 漢明距離不超過 max_distance 的文件
+
+        先以 ``simhash_bands && :bands``（GIN 索引）取候選，再於 Python 端
+        計算精確距離；max_distance 不超過 SIMHASH_MAX_DISTANCE 時不會漏掉。
+        """
+        query = (
+            select(Document.id, Document.title, Document.simhash)
+            .where(Document.simhash_bands.overlap(simhash_bands(simhash)))
+        )
+        if exclude_id is not None:
+            query = query.where(Document.id != exclude_id)
+        result = await self.db.execute(query)
+
+        matches = [
+            {'document_id': doc_id, 'title': title, 'distance': hamming_distance(simhash, other)}
+            for doc_id, title, other in result.all()
+            if other is not None
+        ]
+        matches = [m for m in matches if m['distance'] <= max_distance]
+        matches.sort(key=lambda m: (m['distance'], m['document_id']))
+        return matches[:limit]
+
+    async def bulk_create_documents(
+        self,
+        documents: Sequence[Dict[str, Any]],
+        import_source: str = 'manual',
+        skip_duplicates: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """批次建立文件
+        
+        先逐列檢查必填欄位與長度，通過的列以多列 INSERT ... RETURNING id
+        在單一交易內寫入（只 commit 一次）。skip_duplicates 時，內容與既有
+        文件（或同批較早的列）完全相同的列會略過，並在結果中帶 duplicate_of。
+        
+        Returns:
+            與輸入順序對應的 [{'document_id', 'error', 'duplicate_of'}]
+        """
+        results: List[Dict[str, Any]] = []
+        rows: List[Dict[str, Any]] = []
+        row_positions: List[int] = []
+
+        for position, data in enumerate(documents):
+            row = {key: data.get(key) for key in DOCUMENT_IMPORT_FIELDS}
+            row['import_source'] = data.get('import_source') or import_source
+            error = validate_document_row(row)
+            results.append({'document_id': None, 'error': error, 'duplicate_of': None})
+            if error is None:
+                row.update(document_fingerprint(row['content']))
+                rows.append(row)
+                row_positions.append(position)
+
+        if skip_duplicates and rows:
+            existing = await self.find_documents_by_content_hash(row['content_hash'] for row in rows)
+            kept_rows, kept_positions = [], []
+            seen: Dict[str, int] = {}  # content_hash -> 同批第一列的位置
+            for row, position in zip(rows, row_positions):
+                digest = row['content_hash']
+                if digest in existing:
+                    results[position].update(
+                        error=f"內容與既有文件 {existing[digest]} 重複，已略過",
+                        duplicate_of=existing[digest],
+                    )
+                elif digest in seen:
+                    results[position]['error'] = f"內容與第 {seen[digest] + 1} 筆重複，已略過"
+                else:
+                    seen[digest] = position
+                    kept_rows.append(row)
+                    kept_positions.append(position)
+            rows, row_positions = kept_rows, kept_positions
+
+        if not rows:
+            return results
+
+        try:
+            result = await self.db.execute(
+                insert(Document).returning(Document.id, sort_by_parameter_order=True),
+                rows,
+            )
+            document_ids = list(result.scalars())
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            logger.error("批次建立 %d 份文件失敗: %s", len(rows), e)
+            for position in row_positions:
+                results[position]['error'] = f"寫入資料庫失敗: {e}"
+            return results
+
+        for position, document_id in zip(row_positions, document_ids):
+            results[position]['document_id'] = document_id
+
+        logger.info("批次建立 %d 份文件", len(document_ids))
+        return results
+
     async def update_document(self, document_id: int, document_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """更新文件"""
-        document = await self.get_document_by_id(document_id)
-        if not document:
+        """更新文件；內容改變時在同一交易內增量重建 embedding"""
+        result = await self.db.execute(
+            select(
+                Document.content,
+                Document.import_source,
+                Document.chunk_size,
+                Document.chunk_overlap,
+            ).where(Document.id == document_id)
+        )
+        current = result.one_or_none()
+        if current is None:
             return None
         
         # 更新文件記錄
@@ -276,6 +421,8 @@ class DocumentService:
         for key in ['title', 'content', 'subject', 'grade', 'chapter', 'page_number', 'image_filename']:
             if key in document_data:
                 update_data[key] = document_data[key]
+        if update_data.get('content') is not None:
+            update_data.update(document_fingerprint(update_data['content']))
         
         if update_data:
             query = (
@@ -284,6 +431,17 @@ class DocumentService:
                 .values(**update_data)
             )
             await self.db.execute(query)
+
+            # 只重新向量化新增或修改過的文本塊，未變動的向量保留
+            new_content = update_data.get('content')
+            if new_content is not None and new_content != current.content:
+                chunk_size, overlap = document_chunk_params(
+                    current.import_source, current.chunk_size, current.chunk_overlap
+                )
+                await reindex_document(
+                    self.db, document_id, new_content, chunk_size=chunk_size, overlap=overlap
+                )
+
             await self.db.commit()
         
         return await self.get_document_by_id(document_id)
@@ -3,13 +3,17 @@
 """
 import time
 import logging
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, Callable, List, Dict, Any, NamedTuple, Optional, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.db import database
 from app.db.models import Template, Document
-from app.core.config import RETRIEVAL_TOP_K, SIMILARITY_THRESHOLD
+from app.core.jobs import Job, job_manager
+from app.core.llm_cache import set_llm_cache_bypass
+from app.core.config import RETRIEVAL_TOP_K, SIMILARITY_THRESHOLD, LLM_MODEL_NAME
+from app.core.context_packer import context_budget, pack_documents_async
 from app.schemas.question import (
     QuestionItem,
     QuestionType,
@@ -25,17 +29,36 @@ from app.schemas.question import (
     TemplateEnhancedGenerateRequest,
     TemplateEnhancedGenerateResponse,
 )
-from app.services.retrieval import search_similar_chunks
+from app.services.retrieval import (
+    ChunkHit,
+    search_similar_chunks,
+    search_similar_chunks_multi,
+)
 from app.core.llm_client import (
     generate_questions_by_type,
     generate_questions_by_template,
     detect_question_type_from_template,
     generate_questions_by_prompt,
+    stream_questions_by_type,
+    stream_questions_by_template,
+    stream_questions_by_prompt,
 )
 
 logger = logging.getLogger(__name__)
 
 
+class GenerationStream(NamedTuple):
+    """
+    串流生成：DB 查詢與 context 準備在建立時完成，items 只呼叫 LLM
+
+    meta 於串流開始時送出；summarize(count) 回傳結束事件的額外欄位。
+    """
+    meta: Dict[str, Any]
+    requested: int
+    items: AsyncIterator[QuestionItem]
+    summarize: Optional[Callable[[int], Dict[str, Any]]] = None
+
+
 class GenerateService:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -46,22 +69,7 @@ class GenerateService:
     async def generate_basic(self, req: GenerateRequest) -> GenerateResponse:
         start_time = time.time()
 
-        context_query = f"{req.subject.value} 題目 教材內容"
-        chunks_with_scores = await search_similar_chunks(
-            db=self.db,
-            query=context_query,
-            document_id=req.document_id,
-            top_k=RETRIEVAL_TOP_K,
-            similarity_threshold=SIMILARITY_THRESHOLD,
-        )
-
-        if not chunks_with_scores:
-            raise ValueError(f"文件 ID {req.document_id} 中找不到相關內容")
-
-        context_texts = [chunk.slice_text for chunk, score in chunks_with_scores]
-        context_str = "\n".join(
-            f"{i+1}. {text}" for i, text in enumerate(context_texts[:5])
-        )
+        hits, context_str = await self._basic_context(req)
 
         all_questions: List[QuestionItem] = []
 
@@ -75,26 +83,11 @@ class GenerateService:
                 )
 
                 for i, q in enumerate(questions):
-                    chunk_idx = i % len(chunks_with_scores)
-                    chunk, score = chunks_with_scores[chunk_idx]
-
-                    question_item = QuestionItem(
-                        type=question_type,
-                        prompt=q["prompt"],
-                        options=q.get("options"),
-                        answer=q["answer"],
-                        explanation=q["explanation"],
-                        source=QuestionSource(
-                            document_id=req.document_id,
-                            chunk_id=chunk.id,
-                            chunk_text=(
-                                chunk.slice_text[:200] + "..."
-                                if len(chunk.slice_text) > 200
-                                else chunk.slice_text
-                            ),
-                        ),
+                    all_questions.append(
+                        self._question_item_from_hit(
+                            q, question_type, hits[i % len(hits)], req.document_id
+                        )
                     )
-                    all_questions.append(question_item)
 
         generation_time = time.time() - start_time
 
@@ -114,26 +107,24 @@ class GenerateService:
 
         template = await self._get_template(gen_req.template_id)
 
-        all_contexts: List[tuple] = []
-        for doc_id in gen_req.document_ids:
-            context_query = f"{gen_req.question_type.value} 題目 教材內容"
-            chunks_with_scores = await search_similar_chunks(
-                db=self.db,
-                query=context_query,
-                document_id=doc_id,
-                top_k=5,
-                similarity_threshold=SIMILARITY_THRESHOLD,
-            )
-            if chunks_with_scores:
-                all_contexts.extend(
-                    [(doc_id, chunk, score) for chunk, score in chunks_with_scores]
-                )
+        context_query = f"{gen_req.question_type.value} 題目 教材內容"
+        chunks_by_document = await search_similar_chunks_multi(
+            db=self.db,
+            query=context_query,
+            document_ids=gen_req.document_ids,
+            top_k=5,
+            similarity_threshold=SIMILARITY_THRESHOLD,
+        )
+
+        all_contexts: List[ChunkHit] = [
+            hit for hits in chunks_by_document.values() for hit in hits
+        ]
 
         if not all_contexts:
             raise ValueError("在指定文件中找不到相關內容")
 
         combined_context = "\n".join(
-            [chunk.slice_text for _, chunk, _ in all_contexts[:8]]
+            [hit.slice_text for hit in all_contexts[:8]]
         )
         full_prompt = template.content.replace("{{context}}", combined_context)
 
@@ -173,27 +164,10 @@ class GenerateService:
             gen_req.count,
         )
 
-        template = await self._get_template(gen_req.template_id)
-
-        logger.info("找到模板 - Name: %s, Subject: %s", template.name, template.subject)
-
-        detected_types = detect_question_type_from_template(template.content)
-        logger.info("檢測到的題型: %s", detected_types)
-
-        documents_content = await self._load_documents(gen_req.document_ids)
-
-        if not documents_content:
-            raise ValueError("找不到指定的文件")
-
-        combined_context = "\n\n".join(
-            [
-                f"文件: {doc['title']}\n內容: {doc['content']}"
-                for doc in documents_content
-            ]
+        template, detected_types, documents_content, combined_context, context_stats = (
+            await self._template_context(gen_req)
         )
 
-        logger.info("合併後的內容長度: %d 字符", len(combined_context))
-
         questions = await generate_questions_by_template(
             context=combined_context,
             template_content=template.content,
@@ -220,6 +194,7 @@ class GenerateService:
             items=question_items,
             count=len(question_items),
             generation_time=generation_time,
+            context_stats=context_stats,
         )
 
     # ------------------------------------------------------------------ #
@@ -241,21 +216,7 @@ class GenerateService:
             question_type=req.question_type,
         )
 
-        question_items: List[QuestionItem] = []
-        for q in questions:
-            question_item = QuestionItem(
-                type=req.question_type or QuestionType.AUTO,
-                prompt=q["prompt"],
-                options=q.get("options"),
-                answer=q["answer"],
-                explanation=q["explanation"],
-                source=QuestionSource(
-                    document_id=0,
-                    chunk_id=0,
-                    chunk_text="前端提供的 prompt 生成",
-                ),
-            )
-            question_items.append(question_item)
+        question_items = [self._prompt_question_item(q, req) for q in questions]
 
         generation_time = time.time() - start_time
         logger.info(
@@ -284,6 +245,250 @@ class GenerateService:
     ) -> TemplateEnhancedGenerateResponse:
         start_time = time.time()
 
+        plan = await self._enhanced_plan(req)
+        template = req.template
+        template_content = plan["template_content"]
+        template_question_type = plan["question_type"]
+
+        questions = await generate_questions_by_prompt(
+            prompt=plan["prompt"],
+            count=req.count,
+            temperature=plan["temperature"],
+            max_tokens=plan["max_tokens"],
+            model=req.model,
+            question_type=template_question_type,
+            top_p=plan["top_p"],
+            frequency_penalty=plan["frequency_penalty"],
+        )
+
+        is_fallback, warning_message = self._enhanced_warning(len(questions), req.count)
+
+        question_items = [
+            self._enhanced_question_item(q, req, plan) for q in questions
+        ]
+
+        generation_time = time.time() - start_time
+        logger.info(
+            "模板生成完成，耗時 %.2f 秒，生成 %d 道題目",
+            generation_time,
+            len(question_items),
+        )
+
+        params_used = {
+            "temperature": plan["temperature"],
+            "max_tokens": plan["max_tokens"],
+            "top_p": plan["top_p"],
+            "frequency_penalty": plan["frequency_penalty"],
+            "model": req.model,
+        }
+
+        return TemplateEnhancedGenerateResponse(
+            template_info={
+                "id": template.get("id"),
+                "name": template.get("name"),
+                "subject": template.get("subject"),
+                "content_preview": (
+                    template_content[:200] + "..."
+                    if len(template_content) > 200
+                    else template_content
+                ),
+            },
+            documents_info=[
+                {
+                    "id": doc.get("id"),
+                    "title": doc.get("title"),
+                    "content_length": len(doc.get("content", "")),
+                }
+                for doc in req.documents
+            ],
+            detected_question_type=template_question_type,
+            items=question_items,
+            count=len(question_items),
+            generation_time=generation_time,
+            model_used=req.model,
+            params_used=params_used,
+            warning=warning_message,
+            is_fallback=is_fallback,
+            context_stats=plan["context_stats"],
+        )
+
+    # ------------------------------------------------------------------ #
+    #  串流生成（SSE）：逐題產生，DB 查詢在回傳 GenerationStream 前完成
+    # ------------------------------------------------------------------ #
+    async def stream_basic(self, req: GenerateRequest) -> GenerationStream:
+        hits, context_str = await self._basic_context(req)
+
+        async def items() -> AsyncIterator[QuestionItem]:
+            for question_type, count in req.types.items():
+                if count <= 0:
+                    continue
+                i = 0
+                async for q in stream_questions_by_type(
+                    context=context_str,
+                    question_type=question_type,
+                    count=count,
+                    subject=req.subject,
+                ):
+                    yield self._question_item_from_hit(
+                        q, question_type, hits[i % len(hits)], req.document_id
+                    )
+                    i += 1
+
+        return GenerationStream(
+            meta={"document_id": req.document_id},
+            requested=sum(count for count in req.types.values() if count > 0),
+            items=items(),
+        )
+
+    async def stream_from_template(self, gen_req: TemplateGenerateRequest) -> GenerationStream:
+        template, detected_types, documents_content, combined_context, context_stats = (
+            await self._template_context(gen_req)
+        )
+
+        async def items() -> AsyncIterator[QuestionItem]:
+            i = 0
+            async for q in stream_questions_by_template(
+                context=combined_context,
+                template_content=template.content,
+                count=gen_req.count,
+            ):
+                yield self._question_item_from_doc(
+                    q, QuestionType.AUTO, documents_content[i % len(documents_content)]
+                )
+                i += 1
+
+        return GenerationStream(
+            meta={
+                "template_id": gen_req.template_id,
+                "template_name": template.name,
+                "detected_question_types": [qt.value for qt in detected_types],
+                "context_stats": context_stats,
+            },
+            requested=gen_req.count,
+            items=items(),
+        )
+
+    async def stream_from_prompt(self, req: PromptGenerateRequest) -> GenerationStream:
+        logger.info("收到 Prompt 串流生成請求, Prompt 長度: %d 字符", len(req.prompt))
+
+        async def items() -> AsyncIterator[QuestionItem]:
+            async for q in stream_questions_by_prompt(
+                prompt=req.prompt,
+                count=req.count,
+                temperature=req.temperature,
+                max_tokens=req.max_tokens,
+                model=req.model,
+                question_type=req.question_type,
+            ):
+                yield self._prompt_question_item(q, req)
+
+        return GenerationStream(
+            meta={"detected_question_type": req.question_type, "model_used": req.model},
+            requested=req.count,
+            items=items(),
+        )
+
+    async def stream_template_enhanced(
+        self, req: TemplateEnhancedGenerateRequest
+    ) -> GenerationStream:
+        plan = await self._enhanced_plan(req)
+
+        async def items() -> AsyncIterator[QuestionItem]:
+            async for q in stream_questions_by_prompt(
+                prompt=plan["prompt"],
+                count=req.count,
+                temperature=plan["temperature"],
+                max_tokens=plan["max_tokens"],
+                model=req.model,
+                question_type=plan["question_type"],
+                top_p=plan["top_p"],
+                frequency_penalty=plan["frequency_penalty"],
+            ):
+                yield self._enhanced_question_item(q, req, plan)
+
+        def summarize(count: int) -> Dict[str, Any]:
+            is_fallback, warning = self._enhanced_warning(count, req.count)
+            return {"warning": warning, "is_fallback": is_fallback}
+
+        return GenerationStream(
+            meta={
+                "template_info": {
+                    "id": req.template.get("id"),
+                    "name": req.template.get("name"),
+                    "subject": req.template.get("subject"),
+                },
+                "detected_question_type": plan["question_type"],
+                "model_used": req.model,
+                "context_stats": plan["context_stats"],
+            },
+            requested=req.count,
+            items=items(),
+            summarize=summarize,
+        )
+
+    # ------------------------------------------------------------------ #
+    #  Private helpers
+    # ------------------------------------------------------------------ #
+    async def _basic_context(self, req: GenerateRequest) -> Tuple[List[ChunkHit], str]:
+        """基本生成：檢索文件內的相關文本塊，組成編號 context"""
+        context_query = f"{req.subject.value} 題目 教材內容"
+        hits = await search_similar_chunks(
+            db=self.db,
+            query=context_query,
+            document_id=req.document_id,
+            top_k=RETRIEVAL_TOP_K,
+            similarity_threshold=SIMILARITY_THRESHOLD,
+        )
+
+        if not hits:
+            raise ValueError(f"文件 ID {req.document_id} 中找不到相關內容")
+
+        context_texts = [hit.slice_text for hit in hits]
+        context_str = "\n".join(
+            f"{i+1}. {text}" for i, text in enumerate(context_texts[:5])
+        )
+        return hits, context_str
+
+    async def _template_context(
+        self, gen_req: TemplateGenerateRequest
+    ) -> Tuple[Template, List[QuestionType], List[Dict[str, Any]], str, Dict[str, Any]]:
+        """
+        模板生成：載入模板與文件全文，回傳 (模板, 偵測到的題型, 文件, 合併內容, 打包統計)
+
+        文件內容超過模型的 context 預算時，以 pack_documents 只保留與模板最相關的段落。
+        """
+        template = await self._get_template(gen_req.template_id)
+
+        logger.info("找到模板 - Name: %s, Subject: %s", template.name, template.subject)
+
+        detected_types = detect_question_type_from_template(template.content)
+        logger.info("檢測到的題型: %s", detected_types)
+
+        documents_content = await self._load_documents(gen_req.document_ids)
+
+        if not documents_content:
+            raise ValueError("找不到指定的文件")
+
+        # 超過預算時才在執行緒中切段與挑選，避免阻塞 event loop
+        packed = await pack_documents_async(
+            documents_content,
+            context_budget(LLM_MODEL_NAME),
+            query=template.content.replace("{{context}}", ""),
+        )
+        combined_context = "\n\n".join(
+            [
+                f"文件: {doc['title']}\n內容: {content}"
+                for doc, content in zip(documents_content, packed.contents)
+                if content
+            ]
+        )
+
+        logger.info("合併後的內容長度: %d 字符", len(combined_context))
+        return template, detected_types, documents_content, combined_context, packed.stats
+
+    @staticmethod
+    async def _enhanced_plan(req: TemplateEnhancedGenerateRequest) -> Dict[str, Any]:
+        """增強模板生成：合併模板參數與文件內容，組出最終 prompt"""
         template = req.template
         template_content = template.get("content", "")
         template_params = template.get("params", {})
@@ -304,40 +509,46 @@ class GenerateService:
             actual_top_p,
         )
 
+        packed = await pack_documents_async(
+            req.documents,
+            context_budget(req.model),
+            query=template_content.replace("{context}", ""),
+        )
         documents_content: List[str] = []
-        for doc in req.documents:
+        for doc, content in zip(req.documents, packed.contents):
+            if not content:
+                continue
             doc_content = f"=== {doc.get('title', 'Unknown')} ===\n"
             if doc.get("chapter"):
                 doc_content += f"章節: {doc['chapter']}\n"
-            doc_content += doc.get("content", "")
+            doc_content += content
             documents_content.append(doc_content)
 
         combined_content = "\n\n".join(documents_content)
 
-        full_prompt = template_content.replace("{context}", combined_content)
-
         template_question_type = (
             template.get("question_type") or req.question_type or "single_choice"
         )
         logger.info("使用題型: %s", template_question_type)
 
-        questions = await generate_questions_by_prompt(
-            prompt=full_prompt,
-            count=req.count,
-            temperature=actual_temperature,
-            max_tokens=actual_max_tokens,
-            model=req.model,
-            question_type=template_question_type,
-            top_p=actual_top_p,
-            frequency_penalty=actual_frequency_penalty,
-        )
-
-        is_fallback = False
-        warning_message = None
+        return {
+            "template_content": template_content,
+            "combined_content": combined_content,
+            "prompt": template_content.replace("{context}", combined_content),
+            "question_type": template_question_type,
+            "temperature": actual_temperature,
+            "max_tokens": actual_max_tokens,
+            "top_p": actual_top_p,
+            "frequency_penalty": actual_frequency_penalty,
+            "context_stats": packed.stats,
+        }
 
-        if not questions:
-            is_fallback = True
-            warning_message = (
+    @staticmethod
+    def _enhanced_warning(count: int, requested: int) -> Tuple[bool, Optional[str]]:
+        """回傳 (is_fallback, warning)"""
+        if count == 0:
+            logger.error("LLM 生成失敗，返回空列表")
+            return True, (
                 "LLM 無法從提供的文件內容生成有效題目。可能原因：\n"
                 "1. 文件內容與題型不符\n"
                 "2. 文件內容過短或不完整\n"
@@ -347,20 +558,34 @@ class GenerateService:
                 "- 嘗試選擇不同的文件或題型\n"
                 "- 調整模板的 Prompt 描述"
             )
-            logger.error("LLM 生成失敗，返回空列表")
-        elif len(questions) < req.count:
+        if count < requested:
             warning_message = (
-                f"請求生成 {req.count} 題，但只成功生成 {len(questions)} 題。\n\n"
+                f"請求生成 {requested} 題，但只成功生成 {count} 題。\n\n"
                 "可能原因：\n"
                 "- 文件內容不足以支撐請求的題目數量\n"
                 "- 部分生成的題目格式驗證失敗\n\n"
                 "建議：請嘗試減少生成數量或選擇更多文件。"
             )
             logger.warning(warning_message)
+            return False, warning_message
+        return False, None
 
-        question_items: List[QuestionItem] = []
-        for i, q in enumerate(questions):
-            source = QuestionSource(
+    @staticmethod
+    def _enhanced_question_item(
+        q: Dict[str, Any],
+        req: TemplateEnhancedGenerateRequest,
+        plan: Dict[str, Any],
+    ) -> QuestionItem:
+        combined_content = plan["combined_content"]
+        return QuestionItem(
+            type=getattr(
+                QuestionType, plan["question_type"].upper(), QuestionType.AUTO
+            ),
+            prompt=q["prompt"],
+            options=q.get("options"),
+            answer=q["answer"],
+            explanation=q.get("explanation", ""),
+            source=QuestionSource(
                 document_id=req.documents[0].get("id", 1) if req.documents else 1,
                 chunk_id=1,
                 chunk_text=(
@@ -368,67 +593,24 @@ class GenerateService:
                     if len(combined_content) > 200
                     else combined_content
                 ),
-            )
-
-            question_item = QuestionItem(
-                type=getattr(
-                    QuestionType, template_question_type.upper(), QuestionType.AUTO
-                ),
-                prompt=q["prompt"],
-                options=q.get("options"),
-                answer=q["answer"],
-                explanation=q.get("explanation", ""),
-                source=source,
-            )
-            question_items.append(question_item)
-
-        generation_time = time.time() - start_time
-        logger.info(
-            "模板生成完成，耗時 %.2f 秒，生成 %d 道題目",
-            generation_time,
-            len(question_items),
+            ),
         )
 
-        params_used = {
-            "temperature": actual_temperature,
-            "max_tokens": actual_max_tokens,
-            "top_p": actual_top_p,
-            "frequency_penalty": actual_frequency_penalty,
-            "model": req.model,
-        }
-
-        return TemplateEnhancedGenerateResponse(
-            template_info={
-                "id": template.get("id"),
-                "name": template.get("name"),
-                "subject": template.get("subject"),
-                "content_preview": (
-                    template_content[:200] + "..."
-                    if len(template_content) > 200
-                    else template_content
-                ),
-            },
-            documents_info=[
-                {
-                    "id": doc.get("id"),
-                    "title": doc.get("title"),
-                    "content_length": len(doc.get("content", "")),
-                }
-                for doc in req.documents
-            ],
-            detected_question_type=template_question_type,
-            items=question_items,
-            count=len(question_items),
-            generation_time=generation_time,
-            model_used=req.model,
-            params_used=params_used,
-            warning=warning_message,
-            is_fallback=is_fallback,
+    @staticmethod
+    def _prompt_question_item(q: Dict[str, Any], req: PromptGenerateRequest) -> QuestionItem:
+        return QuestionItem(
+            type=req.question_type or QuestionType.AUTO,
+            prompt=q["prompt"],
+            options=q.get("options"),
+            answer=q["answer"],
+            explanation=q["explanation"],
+            source=QuestionSource(
+                document_id=0,
+                chunk_id=0,
+                chunk_text="前端提供的 prompt 生成",
+            ),
         )
 
-    # ------------------------------------------------------------------ #
-    #  Private helpers
-    # ------------------------------------------------------------------ #
     async def _get_template(self, template_id: int) -> Template:
         template_query = select(Template).where(Template.id == template_id)
         template_result = await self.db.execute(template_query)
@@ -466,31 +648,14 @@ class GenerateService:
     def _build_question_items_from_contexts(
         questions: List[Dict[str, Any]],
         question_type: QuestionType,
-        all_contexts: List[tuple],
+        all_contexts: List[ChunkHit],
     ) -> List[QuestionItem]:
-        question_items: List[QuestionItem] = []
-        for i, q in enumerate(questions):
-            context_idx = i % len(all_contexts)
-            doc_id, chunk, _ = all_contexts[context_idx]
-
-            question_item = QuestionItem(
-                type=question_type,
-                prompt=q["prompt"],
-                options=q.get("options"),
-                answer=q["answer"],
-                explanation=q["explanation"],
-                source=QuestionSource(
-                    document_id=doc_id,
-                    chunk_id=chunk.id,
-                    chunk_text=(
-                        chunk.slice_text[:200] + "..."
-                        if len(chunk.slice_text) > 200
-                        else chunk.slice_text
-                    ),
-                ),
+        return [
+            GenerateService._question_item_from_hit(
+                q, question_type, all_contexts[i % len(all_contexts)]
             )
-            question_items.append(question_item)
-        return question_items
+            for i, q in enumerate(questions)
+        ]
 
     @staticmethod
     def _build_question_items_from_docs(
@@ -498,26 +663,102 @@ class GenerateService:
         question_type: QuestionType,
         documents_content: List[Dict[str, Any]],
     ) -> List[QuestionItem]:
-        question_items: List[QuestionItem] = []
-        for i, q in enumerate(questions):
-            doc_idx = i % len(documents_content)
-            source_doc = documents_content[doc_idx]
-
-            question_item = QuestionItem(
-                type=question_type,
-                prompt=q["prompt"],
-                options=q.get("options"),
-                answer=q["answer"],
-                explanation=q["explanation"],
-                source=QuestionSource(
-                    document_id=source_doc["id"],
-                    chunk_id=0,
-                    chunk_text=(
-                        source_doc["content"][:200] + "..."
-                        if len(source_doc["content"]) > 200
-                        else source_doc["content"]
-                    ),
-                ),
+        return [
+            GenerateService._question_item_from_doc(
+                q, question_type, documents_content[i % len(documents_content)]
             )
-            question_items.append(question_item)
-        return question_items
+            for i, q in enumerate(questions)
+        ]
+
+    @staticmethod
+    def _question_item_from_hit(
+        q: Dict[str, Any],
+        question_type: QuestionType,
+        hit: ChunkHit,
+        document_id: Optional[int] = None,
+    ) -> QuestionItem:
+        return QuestionItem(
+            type=question_type,
+            prompt=q["prompt"],
+            options=q.get("options"),
+            answer=q["answer"],
+            explanation=q["explanation"],
+            source=QuestionSource(
+                document_id=hit.document_id if document_id is None else document_id,
+                chunk_id=hit.id,
+                chunk_text=(
+                    hit.slice_text[:200] + "..."
+                    if len(hit.slice_text) > 200
+                    else hit.slice_text
+                ),
+            ),
+        )
+
+    @staticmethod
+    def _question_item_from_doc(
+        q: Dict[str, Any],
+        question_type: QuestionType,
+        source_doc: Dict[str, Any],
+    ) -> QuestionItem:
+        return QuestionItem(
+            type=question_type,
+            prompt=q["prompt"],
+            options=q.get("options"),
+            answer=q["answer"],
+            explanation=q["explanation"],
+            source=QuestionSource(
+                document_id=source_doc["id"],
+                chunk_id=0,
+                chunk_text=(
+                    source_doc["content"][:200] + "..."
+                    if len(source_doc["content"]) > 200
+                    else source_doc["content"]
+                ),
+            ),
+        )
+
+
+# ------------------------------------------------------------------ #
+#  Background job
+# ------------------------------------------------------------------ #
+async def generate_batch_job(
+    job: Job,
+    generations: List[Dict[str, Any]],
+    bypass_cache: bool = False,
+) -> Dict[str, Any]:
+    """
+    背景工作：依序執行批次生成請求
+
+    每個子請求使用獨立的 session；單一請求失敗只記錄錯誤，不中止整批。
+    bypass_cache 為 True 時不讀取 LLM 回應快取（送出工作的請求帶 no-cache）。
+    """
+    set_llm_cache_bypass(bypass_cache)
+    start_time = time.time()
+    results: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    total_items = 0
+
+    await job.set_progress(0, len(generations), force=True)
+    for i, gen_data in enumerate(generations):
+        try:
+            async with database.AsyncSessionLocal() as db:
+                result = await GenerateService(db).generate_single(
+                    SingleGenerateRequest(**gen_data)
+                )
+            results.append(result.model_dump(mode="json"))
+            total_items += result.count
+        except Exception as e:
+            errors.append(f"請求 {i+1} 失敗: {str(e)}")
+        await job.set_progress(i + 1, message=f"已完成 {i + 1}/{len(generations)} 個請求")
+
+    return {
+        "results": results,
+        "total_items": total_items,
+        "total_time": time.time() - start_time,
+        "success_count": len(results),
+        "error_count": len(errors),
+        "errors": errors,
+    }
+
+
+job_manager.register("generate_batch", generate_batch_job)
@@ -3,8 +3,6 @@ from typing import List, Optional, Dict, Any, TYPE_CHECKING
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, text
 from pathlib import Path
-from io import BytesIO
-import pandas as pd
 import uuid
 import logging
 import re
@@ -24,6 +22,7 @@ from app.schemas.image_question import (
 )
 from app.schemas.subject import SubjectCreate
 from app.core.config import QUESTION_IMAGES_DIR, ANSWER_IMAGES_DIR
+from app.core.excel_reader import ExcelReader
 
 if TYPE_CHECKING:
     from app.services.subject_service import SubjectService
@@ -38,6 +37,11 @@ ANSWER_IMAGES_PATH = Path(ANSWER_IMAGES_DIR)
 IMAGE_NAME_PATTERN = re.compile(r'^[a-zA-Z0-9_\-]+$')
 
 
+def parse_image_question_excel(contents: bytes, filename: str) -> ImageUploadPreview:
+    """模組層級的解析入口，供 process pool 呼叫（解析不需要資料庫連線）"""
+    return ImageQuestionService(None).parse_excel(contents, filename)
+
+
 class ImageQuestionService:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -226,9 +230,7 @@ class ImageQuestionService:
         return None
 
     def parse_excel(self, contents: bytes, filename: str) -> ImageUploadPreview:
-        """解析 Excel 檔案"""
-        df = pd.read_excel(BytesIO(contents))
-
+        """逐列串流解析 Excel 檔案"""
         # 標準化欄位名稱（不分大小寫）
         column_mapping = {
             'q_image': 'question_image',
@@ -240,68 +242,66 @@ class ImageQuestionService:
             'page': 'page',
         }
 
-        df.columns = df.columns.str.lower().str.strip()
-        df = df.rename(columns=column_mapping)
-
-        # 驗證必要欄位
-        required_columns = ['question_image', 'subject']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise ValueError(f"Excel 缺少必要欄位: {', '.join(missing_columns)}")
-
         items: List[ImageQuestionPreviewItem] = []
         warnings: List[str] = []
         valid_count = 0
         error_count = 0
 
-        for idx, row in df.iterrows():
-            row_num = idx + 2  # Excel 行號（從1開始，加上標題行）
-
-            question_image = str(row.get('question_image', '')).strip()
-            answer_image = str(row.get('answer_image', '')).strip() if pd.notna(row.get('answer_image')) else None
-            subject = str(row.get('subject', '')).strip()
-
-            # 基本驗證
-            has_error = False
-            error_message = None
-
-            if not question_image or question_image == 'nan':
-                has_error = True
-                error_message = "問題圖片名稱不能為空"
-            elif not subject or subject == 'nan':
-                has_error = True
-                error_message = "科目不能為空"
-
-            # 檢查圖片是否存在
-            question_image_exists = self._check_image_exists(question_image, is_answer=False) if question_image else False
-            answer_image_exists = self._check_image_exists(answer_image, is_answer=True) if answer_image else False
-
-            if not question_image_exists and not has_error:
-                warnings.append(f"第 {row_num} 行：問題圖片 '{question_image}' 不存在")
-
-            if answer_image and not answer_image_exists:
-                warnings.append(f"第 {row_num} 行：答案圖片 '{answer_image}' 不存在")
-
-            item = ImageQuestionPreviewItem(
-                row_number=row_num,
-                question_image=question_image if question_image != 'nan' else '',
-                answer_image=answer_image if answer_image and answer_image != 'nan' else None,
-                question_description=str(row.get('question_description', '')).strip() if pd.notna(row.get('question_description')) else None,
-                subject=subject if subject != 'nan' else '',
-                chapter=str(row.get('chapter', '')).strip() if pd.notna(row.get('chapter')) else None,
-                grade=str(row.get('grade', '')).strip() if pd.notna(row.get('grade')) else None,
-                page=str(row.get('page', '')).strip() if pd.notna(row.get('page')) else None,
-                question_image_exists=question_image_exists,
-                answer_image_exists=answer_image_exists,
-                has_error=has_error,
-                error_message=error_message,
-            )
+        with ExcelReader(contents, filename, column_aliases=column_mapping, lowercase_columns=True) as reader:
+            # 驗證必要欄位
+            reader.require(['question_image', 'subject'], message="Excel 缺少必要欄位")
+
+            for record in reader:
+                row_num = record.row_number
+                question_image = record.text('question_image') or ''
+                answer_image = record.text('answer_image')
+                subject = record.text('subject') or ''
+
+                # 基本驗證
+                has_error = False
+                error_message = None
+
+                if not question_image:
+                    has_error = True
+                    error_message = "問題圖片名稱不能為空"
+                elif not subject:
+                    has_error = True
+                    error_message = "科目不能為空"
+
+                # 檢查圖片是否存在
+                question_image_exists = self._check_image_exists(question_image, is_answer=False) if question_image else False
+                answer_image_exists = self._check_image_exists(answer_image, is_answer=True) if answer_image else False
+
+                if not question_image_exists and not has_error:
+                    warnings.append(f"第 {row_num} 行：問題圖片 '{question_image}' 不存在")
+
+                if answer_image and not answer_image_exists:
+                    warnings.append(f"第 {row_num} 行：答案圖片 '{answer_image}' 不存在")
+
+                item = ImageQuestionPreviewItem(
+                    row_number=row_num,
+                    question_image=question_image,
+                    answer_image=answer_image,
+                    question_description=record.text('question_description'),
+                    subject=subject,
+                    chapter=record.text('chapter'),
+                    grade=record.text('grade'),
+                    page=record.text('page'),
+                    question_image_exists=question_image_exists,
+                    answer_image_exists=answer_image_exists,
+                    has_error=has_error,
+                    error_message=error_message,
+                )
 
-            items.append(item)
-            if has_error:
+                items.append(item)
+                if has_error:
+                    error_count += 1
+                else:
+                    valid_count += 1
+
+            for error in reader.errors:
+                warnings.append(f"第 {error.row_number} 行：{error.message}")
                 error_count += 1
-            else:
-                valid_count += 1
 
         return ImageUploadPreview(
             file_name=filename,
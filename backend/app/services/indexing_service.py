@@ -0,0 +1,277 @@
+"""
+文本塊向量化與寫入 Service — 供 ingest 與其他匯入流程共用。
+"""
+import hashlib
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.chunking import iter_chunks
+from app.core.config import (
+    EMBEDDING_BATCH_SIZE,
+    DEFAULT_CHUNK_SIZE,
+    UPLOAD_CHUNK_SIZE,
+    CHUNK_OVERLAP,
+)
+from app.core.embeddings import create_embeddings
+from app.core.jobs import Job, job_manager
+from app.db import database
+from app.db.models import Document, Embedding
+
+logger = logging.getLogger(__name__)
+
+# 以 UPLOAD_CHUNK_SIZE 分塊的匯入來源（Excel 上傳、命令列大量匯入）
+_UPLOAD_SOURCES = ("excel_upload", "cli_import")
+
+
+def document_chunk_params(
+    import_source: Optional[str],
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+) -> Tuple[int, int]:
+    """
+    文件重新分塊時應使用的 (chunk_size, overlap)
+
+    優先使用文件上記錄的分塊參數；舊資料沒有記錄時依匯入來源推定，
+    讓增量重建能與既有文本塊比對。
+    """
+    default_size = UPLOAD_CHUNK_SIZE if import_source in _UPLOAD_SOURCES else DEFAULT_CHUNK_SIZE
+    return (
+        chunk_size or default_size,
+        chunk_overlap if chunk_overlap is not None else CHUNK_OVERLAP,
+    )
+
+
+async def store_chunk_embeddings(
+    db: AsyncSession,
+    document_id: int,
+    chunk_texts: Sequence[str],
+    vectors: Optional[Sequence[Sequence[float]]] = None,
+) -> List[int]:
+    """
+    批次寫入文件的文本塊向量，回傳與 chunk_texts 順序對應的 embedding ID
+
+    向量未提供時會先以 create_embeddings 批次生成；寫入使用單一多列
+    ``INSERT ... RETURNING id``（不 commit，由呼叫端控制交易）。
+    """
+    if not chunk_texts:
+        return []
+
+    if vectors is None:
+        vectors = await create_embeddings(chunk_texts)
+
+    if len(vectors) != len(chunk_texts):
+        raise ValueError(
+            f"向量數量 ({len(vectors)}) 與文本塊數量 ({len(chunk_texts)}) 不一致"
+        )
+
+    embedding_ids = await _insert_embeddings(
+        db,
+        [
+            (document_id, chunk_text, vector)
+            for chunk_text, vector in zip(chunk_texts, vectors)
+        ],
+    )
+
+    logger.info("文件 %d 寫入 %d 筆 embedding", document_id, len(embedding_ids))
+    return embedding_ids
+
+
+def chunk_content_hash(chunk_text: str) -> str:
+    """文本塊內容的 SHA-256（hex），用來判斷文本塊是否改變"""
+    return hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()
+
+
+def diff_chunks(
+    existing: Sequence[Tuple[int, Optional[str], str]],
+    new_chunks: Sequence[str],
+) -> Tuple[List[int], List[Tuple[int, str]], List[str]]:
+    """
+    以內容 hash 的多重集合比對既有文本塊與新文本塊
+
+    Args:
+        existing: [(embedding_id, content_hash 或 None, slice_text), ...]
+        new_chunks: 重新分塊後的文本
+
+    Returns:
+        (要刪除的 embedding ID, 要回填 hash 的 [(id, hash)], 要向量化的新文本塊)
+    """
+    remaining = Counter(chunk_content_hash(text) for text in new_chunks)
+    stale_ids: List[int] = []
+    backfill: List[Tuple[int, str]] = []
+    for embedding_id, content_hash, slice_text in existing:
+        digest = content_hash or chunk_content_hash(slice_text)
+        if remaining[digest] > 0:
+            remaining[digest] -= 1
+            if content_hash is None:
+                backfill.append((embedding_id, digest))
+        else:
+            stale_ids.append(embedding_id)
+
+    # 依新內容的順序挑出還缺的文本塊（同內容重複出現時只補不足的份數）
+    to_embed: List[str] = []
+    for text in new_chunks:
+        digest = chunk_content_hash(text)
+        if remaining[digest] > 0:
+            remaining[digest] -= 1
+            to_embed.append(text)
+    return stale_ids, backfill, to_embed
+
+
+async def reindex_document(
+    db: AsyncSession,
+    document_id: int,
+    content: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP,
+) -> Dict[str, int]:
+    """
+    文件內容更新後增量重建 embedding（不 commit，由呼叫端控制交易）
+
+    重新分塊後以內容 hash 與既有文本塊做多重集合比對：
+    - 內容相同的文本塊保留原向量
+    - 新增或修改過的文本塊才重新向量化並寫入
+    - 不再出現的文本塊刪除
+
+    舊資料 content_hash 為 NULL 時依 slice_text 計算，並順便回填。
+    """
+    new_chunks = [c.text for c in iter_chunks(content or "", chunk_size, overlap)]
+    result = await db.execute(
+        select(Embedding.id, Embedding.content_hash, Embedding.slice_text)
+        .where(Embedding.document_id == document_id)
+        .order_by(Embedding.id)
+    )
+    stale_ids, backfill, to_embed = diff_chunks(result.all(), new_chunks)
+
+    if stale_ids:
+        await db.execute(delete(Embedding).where(Embedding.id.in_(stale_ids)))
+    if backfill:
+        await db.execute(
+            update(Embedding.__table__)
+            .where(Embedding.__table__.c.id == bindparam("b_id"))
+            .values(content_hash=bindparam("b_hash")),
+            [{"b_id": embedding_id, "b_hash": digest} for embedding_id, digest in backfill],
+        )
+    if to_embed:
+        await store_chunk_embeddings(db, document_id, to_embed)
+
+    stats = {
+        "kept": len(new_chunks) - len(to_embed),
+        "added": len(to_embed),
+        "removed": len(stale_ids),
+    }
+    logger.info(
+        "文件 %d 增量重建索引：保留 %d、新增 %d、刪除 %d",
+        document_id, stats["kept"], stats["added"], stats["removed"],
+    )
+    return stats
+
+
+async def embed_documents_job(
+    job: Job,
+    document_ids: List[int],
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP,
+) -> Dict[str, Any]:
+    """
+    背景工作：為已存在的文件批次生成並寫入 embedding
+
+    Args:
+        job: 背景工作（回報進度、檢查取消用）
+        document_ids: 要向量化的文件 ID
+        chunk_size / overlap: 分塊參數
+
+    文件內容從資料庫讀回再分塊（工作參數只存 ID，保持 jobs 表精簡）；
+    跨文件累積約 EMBEDDING_BATCH_SIZE 個文本塊為一批：一次向量化、
+    一次多列 INSERT、一次 commit，因此取消時已完成的批次會保留。
+
+    已寫入的文本塊以內容 hash 比對後略過（見 diff_chunks），失敗或取消後
+    以相同參數重新執行工作只會補上缺少的文本塊，不會重複寫入。
+    """
+    async with database.AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Document.id, Document.content).where(Document.id.in_(document_ids))
+        )
+        documents = [
+            (document_id, [c.text for c in iter_chunks(content or "", chunk_size, overlap)])
+            for document_id, content in result.all()
+        ]
+
+        result = await db.execute(
+            select(Embedding.id, Embedding.document_id, Embedding.content_hash, Embedding.slice_text)
+            .where(Embedding.document_id.in_([document_id for document_id, _ in documents]))
+            .order_by(Embedding.id)
+        )
+        existing: Dict[int, List[Tuple[int, Optional[str], str]]] = {}
+        for embedding_id, document_id, digest, slice_text in result.all():
+            existing.setdefault(document_id, []).append((embedding_id, digest, slice_text))
+        skipped = sum(len(chunks) for _, chunks in documents)
+        documents = [
+            (document_id, diff_chunks(existing.get(document_id, []), chunks)[2])
+            for document_id, chunks in documents
+        ]
+
+        total_chunks = sum(len(chunks) for _, chunks in documents)
+        skipped -= total_chunks
+        await job.set_progress(0, total_chunks, force=True)
+
+        embedded = 0
+        batch: List[Tuple[int, str]] = []
+        for document_id, chunks in documents:
+            batch.extend((document_id, chunk_text) for chunk_text in chunks)
+            if len(batch) >= EMBEDDING_BATCH_SIZE:
+                embedded += await _embed_and_store_batch(db, batch)
+                await job.set_progress(embedded)
+                batch = []
+        if batch:
+            embedded += await _embed_and_store_batch(db, batch)
+            await job.set_progress(embedded)
+
+    logger.info(
+        "背景向量化完成：%d 份文件、%d 個文本塊（略過已寫入的 %d 個）",
+        len(documents), embedded, skipped,
+    )
+    return {"documents": len(documents), "embedded_chunks": embedded, "skipped_chunks": skipped}
+
+
+async def _embed_and_store_batch(
+    db: AsyncSession,
+    batch: List[Tuple[int, str]],
+) -> int:
+    vectors = await create_embeddings([chunk_text for _, chunk_text in batch])
+    await _insert_embeddings(
+        db,
+        [
+            (document_id, chunk_text, vector)
+            for (document_id, chunk_text), vector in zip(batch, vectors)
+        ],
+    )
+    await db.commit()
+    return len(batch)
+
+
+async def _insert_embeddings(
+    db: AsyncSession,
+    rows: Sequence[Tuple[int, str, Sequence[float]]],
+) -> List[int]:
+    """單一多列 INSERT ... RETURNING id，回傳與 rows 順序對應的 ID"""
+    stmt = insert(Embedding).returning(Embedding.id, sort_by_parameter_order=True)
+    result = await db.execute(
+        stmt,
+        [
+            {
+                "document_id": document_id,
+                "slice_text": chunk_text,
+                "content_hash": chunk_content_hash(chunk_text),
+                "vector": vector,
+            }
+            for document_id, chunk_text, vector in rows
+        ],
+    )
+    return list(result.scalars())
+
+
+job_manager.register("document_embedding", embed_documents_job)
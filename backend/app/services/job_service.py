@@ -0,0 +1,164 @@
+"""
+背景工作資料存取 Service — jobs 表的讀寫。
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class JobService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create_job(self, job_id: str, job_type: str, params: Dict[str, Any]) -> BackgroundJob:
+        """建立 pending 狀態的工作"""
+        job = BackgroundJob(id=job_id, job_type=job_type, status="pending", params=params)
+        self.db.add(job)
+        await self.db.commit()
+        await self.db.refresh(job)
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[BackgroundJob]:
+        result = await self.db.execute(select(BackgroundJob).where(BackgroundJob.id == job_id))
+        return result.scalar_one_or_none()
+
+    async def get_jobs(
+        self,
+        job_type: Optional[str] = None,
+        status: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 20,
+    ) -> Dict[str, Any]:
+        """取得工作清單（新到舊）"""
+        conditions = []
+        if job_type:
+            conditions.append(BackgroundJob.job_type == job_type)
+        if status:
+            conditions.append(BackgroundJob.status == status)
+
+        query = select(BackgroundJob)
+        count_query = select(func.count(BackgroundJob.id))
+        if conditions:
+            query = query.where(and_(*conditions))
+            count_query = count_query.where(and_(*conditions))
+
+        query = query.order_by(BackgroundJob.created_at.desc()).offset(skip).limit(limit)
+        jobs = (await self.db.execute(query)).scalars().all()
+        total = await self.db.scalar(count_query)
+        return {"jobs": jobs, "total": total or 0}
+
+    async def claim_job(self, job_id: str) -> Optional[BackgroundJob]:
+        """原子地把 pending 工作改為 running；已被其他 worker 取走或已取消時回傳 None"""
+        result = await self.db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id, BackgroundJob.status == "pending")
+            .values(status="running", started_at=func.now())
+            .returning(BackgroundJob.id)
+        )
+        claimed = result.scalar_one_or_none()
+        await self.db.commit()
+        if not claimed:
+            return None
+        return await self.get_job(job_id)
+
+    async def update_progress(
+        self,
+        job_id: str,
+        done: int,
+        total: Optional[int] = None,
+        message: Optional[str] = None,
+    ) -> bool:
+        """寫回進度，並回傳是否已被要求取消（單一 round trip）"""
+        values: Dict[str, Any] = {"progress_done": done, "updated_at": func.now()}
+        if total is not None:
+            values["progress_total"] = total
+        if message is not None:
+            values["message"] = message[:255]
+        result = await self.db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id)
+            .values(**values)
+            .returning(BackgroundJob.cancel_requested)
+        )
+        cancel_requested = result.scalar_one_or_none()
+        await self.db.commit()
+        return bool(cancel_requested)
+
+    async def heartbeat(self, job_ids: List[str]) -> List[str]:
+        """更新執行中工作的 updated_at（避免被判定為中斷），回傳其中已被要求取消的 job ID"""
+        if not job_ids:
+            return []
+        result = await self.db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id.in_(job_ids), BackgroundJob.status == "running")
+            .values(updated_at=func.now())
+            .returning(BackgroundJob.id, BackgroundJob.cancel_requested)
+        )
+        rows = result.all()
+        await self.db.commit()
+        return [job_id for job_id, cancel_requested in rows if cancel_requested]
+
+    async def finish_job(
+        self,
+        job_id: str,
+        status: str,
+        result: Any = None,
+        error: Optional[str] = None,
+    ) -> bool:
+        """把 running 工作標記為結束；工作已不是 running（例如被判定中斷）時不覆寫，回傳 False"""
+        updated = await self.db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id, BackgroundJob.status == "running")
+            .values(status=status, result=result, error=error, finished_at=func.now())
+        )
+        await self.db.commit()
+        return bool(updated.rowcount)
+
+    async def request_cancel(self, job_id: str) -> Optional[BackgroundJob]:
+        """要求取消工作：pending 直接標記 cancelled，running 由執行中的 worker 處理"""
+        job = await self.get_job(job_id)
+        if not job or job.status in FINISHED_STATUSES:
+            return job
+
+        values: Dict[str, Any] = {"cancel_requested": True}
+        if job.status == "pending":
+            values.update(status="cancelled", finished_at=func.now())
+        await self.db.execute(
+            update(BackgroundJob).where(BackgroundJob.id == job_id).values(**values)
+        )
+        await self.db.commit()
+        await self.db.refresh(job)
+        return job
+
+    async def get_pending_job_ids(self) -> List[str]:
+        result = await self.db.execute(
+            select(BackgroundJob.id)
+            .where(BackgroundJob.status == "pending")
+            .order_by(BackgroundJob.created_at)
+        )
+        return list(result.scalars())
+
+    async def fail_stale_jobs(self, stale_seconds: int) -> int:
+        """
+        把長時間沒有更新的 running 工作標記為中斷（例如服務重啟）
+
+        執行中的工作由所在 worker 每 JOB_HEARTBEAT_SECONDS 更新 updated_at，
+        因此只有所屬程序已不存在的工作會超過 stale_seconds。
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=stale_seconds)
+        result = await self.db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.status == "running", BackgroundJob.updated_at < cutoff)
+            .values(status="failed", error="工作執行中斷（服務重啟或 worker 終止）", finished_at=func.now())
+        )
+        await self.db.commit()
+        return result.rowcount or 0
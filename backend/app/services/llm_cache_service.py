@@ -0,0 +1,86 @@
+"""
+LLM 回應快取資料存取 Service — llm_response_cache 表的讀寫與淘汰。
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import LLMResponseCache
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCacheService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get(self, key: str) -> Optional[str]:
+        """取得未過期的回應並記錄命中（單一 round trip）"""
+        result = await self.db.execute(
+            update(LLMResponseCache)
+            .where(LLMResponseCache.key == key, LLMResponseCache.expires_at > func.now())
+            .values(hit_count=LLMResponseCache.hit_count + 1, last_hit_at=func.now())
+            .returning(LLMResponseCache.response)
+        )
+        response = result.scalar_one_or_none()
+        await self.db.commit()
+        return response
+
+    async def put(self, key: str, model: str, response: str, prompt_chars: int, ttl_seconds: int) -> None:
+        """寫入回應；相同 key 已存在時覆寫並重設有效期限"""
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+        stmt = insert(LLMResponseCache).values(
+            key=key,
+            model=model[:100],
+            response=response,
+            prompt_chars=prompt_chars,
+            hit_count=0,
+            expires_at=expires_at,
+        )
+        await self.db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[LLMResponseCache.key],
+                set_={
+                    "response": stmt.excluded.response,
+                    "expires_at": stmt.excluded.expires_at,
+                    "last_hit_at": func.now(),
+                },
+            )
+        )
+        await self.db.commit()
+
+    async def evict(self, max_entries: int) -> int:
+        """刪除過期項目，並只保留最近使用的 max_entries 筆；回傳刪除筆數"""
+        expired = await self.db.execute(
+            delete(LLMResponseCache).where(LLMResponseCache.expires_at <= func.now())
+        )
+        overflow_keys = (
+            select(LLMResponseCache.key)
+            .order_by(LLMResponseCache.last_hit_at.desc())
+            .offset(max_entries)
+            .scalar_subquery()
+        )
+        overflow = await self.db.execute(
+            delete(LLMResponseCache).where(LLMResponseCache.key.in_(overflow_keys))
+        )
+        await self.db.commit()
+        return (expired.rowcount or 0) + (overflow.rowcount or 0)
+
+    async def clear(self) -> int:
+        result = await self.db.execute(delete(LLMResponseCache))
+        await self.db.commit()
+        return result.rowcount or 0
+
+    async def get_stats(self) -> Dict[str, Any]:
+        row = (await self.db.execute(
+            select(
+                func.count(LLMResponseCache.key),
+                func.coalesce(func.sum(LLMResponseCache.hit_count), 0),
+                func.coalesce(func.sum(func.length(LLMResponseCache.response)), 0),
+            )
+        )).one()
+        return {"entries": row[0], "stored_hits": int(row[1]), "response_chars": int(row[2])}
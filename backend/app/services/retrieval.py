@@ -1,71 +1,303 @@
-from typing import List, Tuple
+from typing import Dict, List, NamedTuple, Optional, Sequence
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from app.core.embeddings import create_embedding
+from app.core.embeddings import create_query_embedding
+from app.core.config import (
+    VECTOR_INDEX_TYPE,
+    HNSW_EF_SEARCH,
+    IVFFLAT_PROBES,
+)
 from app.db.models import Embedding
 
+
+class ChunkHit(NamedTuple):
+    """向量搜索命中的文本塊（不含向量本身，避免傳回 1536 維資料）"""
+    id: int
+    document_id: int
+    slice_text: str
+    score: float
+
+
+def _to_vector_literal(vector: Sequence[float]) -> str:
+    """將向量轉為 pgvector 文字格式 '[x1,x2,...]'，搭配 CAST(... AS vector) 使用"""
+    return "[" + ",".join(repr(float(x)) for x in vector) + "]"
+
+
+# pgvector >= 0.8 才有 iterative index scan；None 表示尚未偵測
+_iterative_scan_supported: Optional[bool] = None
+
+
+async def _supports_iterative_scan(db: AsyncSession) -> bool:
+    """偵測 pgvector 版本是否支援 hnsw / ivfflat.iterative_scan（結果在程序內快取）"""
+    global _iterative_scan_supported
+    if _iterative_scan_supported is None:
+        version = (await db.execute(
+            text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        )).scalar()
+        try:
+            parts = tuple(int(p) for p in (version or "0").split(".")[:2])
+        except ValueError:
+            parts = (0,)
+        _iterative_scan_supported = parts >= (0, 8)
+    return _iterative_scan_supported
+
+
+async def _apply_index_search_params(
+    db: AsyncSession,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> None:
+    """
+    設定本次交易的向量索引搜尋參數（等同 SET LOCAL，交易結束後自動還原）
+
+    - hnsw: hnsw.ef_search 越大召回越好、延遲越高
+    - ivfflat: ivfflat.probes 越大召回越好、延遲越高
+    - pgvector >= 0.8 另開啟 iterative_scan：WHERE document_id 是在索引
+      掃描之後才套用，開啟後索引會持續掃描直到湊滿 LIMIT 筆符合條件的結果
+    """
+    if VECTOR_INDEX_TYPE == "hnsw":
+        settings = {"hnsw.ef_search": ef_search or HNSW_EF_SEARCH}
+        if await _supports_iterative_scan(db):
+            settings["hnsw.iterative_scan"] = "relaxed_order"
+    else:
+        settings = {"ivfflat.probes": probes or IVFFLAT_PROBES}
+        if await _supports_iterative_scan(db):
+            settings["ivfflat.iterative_scan"] = "relaxed_order"
+
+    for name, value in settings.items():
+        await db.execute(
+            text("SELECT set_config(:name, :value, true)"),
+            {"name": name, "value": str(value)},
+        )
+
+
+async def _exact_search(
+    db: AsyncSession,
+    query_vector: Sequence[float],
+    document_ids: Sequence[int],
+    top_k: int,
+) -> Dict[int, list]:
+    """
+    不經向量索引、逐份文件精確計算距離的 top-k（近似搜尋結果不足時的 fallback）
+
+    以 row_number() 視窗函數排序，planner 無法改走 hnsw / ivfflat 索引；
+    document_id 條件仍可使用一般索引，只掃描指定文件的文本塊。
+    """
+    sql = text("""
+        SELECT id, document_id, slice_text, distance
+        FROM (
+            SELECT
+                id,
+                document_id,
+                slice_text,
+                vector <=> CAST(:query_vector AS vector) AS distance,
+                row_number() OVER (
+                    PARTITION BY document_id ORDER BY vector <=> CAST(:query_vector AS vector)
+                ) AS rank
+            FROM embeddings
+            WHERE document_id = ANY(CAST(:document_ids AS integer[]))
+        ) AS ranked
+        WHERE rank <= :limit
+        ORDER BY document_id, distance
+    """)
+    result = await db.execute(sql, {
+        "query_vector": _to_vector_literal(query_vector),
+        "document_ids": list(document_ids),
+        "limit": top_k,
+    })
+    rows_by_document: Dict[int, list] = {}
+    for row in result.fetchall():
+        rows_by_document.setdefault(row.document_id, []).append(row)
+    return rows_by_document
+
+
+async def _fill_short_results(
+    db: AsyncSession,
+    query_vector: Sequence[float],
+    rows_by_document: Dict[int, list],
+    document_ids: Sequence[int],
+    top_k: int,
+) -> None:
+    """
+    索引結果不足 top_k 筆的文件改以 _exact_search 補查（直接更新 rows_by_document）
+
+    pgvector >= 0.8 已以 iterative_scan 持續掃描，不再補查。否則先以
+    document_id 索引計算各文件的文本塊數，只補查文本塊多於已取回筆數的
+    文件 —— 短文件本來就不足 top_k 筆，不需要再精確計算一次。
+    """
+    if await _supports_iterative_scan(db):
+        return
+    short = [doc_id for doc_id in document_ids if len(rows_by_document.get(doc_id, [])) < top_k]
+    if not short:
+        return
+
+    result = await db.execute(text("""
+        SELECT document_id, count(*) AS chunk_count
+        FROM embeddings
+        WHERE document_id = ANY(CAST(:document_ids AS integer[]))
+        GROUP BY document_id
+    """), {"document_ids": short})
+    chunk_counts = {row.document_id: row.chunk_count for row in result.fetchall()}
+
+    missing = [
+        doc_id for doc_id in short
+        if chunk_counts.get(doc_id, 0) > len(rows_by_document.get(doc_id, []))
+    ]
+    if missing:
+        rows_by_document.update(await _exact_search(db, query_vector, missing, top_k))
+
+
 async def search_similar_chunks(
     db: AsyncSession,
     query: str,
     document_id: int,
     top_k: int = 5,
-    similarity_threshold: float = 0.1
-) -> List[Tuple[Embedding, float]]:
+    similarity_threshold: float = 0.1,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> List[ChunkHit]:
     """
     使用向量相似度搜索相關文本塊
-    
+
+    查詢只做純粹的 ``ORDER BY vector <=> q LIMIT k``，讓 Postgres 能走
+    hnsw / ivfflat 索引；相似度閾值在取回 top-k 之後才於 Python 端過濾。
+    只選取呼叫端需要的欄位，不會把 vector 欄位傳回 Python。
+
+    向量索引是全表的近似索引，document_id 條件在索引掃描之後才套用：
+    文件只佔全表一小部分時，索引候選中可能湊不滿 k 筆。pgvector >= 0.8
+    以 iterative_scan 繼續掃描；較舊版本取回的筆數少於 k 且少於該文件的
+    文本塊數時，改以 _exact_search 對該文件精確計算，因此結果不會少於舊的
+    全表精確掃描（但索引命中時仍是近似的 top-k，不保證與精確排序完全相同）。
+
     Args:
         db: 資料庫會話
         query: 查詢文本
         document_id: 文件ID
         top_k: 返回結果數量
         similarity_threshold: 相似度閾值
-        
+        ef_search: 覆寫 hnsw.ef_search（None 使用 HNSW_EF_SEARCH）
+        probes: 覆寫 ivfflat.probes（None 使用 IVFFLAT_PROBES）
+
     Returns:
-        List of (embedding, similarity_score) tuples
+        依相似度由高到低排列的 ChunkHit 列表
     """
-    # 生成查詢向量
-    query_vector = await create_embedding(query)
-    
-    # 構建相似度搜索查詢
-    # 使用餘弦相似度: 1 - (vector <=> query_vector)
+    # 生成查詢向量（經過查詢向量快取）
+    query_vector = await create_query_embedding(query)
+
+    await _apply_index_search_params(db, ef_search=ef_search, probes=probes)
+
+    # ORDER BY 直接使用索引表達式 vector <=> q（餘弦距離），相似度 = 1 - 距離
     sql = text("""
-        SELECT 
+        SELECT
             id,
             document_id,
             slice_text,
-            vector,
-            created_at,
-            (1 - (vector <=> :query_vector)) as similarity
-        FROM embeddings 
+            vector <=> CAST(:query_vector AS vector) AS distance
+        FROM embeddings
         WHERE document_id = :document_id
-        AND (1 - (vector <=> :query_vector)) > :threshold
-        ORDER BY similarity DESC
+        ORDER BY vector <=> CAST(:query_vector AS vector)
         LIMIT :limit
     """)
-    
+
     result = await db.execute(sql, {
-        "query_vector": query_vector,
+        "query_vector": _to_vector_literal(query_vector),
         "document_id": document_id,
-        "threshold": similarity_threshold,
         "limit": top_k
     })
-    
-    rows = result.fetchall()
-    
-    # 轉換為 (Embedding, similarity) 元組
-    embeddings_with_scores = []
-    for row in rows:
-        embedding = Embedding(
-            id=row.id,
-            document_id=row.document_id,
-            slice_text=row.slice_text,
-            vector=row.vector,
-            created_at=row.created_at
-        )
-        embeddings_with_scores.append((embedding, row.similarity))
-    
-    return embeddings_with_scores
+    rows_by_document = {document_id: result.fetchall()}
+    await _fill_short_results(db, query_vector, rows_by_document, [document_id], top_k)
+
+    return _rows_to_hits(rows_by_document[document_id], similarity_threshold)
+
+
+async def search_similar_chunks_multi(
+    db: AsyncSession,
+    query: str,
+    document_ids: Sequence[int],
+    top_k: int = 5,
+    similarity_threshold: float = 0.1,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> Dict[int, List[ChunkHit]]:
+    """
+    一次查詢多份文件的相似文本塊（每份文件各取 top_k）
+
+    查詢向量只生成一次，並以 ``unnest(:document_ids)`` 搭配 LATERAL 子查詢，
+    在單一 round trip 內對每份文件各自做 ``ORDER BY vector <=> q LIMIT k``。
+    索引結果不足 k 筆的文件再以一次 _exact_search 補查（見 _fill_short_results）。
+
+    Args:
+        db: 資料庫會話
+        query: 查詢文本
+        document_ids: 文件ID列表（重複的 ID 只查詢一次）
+        top_k: 每份文件返回結果數量上限
+        similarity_threshold: 相似度閾值
+        ef_search: 覆寫 hnsw.ef_search（None 使用 HNSW_EF_SEARCH）
+        probes: 覆寫 ivfflat.probes（None 使用 IVFFLAT_PROBES）
+
+    Returns:
+        {document_id: [ChunkHit, ...]}，依 document_ids 順序排列；
+        找不到內容的文件不會出現在結果中
+    """
+    unique_ids = list(dict.fromkeys(document_ids))
+    if not unique_ids:
+        return {}
+
+    query_vector = await create_query_embedding(query)
+
+    await _apply_index_search_params(db, ef_search=ef_search, probes=probes)
+
+    sql = text("""
+        SELECT
+            e.id,
+            d.document_id,
+            e.slice_text,
+            e.distance
+        FROM unnest(CAST(:document_ids AS integer[])) WITH ORDINALITY AS d(document_id, ord)
+        CROSS JOIN LATERAL (
+            SELECT
+                id,
+                slice_text,
+                vector <=> CAST(:query_vector AS vector) AS distance
+            FROM embeddings
+            WHERE embeddings.document_id = d.document_id
+            ORDER BY vector <=> CAST(:query_vector AS vector)
+            LIMIT :limit
+        ) AS e
+        ORDER BY d.ord, e.distance
+    """)
+
+    result = await db.execute(sql, {
+        "query_vector": _to_vector_literal(query_vector),
+        "document_ids": unique_ids,
+        "limit": top_k
+    })
+
+    rows_by_document: Dict[int, list] = {}
+    for row in result.fetchall():
+        rows_by_document.setdefault(row.document_id, []).append(row)
+
+    await _fill_short_results(db, query_vector, rows_by_document, unique_ids, top_k)
+
+    results: Dict[int, List[ChunkHit]] = {}
+    for doc_id in unique_ids:
+        hits = _rows_to_hits(rows_by_document.get(doc_id, []), similarity_threshold)
+        if hits:
+            results[doc_id] = hits
+    return results
+
+
+def _rows_to_hits(rows: Sequence, similarity_threshold: float) -> List[ChunkHit]:
+    """將查詢結果依距離排序後轉換為 ChunkHit，並套用相似度閾值"""
+    hits: List[ChunkHit] = []
+    # iterative_scan 的 relaxed_order 不保證結果嚴格依距離排序
+    for row in sorted(rows, key=lambda r: r.distance):
+        similarity = 1 - row.distance
+        if similarity <= similarity_threshold:
+            # 已依距離排序，之後的結果只會更不相似
+            break
+        hits.append(ChunkHit(row.id, row.document_id, row.slice_text, similarity))
+    return hits
 
 async def search_by_document_only(
     db: AsyncSession,
@@ -0,0 +1,151 @@
+"""
+串流 ingest Service — 以固定記憶體處理超大文本（/api/ingest/stream）。
+
+文字片段逐段到達時：
+
+- 餵給 SentenceChunker，每累積 EMBEDDING_BATCH_SIZE 個塊就生成向量並寫入
+  embeddings（分頁寫入，不保留已寫出的塊）
+- 原文每累積 STREAM_INGEST_CONTENT_PAGE 字元寫入交易內的暫存表，最後以
+  一次 ``string_agg`` 組回 documents.content（避免反覆 ``content || piece``
+  讓 Postgres 每次重寫整份 TOAST 值）
+- 去重指紋以 IncrementalFingerprint 分段計算
+
+全部寫入在同一個交易內，由呼叫端 commit；中途失敗或用戶端斷線時 rollback
+不會留下半份文件。內容與既有文件完全相同時回傳既有文件（呼叫端應 rollback）。
+"""
+import logging
+from typing import Any, AsyncIterable, Dict, List, Optional
+
+from sqlalchemy import literal_column, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.chunking import SentenceChunker
+from app.core.config import DEFAULT_CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_BATCH_SIZE, STREAM_INGEST_CONTENT_PAGE
+from app.core.dedup import IncrementalFingerprint
+from app.core.embeddings import create_embeddings
+from app.db.models import Document
+from app.services.document_service import DocumentService
+from app.services.indexing_service import store_chunk_embeddings
+
+logger = logging.getLogger(__name__)
+
+_PIECES_TABLE = "ingest_stream_pieces"
+
+
+class StreamIngestor:
+    def __init__(self, db: AsyncSession, chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
+        self.db = db
+        self.chunker = SentenceChunker(chunk_size, overlap)
+        self.fingerprint = IncrementalFingerprint()
+        self.document_id: int = 0
+        self.total_chunks = 0
+        self.total_chars = 0
+        self._chunk_page: List[str] = []
+        self._content_page: List[str] = []
+        self._content_page_chars = 0
+        self._content_seq = 0
+        self._held_whitespace = ""
+
+    async def ingest(self, pieces: AsyncIterable[str], subject: str, title: Optional[str] = None) -> Dict[str, Any]:
+        """
+        讀完所有文字片段並寫入文件與向量（不 commit）
+
+        Returns:
+            {"document_id", "total_chunks", "total_chars", "duplicate", "near_duplicates"}
+        Raises:
+            ValueError: 內容為空，無法分塊
+        """
+        doc = Document(subject=subject, title=title, content="")
+        self.db.add(doc)
+        await self.db.flush()  # 取得 doc.id，embedding 的外鍵需要
+        self.document_id = doc.id
+        await self.db.execute(text(
+            f"CREATE TEMP TABLE {_PIECES_TABLE} (seq integer PRIMARY KEY, piece text NOT NULL) ON COMMIT DROP"
+        ))
+
+        async for piece in pieces:
+            await self._feed(piece)
+        await self._add_chunks(self.chunker.finish())
+        await self._flush_chunks()
+        await self._flush_content()
+
+        if self.total_chunks == 0:
+            raise ValueError("文本內容無法分塊處理")
+
+        fingerprint = self.fingerprint.result()
+        service = DocumentService(self.db)
+        existing = await service.find_documents_by_content_hash([fingerprint["content_hash"]], subject=subject)
+        if existing:
+            return self._result(existing[fingerprint["content_hash"]], duplicate=True)
+
+        near_duplicates = await service.find_near_duplicates(fingerprint["simhash"], exclude_id=doc.id)
+        await self.db.execute(
+            update(Document)
+            .where(Document.id == doc.id)
+            .values(
+                content=literal_column(
+                    f"(SELECT string_agg(piece, '' ORDER BY seq) FROM {_PIECES_TABLE})"
+                ),
+                **fingerprint,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        logger.info(
+            "串流 ingest 文件 %d：%d 字元、%d 個文本塊", doc.id, self.total_chars, self.total_chunks
+        )
+        return self._result(doc.id, near_duplicates=near_duplicates)
+
+    # ------------------------------------------------------------------ #
+    #  Internals
+    # ------------------------------------------------------------------ #
+    async def _feed(self, piece: str) -> None:
+        # 與 IngestRequest 相同去除首尾空白：開頭的空白丟掉，結尾的空白先保留到下一段
+        piece = self._held_whitespace + piece
+        if not self.total_chars:
+            piece = piece.lstrip()
+        body = piece.rstrip()
+        self._held_whitespace = piece[len(body):]
+        if not body:
+            return
+
+        self.total_chars += len(body)
+        self.fingerprint.feed(body)
+        self._content_page.append(body)
+        self._content_page_chars += len(body)
+        await self._add_chunks(self.chunker.feed(body))
+        if self._content_page_chars >= STREAM_INGEST_CONTENT_PAGE:
+            await self._flush_content()
+
+    async def _add_chunks(self, chunks) -> None:
+        for chunk in chunks:
+            self._chunk_page.append(chunk.text)
+            if len(self._chunk_page) >= EMBEDDING_BATCH_SIZE:
+                await self._flush_chunks()
+
+    async def _flush_chunks(self) -> None:
+        if not self._chunk_page:
+            return
+        page, self._chunk_page = self._chunk_page, []
+        vectors = await create_embeddings(page)
+        await store_chunk_embeddings(self.db, self.document_id, page, vectors)
+        self.total_chunks += len(page)
+
+    async def _flush_content(self) -> None:
+        if not self._content_page:
+            return
+        self._content_seq += 1
+        await self.db.execute(
+            text(f"INSERT INTO {_PIECES_TABLE} (seq, piece) VALUES (:seq, :piece)"),
+            {"seq": self._content_seq, "piece": "".join(self._content_page)},
+        )
+        self._content_page = []
+        self._content_page_chars = 0
+
+    def _result(self, document_id: int, duplicate: bool = False, near_duplicates=None) -> Dict[str, Any]:
+        return {
+            "document_id": document_id,
+            "total_chunks": self.total_chunks,
+            "total_chars": self.total_chars,
+            "duplicate": duplicate,
+            "near_duplicates": near_duplicates or [],
+        }
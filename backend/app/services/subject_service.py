@@ -1,7 +1,7 @@
 import logging
-from typing import List, Optional
+from typing import Iterable, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, and_
+from sqlalchemy import select, update, delete, and_, text
 from sqlalchemy.exc import IntegrityError
 
 from app.db.models import Subject, Template
@@ -77,6 +77,45 @@ class SubjectService:
         logger.info(f"建立科目: {subject.name} (年級: {subject.grade})")
         return subject
 
+    async def ensure_subjects(
+        self,
+        names: Iterable[str],
+        description: str = "自動建立於匯入",
+        color: str = "#3B82F6",
+    ) -> List[str]:
+        """
+        批次確保科目存在，回傳新建立的科目名稱
+
+        已有同名科目（任何年級）時不另建；其餘以年級 '' 建立。單一
+        ``INSERT ... SELECT unnest(...) ON CONFLICT (name, grade) DO NOTHING``，
+        並行匯入同一科目也不會衝突。
+        """
+        max_length = Subject.__table__.c.name.type.length
+        unique_names = sorted({
+            name.strip() for name in names
+            if name and name.strip() and len(name.strip()) <= max_length
+        })
+        if not unique_names:
+            return []
+
+        result = await self.db.execute(
+            text("""
+                INSERT INTO subjects (name, description, color, grade, is_active)
+                SELECT n, :description, :color, '', true
+                FROM unnest(CAST(:names AS varchar[])) AS n
+                WHERE NOT EXISTS (SELECT 1 FROM subjects s WHERE s.name = n)
+                ON CONFLICT (name, grade) DO NOTHING
+                RETURNING name
+            """),
+            {"names": unique_names, "description": description, "color": color},
+        )
+        created = list(result.scalars())
+        await self.db.commit()
+
+        if created:
+            logger.info("自動建立科目: %s", ", ".join(created))
+        return created
+
     async def update_subject(
         self,
         subject_id: int,
@@ -2,13 +2,14 @@
 Excel 上傳 Service — 從 routers/upload.py 提取的業務邏輯。
 """
 import logging
-from typing import List, Dict, Any, Optional, TYPE_CHECKING
-
-import pandas as pd
-import io
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
 
 from app.services.document_service import DocumentService
+from app.services import indexing_service  # noqa: F401  import 時註冊 document_embedding 工作
+from app.core.jobs import job_manager
 from app.core.config import UPLOAD_CHUNK_SIZE, CHUNK_OVERLAP
+from app.core.chunking import iter_chunks
+from app.core.excel_reader import ExcelReader
 
 if TYPE_CHECKING:
     from app.services.subject_service import SubjectService
@@ -22,177 +23,135 @@ def generate_content_chunks(
     overlap: int = CHUNK_OVERLAP,
 ) -> List[Dict[str, Any]]:
     """將長文本分割成較小的塊（用於 RAG 系統）"""
-    if len(content) <= chunk_size:
-        return [
-            {
-                "chunk_index": 1,
-                "text": content,
-                "start_pos": 0,
-                "end_pos": len(content),
-                "length": len(content),
-            }
-        ]
-
-    chunks: List[Dict[str, Any]] = []
-    start = 0
-    chunk_index = 1
-
-    while start < len(content):
-        end = min(start + chunk_size, len(content))
-
-        if end < len(content):
-            for break_char in ["。", "\\n", ".", "!", "?"]:
-                last_break = content.rfind(break_char, start, end)
-                if last_break > start:
-                    end = last_break + 1
-                    break
-
-        chunk_text = content[start:end].strip()
-        if chunk_text:
-            chunks.append(
-                {
-                    "chunk_index": chunk_index,
-                    "text": chunk_text,
-                    "start_pos": start,
-                    "end_pos": end,
-                    "length": len(chunk_text),
-                }
-            )
-            chunk_index += 1
+    return [
+        {
+            "chunk_index": chunk_index,
+            "text": chunk.text,
+            "start_pos": chunk.start,
+            "end_pos": chunk.end,
+            "length": len(chunk.text),
+        }
+        for chunk_index, chunk in enumerate(
+            iter_chunks(content, max_chunk_size=chunk_size, overlap=overlap), start=1
+        )
+    ]
 
-        start = max(end - overlap, start + 1)
 
-    return chunks
+def build_document_title(content: str, chapter: str) -> str:
+    """以章節第一行（或內容開頭）作為文件標題"""
+    if chapter:
+        title = (
+            chapter.split("\\n")[0][:100]
+            if "\\n" in chapter
+            else chapter[:100]
+        )
+    else:
+        title = content[:50] + "..." if len(content) > 50 else content
+    return title.strip()
 
 
-def parse_excel(contents: bytes, filename: str) -> List[Dict[str, Any]]:
+def parse_excel(contents: bytes, filename: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     """
-    解析 Excel 文件，回傳 processed_documents 列表。
-    """
-    df = pd.read_excel(io.BytesIO(contents))
-
-    logger.info("成功讀取 Excel 文件 %s，包含 %d 筆資料", filename, len(df))
-
-    required_columns = ["Words", "Chapter", "Subject", "Imagesrelated"]
-    missing_columns = [col for col in required_columns if col not in df.columns]
-
-    if missing_columns:
-        raise ValueError(
-            f"Excel 文件缺少必要欄位: {', '.join(missing_columns)}"
-        )
+    逐列串流解析 Excel 文件，回傳 (processed_documents, row_errors)。
 
+    row_errors 為 [{"row", "error"}]；有問題的列會略過，不影響其他列。
+    """
     processed_documents: List[Dict[str, Any]] = []
-    for index, row in df.iterrows():
-        content = str(row["Words"]) if pd.notna(row["Words"]) else ""
-        chapter = str(row["Chapter"]) if pd.notna(row["Chapter"]) else ""
-        subject = str(row["Subject"]) if pd.notna(row["Subject"]) else "健康"
-        image_filename = (
-            str(row["Imagesrelated"]) if pd.notna(row["Imagesrelated"]) else None
-        )
-
-        grade = None
-        if "Grade" in df.columns and pd.notna(row["Grade"]):
-            grade = str(row["Grade"]).strip()
-
-        page_number = None
-        if "Page" in df.columns and pd.notna(row["Page"]):
-            page_number = str(row["Page"]).strip()
+    row_errors: List[Dict[str, Any]] = []
+
+    with ExcelReader(contents, filename) as reader:
+        reader.require(["Words", "Chapter", "Subject", "Imagesrelated"])
+
+        for record in reader:
+            content = record.get("Words", "")
+            if not content.strip():
+                row_errors.append({"row": record.row_number, "error": "Words 欄位為空"})
+                continue
+
+            chapter = record.get("Chapter", "")
+            subject = record.get("Subject", "健康")
+            image_filename = record.get("Imagesrelated")
+            grade = record.text("Grade")
+            page_number = record.text("Page")
+
+            title = build_document_title(content, chapter)
+            chunks = generate_content_chunks(content)
+
+            doc_data = {
+                "index": record.row_number - 1,
+                "title": title,
+                "content": content,
+                "subject": subject,
+                "grade": grade,
+                "page_number": page_number,
+                "chapter": chapter,
+                "image_filename": image_filename,
+                "chunks": chunks,
+                "chunk_count": len(chunks),
+                "content_length": len(content),
+            }
+            processed_documents.append(doc_data)
 
-        if chapter:
-            title = (
-                chapter.split("\\n")[0][:100]
-                if "\\n" in chapter
-                else chapter[:100]
-            )
-        else:
-            title = content[:50] + "..." if len(content) > 50 else content
-
-        chunks = generate_content_chunks(content)
-
-        doc_data = {
-            "index": index + 1,
-            "title": title.strip(),
-            "content": content,
-            "subject": subject,
-            "grade": grade,
-            "page_number": page_number,
-            "chapter": chapter,
-            "image_filename": image_filename,
-            "chunks": chunks,
-            "chunk_count": len(chunks),
-            "content_length": len(content),
-        }
-        processed_documents.append(doc_data)
+        row_errors.extend(
+            {"row": error.row_number, "error": error.message} for error in reader.errors
+        )
 
-    return processed_documents
+    logger.info(
+        "解析 Excel 文件 %s：%d 筆資料、%d 列錯誤",
+        filename, len(processed_documents), len(row_errors),
+    )
+    return processed_documents, row_errors
 
 
 async def save_documents(
     processed_documents: List[Dict[str, Any]],
     service: DocumentService,
     subject_service: Optional["SubjectService"] = None,
-) -> int:
-    """批量儲存文件到資料庫，回傳成功數量。"""
-    saved_count = 0
-    created_subjects: set[str] = set()  # 追蹤已建立的科目，避免重複查詢
-
-    for doc_data in processed_documents:
-        try:
-            subject_name = doc_data["subject"]
-
-            # 自動建立科目（若不存在）
-            if subject_service and subject_name not in created_subjects:
-                success = await _ensure_subject_exists(subject_service, subject_name)
-                if success:
-                    created_subjects.add(subject_name)
-                # 即使科目建立失敗，仍繼續儲存文件（文件的 subject 欄位是文字，非外鍵）
-
-            await service.create_document(
-                {
-                    "title": doc_data["title"],
-                    "content": doc_data["content"],
-                    "subject": doc_data["subject"],
-                    "grade": doc_data.get("grade"),
-                    "page_number": doc_data.get("page_number"),
-                    "chapter": doc_data["chapter"],
-                    "image_filename": doc_data["image_filename"],
-                    "import_source": "excel_upload",
-                }
-            )
-            saved_count += 1
-        except Exception as e:
-            logger.error("儲存第 %d 筆資料失敗: %s", doc_data["index"], e)
-    return saved_count
-
-
-async def _ensure_subject_exists(
-    subject_service: "SubjectService",
-    subject_name: str,
-) -> bool:
-    """檢查科目是否存在，若不存在則自動建立。回傳是否成功。"""
-    from app.schemas.subject import SubjectCreate
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    批量儲存文件到資料庫，回傳 (saved, failed)
 
-    try:
-        existing = await subject_service.get_subject_by_name(subject_name)
-        if existing:
-            return True
+    - saved: 成功儲存的 [{"index", "document_id"}]
+    - failed: 失敗的 [{"row", "error"}]（row 為 Excel 行號）
 
-        await subject_service.create_subject(
-            SubjectCreate(
-                name=subject_name,
+    科目以一次 upsert 建立；文件以多列 INSERT 在單一交易內寫入。
+    內容與既有文件完全相同的列會略過（重新上傳同一份 Excel 不會產生重複）。
+    """
+    if subject_service:
+        try:
+            await subject_service.ensure_subjects(
+                (doc_data["subject"] for doc_data in processed_documents),
                 description="自動建立於 Excel 匯入",
-                color="#3B82F6",
             )
-        )
-        logger.info("自動建立科目: %s", subject_name)
-        return True
-    except ValueError as e:
-        # 科目可能被另一個並行請求建立，檢查是否為「已存在」錯誤
-        if "已存在" in str(e):
-            logger.debug("科目 %s 已存在（並行建立）", subject_name)
-            return True
-        logger.warning("建立科目 %s 失敗: %s", subject_name, e)
-        return False
-    except Exception as e:
-        logger.warning("建立科目 %s 失敗: %s", subject_name, e)
-        return False
+        except Exception as e:
+            await subject_service.db.rollback()
+            # 即使科目建立失敗，仍繼續儲存文件（文件的 subject 欄位是文字，非外鍵）
+            logger.warning("自動建立科目失敗: %s", e)
+
+    results = await service.bulk_create_documents(
+        processed_documents, import_source="excel_upload", skip_duplicates=True
+    )
+
+    saved: List[Dict[str, Any]] = []
+    failed: List[Dict[str, Any]] = []
+    for doc_data, result in zip(processed_documents, results):
+        if result["document_id"] is not None:
+            saved.append({"index": doc_data["index"], "document_id": result["document_id"]})
+        else:
+            failed.append({"row": doc_data["index"] + 1, "error": result["error"]})
+            if result["duplicate_of"] is None:
+                logger.error("儲存第 %d 筆資料失敗: %s", doc_data["index"], result["error"])
+    return saved, failed
+
+
+async def enqueue_embedding_job(saved: List[Dict[str, Any]]) -> Optional[str]:
+    """把已儲存的文件送進背景向量化工作，回傳 job ID（沒有文件時回傳 None）"""
+    document_ids = [entry["document_id"] for entry in saved]
+    if not document_ids:
+        return None
+    return await job_manager.submit(
+        "document_embedding",
+        document_ids=document_ids,
+        chunk_size=UPLOAD_CHUNK_SIZE,
+        overlap=CHUNK_OVERLAP,
+    )
@@ -0,0 +1,153 @@
+"""
+JSON 擷取微基準 — 比較舊的 regex 擷取與 JsonObjectExtractor。
+
+使用方式（在 backend/ 目錄下）::
+
+    python -m benchmarks.bench_json_extract [--repeat 200] [--responses responses.jsonl]
+
+--responses 指定實際擷取的 Claude 回應：每行一個 {"name": ..., "response": ...}
+的 JSONL 檔，或一個目錄（每個 *.txt 檔是一則原始回應）。開啟 LLM 回應快取
+（LLM_CACHE_ENABLED=true）後，可從 llm_response_cache 表匯出::
+
+    psql "$DATABASE_URL" -Atc "SELECT json_build_object('name', left(key, 12), 'response', response)
+        FROM llm_response_cache ORDER BY last_hit_at DESC LIMIT 200" > responses.jsonl
+
+未指定時使用合成樣本：依 Claude 回應常見的格式（裸陣列、markdown code block、
+{"questions": [...]} 包裝、說明文字夾雜物件）產生，並放大題數模擬大批生成；
+數字只反映這些格式，不代表實際回應的分佈。舊實作只作為對照，保留在此檔內。
+
+單一 code block 的回應以 orjson 直接解析區塊內容，不逐字掃描；區塊外還有
+JSON 或區塊內容不合法時才交給擷取器，這類回應仍比舊實作的 regex 慢。
+"""
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.json_stream import JsonObjectExtractor, extract_json_objects
+
+
+def _question(i: int) -> Dict[str, Any]:
+    return {
+        "type": "matching",
+        "prompt": f"第 {i} 題：請將左欄的 \"概念\" 與右欄的 [定義] 配對",
+        "answer": {"A": "1", "B": "2", "C": "3"},
+        "explanation": "配對依據：{概念} 對應 {定義}\\n參考課本第 3 章",
+        "question_data": {"left": ["甲", "乙", "丙"], "right": ["一", "二", "三"]},
+    }
+
+
+def _synthetic_responses(count: int) -> Dict[str, str]:
+    questions = [_question(i) for i in range(count)]
+    body = json.dumps(questions, ensure_ascii=False, indent=2)
+    loose = "\n\n".join(
+        f"第 {i} 題如下：\n{json.dumps(q, ensure_ascii=False)}" for i, q in enumerate(questions)
+    )
+    return {
+        "bare_array": body,
+        "fenced": f"以下是依照範本生成的題目：\n```json\n{body}\n```\n如需調整請告知。",
+        "wrapper": json.dumps({"questions": questions}, ensure_ascii=False),
+        "loose_objects": loose,
+    }
+
+
+def _captured_responses(path: Path) -> Dict[str, str]:
+    """讀取實際擷取的回應（JSONL 檔或 *.txt 目錄）"""
+    if path.is_dir():
+        return {f.stem: f.read_text(encoding="utf-8") for f in sorted(path.glob("*.txt"))}
+    responses: Dict[str, str] = {}
+    with path.open(encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if line.strip():
+                entry = json.loads(line)
+                responses[str(entry.get("name") or i)] = entry["response"]
+    return responses
+
+
+# ---- 舊實作（對照組） ---- #
+def _legacy_extract(response: str) -> Optional[str]:
+    code_match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", response, re.IGNORECASE)
+    if code_match:
+        return code_match.group(1).strip()
+    start = response.find("[")
+    if start != -1:
+        depth = 0
+        for i in range(start, len(response)):
+            if response[i] == "[":
+                depth += 1
+            elif response[i] == "]":
+                depth -= 1
+                if depth == 0:
+                    return response[start : i + 1]
+    objects = re.findall(r"\{[\s\S]*?\}", response)
+    if objects:
+        return "[" + ",".join(objects) + "]"
+    return None
+
+
+def legacy_parse(raw: str) -> List[Any]:
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        extracted = _legacy_extract(raw)
+        if not extracted:
+            return []
+        try:
+            data = json.loads(extracted)
+        except json.JSONDecodeError:
+            return []
+    if isinstance(data, dict) and "questions" in data:
+        data = data["questions"]
+    return data if isinstance(data, list) else []
+
+
+def streamed_parse(raw: str, step: int = 64) -> List[Any]:
+    """以串流方式（每次 step 個字元，模擬 text delta）餵入"""
+    extractor = JsonObjectExtractor()
+    items: List[Any] = []
+    for i in range(0, len(raw), step):
+        items.extend(extractor.feed(raw[i : i + step]))
+    return items
+
+
+def _bench(fn: Callable[[str], List[Any]], raw: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(raw)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=50, help="合成樣本每個回應的題數")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--responses", type=Path, help="實際回應的 JSONL 檔或 *.txt 目錄")
+    args = parser.parse_args()
+
+    if args.responses:
+        responses = _captured_responses(args.responses)
+        print(f"captured responses: {len(responses)} from {args.responses}")
+    else:
+        responses = _synthetic_responses(args.count)
+        print("synthetic responses (use --responses for captured ones)")
+
+    totals = {"legacy": 0.0, "extractor": 0.0}
+    print(f"{'response':<14}{'chars':>9}  {'legacy ms':>10}{'found':>7}  {'extractor ms':>13}{'found':>7}  {'streamed ms':>12}")
+    for name, raw in responses.items():
+        legacy_ms = _bench(legacy_parse, raw, args.repeat)
+        extractor_ms = _bench(extract_json_objects, raw, args.repeat)
+        totals["legacy"] += legacy_ms
+        totals["extractor"] += extractor_ms
+        print(
+            f"{name[:13]:<14}{len(raw):>9}  "
+            f"{legacy_ms:>10.3f}{len(legacy_parse(raw)):>7}  "
+            f"{extractor_ms:>13.3f}{len(extract_json_objects(raw)):>7}  "
+            f"{_bench(streamed_parse, raw, args.repeat):>12.3f}"
+        )
+    print(f"{'total':<14}{'':>9}  {totals['legacy']:>10.3f}{'':>7}  {totals['extractor']:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import json
+
+import pytest
+
+from app.core.fake_message_batches import FakeMessageBatchServer
+from app.core.jobs import JobCancelled
+from app.core.llm_client import template_prompt
+from app.core.message_batches import MessageBatchClient
+from app.core.prompt_cache import build_api_params
+from app.db import database
+from app.services import bulk_generate_service
+
+
+class _Session:
+    def __init__(self, store):
+        self.store = store
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement, rows=None):
+        self.store["rows"].extend(rows)
+
+    async def commit(self):
+        self.store["commits"] += 1
+
+
+class _Job:
+    """只記錄進度的 Job 替身；cancel_on_call 次呼叫時拋出 JobCancelled"""
+
+    def __init__(self, cancel_on_call=None):
+        self.calls = []
+        self.cancel_on_call = cancel_on_call
+
+    async def set_progress(self, done, total=None, message=None, force=False):
+        self.calls.append((done, total))
+        if len(self.calls) == self.cancel_on_call:
+            raise JobCancelled("已取消")
+
+
+def _plan(index, count):
+    return {
+        "index": index,
+        "count": count,
+        "template_id": 3,
+        "subject": "健康",
+        "detected_types": ["single_choice"],
+        "document_ids": [11, 12],
+    }
+
+
+def _question(prompt, explanation="說明"):
+    return {"prompt": prompt, "options": ["A. 甲", "B. 乙"], "answer": "A", "explanation": explanation}
+
+
+@pytest.fixture
+def env(monkeypatch):
+    """以假批次服務與記錄寫入的 session 取代 Message Batches API 與資料庫"""
+    store = {"rows": [], "commits": 0, "server": FakeMessageBatchServer()}
+    monkeypatch.setattr(database, "AsyncSessionLocal", lambda: _Session(store))
+    monkeypatch.setattr(
+        bulk_generate_service,
+        "message_batch_client",
+        lambda: MessageBatchClient(api_key="test", transport=store["server"].transport),
+    )
+
+    def prepare(counts):
+        async def _prepare_requests(generations, errors):
+            plans = {f"gen-{i}": _plan(i, count) for i, count in enumerate(counts)}
+            requests = [
+                {
+                    "custom_id": custom_id,
+                    "params": build_api_params(
+                        template_prompt("教材內容。", "{{context}}", plan["count"]),
+                        model="claude-stub", max_tokens=1024, temperature=0.7,
+                    ),
+                }
+                for custom_id, plan in plans.items()
+            ]
+            return plans, requests
+
+        monkeypatch.setattr(bulk_generate_service, "_prepare_requests", _prepare_requests)
+
+    store["prepare"] = prepare
+    return store
+
+
+@pytest.mark.asyncio
+async def test_bulk_generate_job_stores_questions_and_reports_errors(env):
+    env["server"].error_ids = {"gen-1"}
+    env["prepare"]([2, 1, 3])
+    job = _Job()
+
+    summary = await bulk_generate_service.bulk_generate_job(job, [{}, {}, {}], poll_interval=0)
+
+    assert summary["success_count"] == 2
+    assert summary["inserted_questions"] == 5 == len(env["rows"])
+    assert summary["errors"] == ["請求 2 失敗: 批次結果為 errored fake error"]
+    assert env["commits"] == 1
+    row = env["rows"][0]
+    assert row["template_id"] == 3 and row["document_id"] == 11
+    assert row["question_type"] == "single_choice"
+    assert row["source_metadata"]["batch_id"] == summary["batch_ids"][0]
+    assert job.calls[0] == (0, 3) and job.calls[-1] == (3, 3)
+
+
+@pytest.mark.asyncio
+async def test_store_results_validates_before_truncating(env):
+    """測試先略過不合格的題目再取前 count 題，與 generate_questions_by_template 相同"""
+    env["server"].responder = lambda params: json.dumps(
+        [_question("缺少解釋", explanation=""), _question("第一題"), _question("第二題")],
+        ensure_ascii=False,
+    )
+    plans = {"gen-0": _plan(0, 2)}
+    errors = []
+    async with bulk_generate_service.message_batch_client() as client:
+        batch = await client.create([{
+            "custom_id": "gen-0",
+            "params": build_api_params(
+                template_prompt("教材內容。", "{{context}}", 2),
+                model="claude-stub", max_tokens=1024, temperature=0.7,
+            ),
+        }])
+        batch = await client.wait(batch["id"], poll_interval=0)
+        succeeded, inserted = await bulk_generate_service._store_results(client, batch, plans, errors)
+
+    assert (succeeded, inserted, errors) == (1, 2, [])
+    assert [row["stem"] for row in env["rows"]] == ["第一題", "第二題"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_job_cancels_submitted_batches(env):
+    env["server"].polls_until_ended = 100
+    env["prepare"]([1])
+
+    with pytest.raises(JobCancelled):
+        await bulk_generate_service.bulk_generate_job(_Job(cancel_on_call=1), [{}], poll_interval=0)
+
+    (batch,) = env["server"].batches.values()
+    assert batch["canceled"]
+    assert env["rows"] == []
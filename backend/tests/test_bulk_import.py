@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from app.cli.bulk_import import iter_source_rows, prepare_batch
+from app.core.config import CHUNK_OVERLAP, UPLOAD_CHUNK_SIZE
+
+
+def test_iter_source_rows_normalizes_csv_and_jsonl(tmp_path):
+    """測試 CSV / JSONL 來源的欄位對照與錯誤列"""
+    csv_path = tmp_path / "docs.csv"
+    csv_path.write_text("Words,Chapter,Subject,Page\n內容一。,Chapter 1,Health,71\n", encoding="utf-8")
+    assert list(iter_source_rows(str(csv_path))) == [
+        {"content": "內容一。", "chapter": "Chapter 1", "subject": "Health", "page_number": "71"}
+    ]
+
+    jsonl_path = tmp_path / "docs.jsonl"
+    jsonl_path.write_text(
+        json.dumps({"content": "內容二。", "page": 72.0}, ensure_ascii=False) + "\n\n{broken\n",
+        encoding="utf-8",
+    )
+    rows = list(iter_source_rows(str(jsonl_path)))
+    assert rows[0] == {"content": "內容二。", "page_number": "72"}
+    assert "_error" in rows[1]
+
+
+def test_prepare_batch_validates_chunks_and_embeds():
+    """測試批次處理的驗證、分塊與向量化"""
+    rows = [
+        {"content": "第一句。第二句。", "chapter": "Chapter 1"},
+        {"content": None},
+        {"_error": "JSON 格式錯誤"},
+    ]
+    prepared = prepare_batch(rows, "cli_import", "健康", chunk_size=5, overlap=0)
+
+    assert [doc["subject"] for doc in prepared["documents"]] == ["健康"]
+    assert prepared["documents"][0]["title"] == "Chapter 1"
+    assert (prepared["documents"][0]["chunk_size"], prepared["documents"][0]["chunk_overlap"]) == (5, 0)
+    assert [text for _, text, _ in prepared["chunks"]] == ["第一句。", "第二句。"]
+    assert prepared["vectors"].shape == (2, 1536)
+    assert [offset for offset, _ in prepared["errors"]] == [1, 2]
+
+
+def test_cli_runs_without_environment_settings(tmp_path):
+    """測試未設定 DATABASE_URL / ANTHROPIC_API_KEY 時 CLI 仍可用 --database-url 匯入"""
+    script = (
+        "import app.cli.bulk_import as bulk_import\n"
+        "async def run_import(path, **kwargs):\n"
+        "    print(kwargs['database_url'], kwargs['chunk_size'], kwargs['overlap'])\n"
+        "    return {'documents': 0, 'duplicates': 0, 'embeddings': 0, 'errors': 0, 'job_id': 'x'}\n"
+        "bulk_import.run_import = run_import\n"
+        "from app.cli.__main__ import main\n"
+        "raise SystemExit(main(['import', 'x.csv', '--database-url', 'postgresql://u:p@db/edurag']))\n"
+    )
+    backend_dir = Path(__file__).resolve().parents[1]
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=tmp_path,
+        env={"PATH": os.environ.get("PATH", ""), "PYTHONPATH": str(backend_dir)},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[0] == f"postgresql://u:p@db/edurag {UPLOAD_CHUNK_SIZE} {CHUNK_OVERLAP}"
@@ -0,0 +1,44 @@
+from app.core.chunking import SentenceChunker, iter_chunks
+
+
+def test_chunks_keep_offsets_size_and_overlap():
+    """測試分塊的位置、長度上限與句子重疊"""
+    text = "第一句。第二句！第三句？Fourth. fifth!"
+    chunks = list(iter_chunks(text, max_chunk_size=10, overlap=4))
+
+    assert [c.text for c in chunks] == [
+        "第一句。第二句！",
+        "第二句！第三句？",
+        "Fourth.",
+        "fifth!",
+    ]
+    for chunk in chunks:
+        assert text[chunk.start:chunk.end] == chunk.text
+        assert len(chunk.text) <= 10
+
+
+def test_long_sentence_is_hard_split_with_overlap():
+    """測試沒有分隔符的長句以固定視窗切開"""
+    text = "a" * 25
+    chunks = list(iter_chunks(text, max_chunk_size=10, overlap=2))
+
+    assert [(c.start, c.end) for c in chunks] == [(0, 10), (8, 18), (16, 25)]
+
+
+def test_streaming_feed_matches_single_pass():
+    """測試分段餵入與一次處理的結果一致"""
+    text = "健康的身體。需要均衡的飲食！\n也需要規律的運動？睡眠也很重要。" * 20
+    expected = list(iter_chunks(text, max_chunk_size=40, overlap=10))
+
+    # step 1、2 會切在「！\n」等連續分隔符中間
+    for step in (1, 2, 7):
+        chunker = SentenceChunker(max_chunk_size=40, overlap=10)
+        streamed = []
+        for i in range(0, len(text), step):
+            streamed.extend(chunker.feed(text[i:i + step]))
+        streamed.extend(chunker.finish())
+        assert streamed == expected
+
+    chunker = SentenceChunker(max_chunk_size=2, overlap=1)
+    streamed = list(chunker.feed(".")) + list(chunker.feed(".b")) + list(chunker.finish())
+    assert [c.text for c in streamed] == [c.text for c in iter_chunks("..b", 2, 1)] == ["..", "b"]
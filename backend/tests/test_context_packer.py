@@ -0,0 +1,63 @@
+import pytest
+
+from app.core import context_packer
+from app.core.context_packer import GAP_MARKER, pack_documents, pack_documents_async
+from app.core.tokens import estimate_tokens
+
+
+def _doc(doc_id, sentences):
+    return {"id": doc_id, "title": f"文件{doc_id}", "content": "".join(sentences)}
+
+
+def test_content_within_budget_is_unchanged():
+    docs = [_doc(1, ["短短的內容。"]), _doc(2, ["另一份。"])]
+    pack = pack_documents(docs, budget_tokens=1000)
+    assert pack.contents == [d["content"] for d in docs]
+    assert not pack.stats["truncated"]
+    assert pack.stats["dropped_chunks"] == 0
+
+
+def test_packs_relevant_chunks_within_budget_and_reports_drops():
+    filler = [f"第{i}段談論天氣與季節的變化。" * 4 for i in range(40)]
+    relevant = "光合作用需要葉綠素與陽光。" * 4
+    big = _doc(1, filler[:20] + [relevant] + filler[20:])
+    small = _doc(2, ["植物的光合作用產生氧氣。" * 4])
+    pack = pack_documents([big, small], budget_tokens=200, query="光合作用 葉綠素", chunk_size=60)
+
+    stats = pack.stats
+    assert stats["truncated"]
+    assert stats["used_tokens"] <= 200
+    assert sum(estimate_tokens(c.replace(GAP_MARKER, "")) for c in pack.contents) <= 200
+    assert relevant in pack.contents[0]
+    # 覆蓋率：較小的文件也會被選到
+    assert "光合作用產生氧氣" in pack.contents[1]
+    assert GAP_MARKER in pack.contents[0]
+    assert stats["dropped_chunks"] == stats["total_chunks"] - stats["kept_chunks"] > 0
+    assert stats["documents"][0]["id"] == 1
+    assert stats["documents"][0]["dropped_tokens"] > 0
+
+
+def test_adjacent_chunks_are_joined_with_original_text():
+    doc = _doc(1, ["甲乙丙丁。 ", "戊己庚辛。 ", "壬癸子丑。"])
+    pack = pack_documents([doc], budget_tokens=12, chunk_size=6)
+    assert pack.stats["truncated"]
+    assert pack.contents[0] in doc["content"]
+
+
+@pytest.mark.asyncio
+async def test_async_pack_only_uses_thread_when_over_budget(monkeypatch):
+    threaded = []
+
+    async def to_thread(fn, *args, **kwargs):
+        threaded.append(fn)
+        return fn(*args, **kwargs)
+
+    monkeypatch.setattr(context_packer.asyncio, "to_thread", to_thread)
+    docs = [_doc(1, ["光合作用需要葉綠素。" * 30])]
+
+    small = await pack_documents_async(docs, budget_tokens=1000)
+    assert small.contents == [docs[0]["content"]] and not threaded
+
+    packed = await pack_documents_async(docs, budget_tokens=40, query="葉綠素", chunk_size=20)
+    assert threaded == [pack_documents]
+    assert packed == pack_documents(docs, budget_tokens=40, query="葉綠素", chunk_size=20)
@@ -0,0 +1,55 @@
+import random
+
+from app.core.dedup import (
+    SIMHASH_MAX_DISTANCE,
+    IncrementalFingerprint,
+    content_hash,
+    document_fingerprint,
+    hamming_distance,
+    simhash,
+    simhash_bands,
+)
+
+
+def test_content_hash_ignores_whitespace_and_case():
+    assert content_hash("Healthy  Body\n需要運動") == content_hash("healthy body 需要運動")
+    assert content_hash("健康的身體") != content_hash("健康的心理")
+
+
+def test_near_duplicates_share_a_simhash_band():
+    """測試小幅修改的文本 SimHash 相近，且至少有一個 band 相同"""
+    text = "健康的身體需要均衡的飲食，也需要規律的運動與充足的睡眠。" * 5
+    edited = text.replace("規律", "固定", 1)
+    unrelated = "Photosynthesis converts light energy into chemical energy in plants." * 3
+
+    a, b, c = simhash(text), simhash(edited), simhash(unrelated)
+    assert hamming_distance(a, b) <= SIMHASH_MAX_DISTANCE
+    assert set(simhash_bands(a)) & set(simhash_bands(b))
+    assert hamming_distance(a, c) > SIMHASH_MAX_DISTANCE
+
+
+def test_document_fingerprint_fits_postgres_types():
+    fingerprint = document_fingerprint("任意內容" * 10)
+    assert -(1 << 63) <= fingerprint["simhash"] < (1 << 63)
+    assert all(0 <= band < (1 << 31) for band in fingerprint["simhash_bands"])
+
+
+def test_incremental_fingerprint_matches_whole_text():
+    """測試任意切段餵入的結果與整段計算相同"""
+    rng = random.Random(7)
+    samples = [
+        "  Healthy  Body\n\n需要運動。ＡＢＣ　全形空白\t結尾  ",
+        "健康的身體需要均衡的飲食，也需要規律的運動與充足的睡眠。\n" * 20,
+        "ab",
+        "   ",
+    ]
+    for text in samples:
+        for _ in range(20):
+            incremental = IncrementalFingerprint()
+            pos = 0
+            while pos < len(text):
+                step = rng.randint(1, 7)
+                incremental.feed(text[pos:pos + step])
+                pos += step
+            assert incremental.result() == document_fingerprint(text)
+
@@ -0,0 +1,133 @@
+import pytest
+
+from app.core.dedup import content_hash
+from app.services.document_service import DocumentService
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return iter(self.rows)
+
+    def all(self):
+        return self.rows
+
+
+class _Session:
+    """記錄 execute 呼叫的 AsyncSession 替身；INSERT 依參數順序回傳 id"""
+
+    def __init__(self, existing=None, fail=None, first_id=100):
+        self.existing = existing or {}  # content_hash -> 既有文件 id
+        self.fail = fail
+        self.next_id = first_id
+        self.inserts = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def execute(self, statement, params=None):
+        if statement.is_select:
+            return _Result(list(self.existing.items()))
+        assert statement._sort_by_parameter_order  # id 必須與參數列同順序
+        if self.fail:
+            raise self.fail
+        self.inserts.append((statement, params))
+        ids = list(range(self.next_id, self.next_id + len(params)))
+        self.next_id += len(params)
+        return _Result(ids)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def _doc(content, **overrides):
+    doc = {"title": "講義", "content": content, "subject": "健康", "grade": "七年級"}
+    doc.update(overrides)
+    return doc
+
+
+@pytest.mark.asyncio
+async def test_invalid_rows_are_reported_and_ids_follow_input_positions():
+    """測試逐列驗證：錯誤列留在原位，通過的列依位置對回 RETURNING 的 id"""
+    session = _Session()
+    results = await DocumentService(session).bulk_create_documents([
+        _doc("第一份"),
+        _doc("沒有科目", subject=" "),
+        _doc("第三份"),
+        _doc(""),
+        _doc("標題太長", title="長" * 201),
+        _doc("第六份", import_source="cli_import"),
+    ], import_source="excel_upload")
+
+    assert [r["document_id"] for r in results] == [100, None, 101, None, None, 102]
+    assert results[1]["error"] == "科目不能為空"
+    assert results[3]["error"] == "文件內容不能為空"
+    assert results[4]["error"] == "title 長度超過 200 字元"
+    assert all(results[i]["error"] is None for i in (0, 2, 5))
+
+    (_, rows), = session.inserts
+    assert [row["content"] for row in rows] == ["第一份", "第三份", "第六份"]
+    assert [row["import_source"] for row in rows] == ["excel_upload", "excel_upload", "cli_import"]
+    assert rows[0]["content_hash"] == content_hash("第一份")
+    assert session.commits == 1
+
+
+@pytest.mark.asyncio
+async def test_skip_duplicates_maps_remaining_rows():
+    """測試略過重複內容後，其餘列的 id 仍對應原本位置"""
+    session = _Session(existing={content_hash("舊內容"): 7})
+    results = await DocumentService(session).bulk_create_documents(
+        [_doc("舊內容"), _doc("新內容"), _doc("新內容"), _doc("另一份")],
+        skip_duplicates=True,
+    )
+
+    assert [r["document_id"] for r in results] == [None, 100, None, 101]
+    assert results[0]["duplicate_of"] == 7
+    assert results[2]["error"] == "內容與第 2 筆重複，已略過"
+
+
+@pytest.mark.asyncio
+async def test_insert_failure_rolls_back_and_marks_valid_rows():
+    """測試寫入失敗時 rollback，只有通過驗證的列標記為寫入失敗"""
+    session = _Session(fail=RuntimeError("連線中斷"))
+    results = await DocumentService(session).bulk_create_documents([_doc("第一份"), _doc("")])
+
+    assert session.rollbacks == 1 and session.commits == 0
+    assert results[0] == {"document_id": None, "error": "寫入資料庫失敗: 連線中斷", "duplicate_of": None}
+    assert results[1]["error"] == "文件內容不能為空"
+
+
+@pytest.mark.asyncio
+async def test_no_valid_rows_skips_database():
+    session = _Session()
+    results = await DocumentService(session).bulk_create_documents([_doc(" ")])
+    assert results[0]["error"] == "文件內容不能為空"
+    assert session.inserts == [] and session.commits == 0
+
+
+@pytest.mark.asyncio
+async def test_find_by_content_hash_can_be_scoped_to_subject():
+    """測試指定科目時只比對同科目的文件（單筆 ingest 的冪等判斷）"""
+    session = _Session(existing={content_hash("內容"): 7})
+    statements = []
+    execute = session.execute
+
+    async def record(statement, params=None):
+        statements.append(statement)
+        return await execute(statement, params)
+
+    session.execute = record
+    service = DocumentService(session)
+    assert await service.find_documents_by_content_hash([content_hash("內容")], subject="健康") == {
+        content_hash("內容"): 7
+    }
+    await service.find_documents_by_content_hash([content_hash("內容")])
+
+    scoped, unscoped = (str(statement.whereclause) for statement in statements)
+    assert "documents.subject = :subject_1" in scoped
+    assert "subject" not in unscoped
+    assert statements[0].compile().params["subject_1"] == "健康"
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core import embeddings
+from app.core.embeddings import HashingEmbeddingBackend, QueryEmbeddingCache
+
+
+@pytest.mark.asyncio
+async def test_query_embedding_cache_lru_and_counters():
+    """測試查詢向量快取的 LRU 淘汰與命中統計"""
+    calls = []
+
+    async def factory(text):
+        calls.append(text)
+        return [float(len(text))]
+
+    cache = QueryEmbeddingCache(maxsize=2)
+
+    assert await cache.get_or_create("m", "a", factory) == [1.0]
+    assert await cache.get_or_create("m", "bb", factory) == [2.0]
+    assert await cache.get_or_create("m", "a", factory) == [1.0]
+    # 新增第三筆時淘汰最久未使用的 "bb"
+    await cache.get_or_create("m", "ccc", factory)
+    await cache.get_or_create("m", "bb", factory)
+    # 不同模型視為不同 key
+    await cache.get_or_create("other", "a", factory)
+
+    assert calls == ["a", "bb", "ccc", "bb", "a"]
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 5
+    assert stats["size"] == 2
+
+
+@pytest.mark.asyncio
+async def test_query_embedding_cache_single_flight():
+    """測試並行 miss 只呼叫一次 factory"""
+    calls = 0
+
+    async def factory(text):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return [0.5]
+
+    cache = QueryEmbeddingCache(maxsize=8)
+    results = await asyncio.gather(
+        *[cache.get_or_create("m", "same", factory) for _ in range(5)]
+    )
+
+    assert calls == 1
+    assert results == [[0.5]] * 5
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_hashing_backend_batch_is_normalized_and_lexical():
+    """測試 hashing 後端的批次輸出為單位向量，且相近文字相似度較高"""
+    backend = HashingEmbeddingBackend()
+    texts = ["健康的身體需要均衡飲食", "均衡飲食讓身體健康", "The war ended in 1945", ""]
+    batch = backend.embed_batch(texts)
+
+    assert batch.shape == (4, 1536)
+    assert abs(float((batch[0] ** 2).sum()) - 1.0) < 1e-5
+    # 空字串回傳固定的單位向量，避免餘弦距離為 NaN
+    assert abs(float((batch[3] ** 2).sum()) - 1.0) < 1e-5
+    assert (backend.embed_batch([""])[0] == batch[3]).all()
+    assert float(batch[0] @ batch[1]) > float(batch[0] @ batch[2])
+    # 批次結果與逐筆結果一致
+    assert (backend.embed_batch([texts[1]])[0] == batch[1]).all()
+
+
+@pytest.mark.asyncio
+async def test_large_batches_are_embedded_off_the_event_loop(monkeypatch):
+    """測試總字元數達門檻的批次在執行緒中計算，短查詢仍在 event loop 執行緒"""
+    monkeypatch.setattr(embeddings, "EMBEDDING_THREAD_MIN_CHARS", 10)
+    threads = []
+
+    class Backend(HashingEmbeddingBackend):
+        def embed_batch(self, texts):
+            threads.append(threading.current_thread())
+            return super().embed_batch(texts)
+
+    backend = Backend(dimension=64)
+    short = await backend.embed(["短"])
+    long = await backend.embed(["光合作用需要陽光", "與二氧化碳"])
+
+    assert threads[0] is threading.current_thread()
+    assert threads[1] is not threading.current_thread()
+    assert short == backend.embed_batch(["短"]).tolist()
+    assert long == backend.embed_batch(["光合作用需要陽光", "與二氧化碳"]).tolist()
@@ -0,0 +1,57 @@
+import io
+
+import pytest
+from openpyxl import Workbook
+
+from app.core.excel_reader import ExcelReader
+from app.services.upload_service import parse_excel
+
+
+def _xlsx(rows):
+    wb = Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def test_reader_streams_typed_records_and_skips_blank_rows():
+    """測試逐列讀取、欄位別名與整數值正規化"""
+    contents = _xlsx([
+        [" Q_Image ", "Subject", "Page"],
+        ["img01", "Health", 12.0],
+        [None, None, None],
+        ["img02", " Math ", 3.5],
+    ])
+
+    with ExcelReader(contents, "a.xlsx", column_aliases={"q_image": "question_image"}, lowercase_columns=True) as reader:
+        reader.require(["question_image", "subject"])
+        records = list(reader)
+
+    assert [r.row_number for r in records] == [2, 4]
+    assert records[0].values == {"question_image": "img01", "subject": "Health", "page": "12"}
+    assert records[1].get("page") == "3.5"
+    assert records[1].text("subject") == "Math"
+
+
+def test_reader_reports_missing_columns():
+    contents = _xlsx([["Words", "Subject"], ["text", "Health"]])
+    with pytest.raises(ValueError, match="Chapter"):
+        parse_excel(contents, "docs.xlsx")
+
+
+def test_parse_excel_reports_row_errors():
+    """測試文件匯入的逐列錯誤回報"""
+    contents = _xlsx([
+        ["Words", "Chapter", "Subject", "Imagesrelated", "Page"],
+        ["第一段內容。", "Chapter 1", "Health", None, 71],
+        [None, "Chapter 1", "Health", "x.jpg", 72],
+    ])
+    documents, row_errors = parse_excel(contents, "docs.xlsx")
+
+    assert len(documents) == 1
+    assert documents[0]["page_number"] == "71"
+    assert documents[0]["chunk_count"] == 1
+    assert row_errors == [{"row": 3, "error": "Words 欄位為空"}]
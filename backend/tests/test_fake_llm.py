@@ -0,0 +1,139 @@
+import json
+
+import anthropic
+import httpx
+import pytest
+from anthropic import AsyncAnthropic
+
+from app.core.fake_llm import FakeLLMServer
+from app.core.json_stream import extract_json_objects
+from app.core.prompt_cache import PromptParts, build_api_params, create_message, stream_message
+
+MATERIAL = "教材內容：光合作用需要葉綠素、陽光與二氧化碳，產生葡萄糖與氧氣。" * 80
+
+
+def _server(**kwargs):
+    kwargs.setdefault("latency_ms", 0)
+    kwargs.setdefault("tokens_per_second", 0)
+    return FakeLLMServer(**kwargs)
+
+
+def _client(server):
+    return AsyncAnthropic(
+        api_key="test",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=server.transport),
+    )
+
+
+def _params(suffix="\n請生成5道題目，並以 JSON 格式回傳。", prefix=MATERIAL):
+    return build_api_params(
+        PromptParts(prefix, suffix), model="claude-stub", max_tokens=1024, temperature=0.7, min_tokens=100
+    )
+
+
+def test_response_follows_requested_count_and_type():
+    server = _server()
+    questions = json.loads(server.respond(_params()))
+    assert len(questions) == 5
+    assert all(len(q["options"]) == 4 and q["answer"] in "ABCD" for q in questions)
+    assert len({q["prompt"] for q in questions}) > 1
+
+    true_false = json.loads(server.respond(_params(
+        '\n\n格式要求：Ensure generated questions are true/false statements.'
+        "\n\nIMPORTANT: Please generate exactly 4 questions in total."
+    )))
+    assert len(true_false) == 4
+    assert {q["answer"] for q in true_false} <= {"true", "false"}
+
+    matching = json.loads(server.respond(_params("\n請製作3道配對題，需包含question_data欄位。")))
+    assert all(q["question_data"]["left_items"] and q["question_data"]["right_items"] for q in matching)
+
+    # 同一個 seed 與 prompt 永遠得到相同內容
+    assert server.respond(_params()) == _server().respond(_params())
+    assert server.respond(_params()) != _server(seed=1).respond(_params())
+
+
+@pytest.mark.asyncio
+async def test_messages_create_reports_prompt_cache_usage():
+    server = _server()
+    client = _client(server)
+
+    first = await create_message(client, _params())
+    second = await create_message(client, _params())
+
+    assert first.usage.cache_creation_input_tokens > 0
+    assert first.usage.cache_read_input_tokens == 0
+    assert second.usage.cache_read_input_tokens == first.usage.cache_creation_input_tokens
+    assert len(extract_json_objects(first.content[0].text)) == 5
+
+
+@pytest.mark.asyncio
+async def test_tracked_requests_and_prefixes_are_bounded():
+    """測試記住的請求與快取前綴不超過 max_tracked，淘汰最久未使用的前綴"""
+    server = _server(max_tracked=2)
+    client = _client(server)
+
+    for i in range(5):
+        await create_message(client, _params(prefix=f"{i}" + MATERIAL))
+    assert len(server._seen) == len(server._cached_prefixes) == 2
+
+    recent = await create_message(client, _params(prefix="4" + MATERIAL))
+    evicted = await create_message(client, _params(prefix="0" + MATERIAL))
+    assert recent.usage.cache_read_input_tokens > 0
+    assert evicted.usage.cache_read_input_tokens == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_matches_blocking_response():
+    server = _server()
+    params = _params()
+    async with stream_message(_client(server), params) as stream:
+        text = "".join([delta async for delta in stream.text_stream])
+        final = await stream.get_final_message()
+
+    assert text == server.respond(params)
+    assert final.usage.output_tokens > 1
+
+
+@pytest.mark.asyncio
+async def test_error_injection():
+    client = _client(_server(rate_limit_rate=1.0, retry_after=2))
+    with pytest.raises(anthropic.RateLimitError) as exc_info:
+        await create_message(client, _params())
+    assert exc_info.value.response.headers["retry-after"] == "2"
+
+    with pytest.raises(anthropic.InternalServerError):
+        await create_message(_client(_server(server_error_rate=1.0)), _params())
+
+    server = _server(malformed_rate=1.0)
+    resp = await create_message(_client(server), _params())
+    assert resp.content[0].text != server.respond(_params())
+    assert server.stats()["malformed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fault_sequence_is_deterministic_per_seed():
+    async def outcomes(seed):
+        client = _client(_server(seed=seed, rate_limit_rate=0.5))
+        results = []
+        for i in range(12):
+            try:
+                await create_message(client, _params(f"\n請生成{i % 3 + 1}道題目。"))
+                results.append("ok")
+            except anthropic.RateLimitError:
+                results.append("429")
+        return results
+
+    first = await outcomes(7)
+    assert first == await outcomes(7)
+    assert "ok" in first and "429" in first
+
+
+@pytest.mark.asyncio
+async def test_every_malformed_output_fails_to_parse():
+    for seed in range(30):
+        server = _server(seed=seed, malformed_rate=1.0)
+        resp = await create_message(_client(server), _params())
+        with pytest.raises(json.JSONDecodeError):
+            json.loads(resp.content[0].text)
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from app.core.fanout import (
+    Shard,
+    dedupe_questions,
+    fan_out,
+    normalize_stem,
+    plan_shards,
+    split_context,
+)
+
+
+def test_plan_shards_only_above_threshold():
+    assert plan_shards(10, threshold=12, shard_size=6, max_shards=8) == [10]
+    assert plan_shards(40, threshold=12, shard_size=6, max_shards=8) == [6, 6, 6, 6, 6, 5, 5]
+    assert plan_shards(100, threshold=12, shard_size=6, max_shards=4) == [25, 25, 25, 25]
+    assert plan_shards(40, threshold=0) == [40]
+
+
+def test_split_context_gives_each_shard_a_different_slice():
+    context = "\n\n".join(f"第{i}段內容" * 5 for i in range(9))
+    slices = split_context(context, 3)
+    assert len(slices) == 3
+    assert all(slices) and len(set(slices)) == 3
+    assert "\n\n".join(slices) == context
+    # 段落與行數都不足時，每片使用完整 context
+    assert split_context("只有一行", 3) == ["只有一行"] * 3
+
+
+def test_dedupe_uses_normalized_stems():
+    questions = [
+        {"prompt": "1. 下列何者是維生素C的主要功能？"},
+        {"prompt": "(2) 下列何者是維生素 C 的主要功能?"},
+        {"prompt": "下列何者是維生素C最主要的功能？"},
+        {"prompt": "蛋白質主要由哪一種單元組成？"},
+    ]
+    assert normalize_stem(questions[0]["prompt"]) == normalize_stem(questions[1]["prompt"])
+    kept = dedupe_questions(questions, threshold=0.55)
+    assert [q["prompt"] for q in kept] == [questions[0]["prompt"], questions[3]["prompt"]]
+
+
+@pytest.mark.asyncio
+async def test_fan_out_runs_shards_concurrently_and_tops_up():
+    running = 0
+    peak = 0
+    seen = []
+
+    async def generate(shard: Shard):
+        nonlocal running, peak
+        seen.append(shard)
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if shard.index == 1:
+            raise RuntimeError("boom")
+        if shard.total == 4:  # 補題分片
+            return [{"prompt": chr(0x5000 + i) * 6} for i in range(shard.count)]
+        # 每個分片都回傳一題相同題幹，合併時應只保留一題
+        return [{"prompt": "共同的題目"}] + [
+            {"prompt": chr(0x4E00 + 100 * shard.index + i) * 6} for i in range(shard.count - 1)
+        ]
+
+    result = await fan_out(9, generate, context="甲\n\n乙\n\n丙", shard_counts=[3, 3, 3])
+    assert peak == 3
+    assert [s.context for s in seen[:3]] == ["甲", "乙", "丙"]
+    # 分片 1 失敗、重複題目去除後不足，補題分片使用完整 context 並列出已有題幹
+    top_up = seen[3]
+    assert top_up.index == 3 and top_up.context == "甲\n\n乙\n\n丙"
+    assert "共同的題目" in top_up.hint
+    assert len(result) == 9
+    assert len({q["prompt"] for q in result}) == 9
+
+
+@pytest.mark.asyncio
+async def test_fan_out_raises_when_every_shard_fails():
+    async def generate(shard: Shard):
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        await fan_out(20, generate, shard_counts=[10, 10])
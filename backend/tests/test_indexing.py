@@ -0,0 +1,117 @@
+import pytest
+
+from app.core.chunking import iter_chunks
+from app.core.config import CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, UPLOAD_CHUNK_SIZE
+from app.db import database
+from app.services import indexing_service
+from app.services.indexing_service import chunk_content_hash, diff_chunks, document_chunk_params
+
+
+def test_diff_chunks_keeps_unchanged_and_embeds_only_changes():
+    """測試增量重建只向量化新增/修改的文本塊"""
+    existing = [
+        (1, chunk_content_hash("甲"), "甲"),
+        (2, chunk_content_hash("乙"), "乙"),
+        (3, None, "丙"),  # 舊資料沒有 hash
+    ]
+    stale_ids, backfill, to_embed = diff_chunks(existing, ["甲", "丙", "丁"])
+
+    assert stale_ids == [2]
+    assert backfill == [(3, chunk_content_hash("丙"))]
+    assert to_embed == ["丁"]
+
+
+def test_diff_chunks_counts_duplicate_chunks():
+    """測試重複內容的文本塊依份數比對"""
+    existing = [
+        (1, chunk_content_hash("重複"), "重複"),
+        (2, chunk_content_hash("重複"), "重複"),
+    ]
+    stale_ids, _, to_embed = diff_chunks(existing, ["重複"])
+    assert stale_ids == [2]
+    assert to_embed == []
+
+    stale_ids, _, to_embed = diff_chunks(existing[:1], ["重複", "重複", "重複"])
+    assert stale_ids == []
+    assert to_embed == ["重複", "重複"]
+
+
+def test_document_chunk_params_prefers_recorded_values():
+    """測試重新分塊時優先使用文件記錄的參數，舊資料依匯入來源推定"""
+    assert document_chunk_params("cli_import", 800, 0) == (800, 0)
+    assert document_chunk_params("cli_import") == (UPLOAD_CHUNK_SIZE, CHUNK_OVERLAP)
+    assert document_chunk_params("excel_upload") == (UPLOAD_CHUNK_SIZE, CHUNK_OVERLAP)
+    assert document_chunk_params("manual") == (DEFAULT_CHUNK_SIZE, CHUNK_OVERLAP)
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+    def scalars(self):
+        return iter(range(len(self.rows)))
+
+
+class _Session:
+    """documents / embeddings 查詢回傳固定資料，並記錄 INSERT 的列"""
+
+    def __init__(self, documents, embeddings):
+        self.documents = documents
+        self.embeddings = embeddings
+        self.inserted = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement, params=None):
+        if not statement.is_select:
+            self.inserted.extend(params)
+            return _Result(params)
+        if "FROM documents" in str(statement):
+            return _Result(self.documents)
+        return _Result(self.embeddings)
+
+    async def commit(self):
+        pass
+
+
+class _Job:
+    def __init__(self):
+        self.calls = []
+
+    async def set_progress(self, done, total=None, message=None, force=False):
+        self.calls.append((done, total))
+
+
+@pytest.mark.asyncio
+async def test_embed_documents_job_resumes_without_duplicates(monkeypatch):
+    """測試重新執行中斷的向量化工作時略過已寫入的文本塊，只補上缺少的部分"""
+    content = "".join(f"第{i}句。" for i in range(40))
+    chunks = [c.text for c in iter_chunks(content, 50, 0)]
+    assert len(chunks) > 2
+    session = _Session(
+        documents=[(1, content), (2, "短文件。")],
+        # 上次執行在文件 1 的前兩個文本塊後中斷（其中一筆是沒有 hash 的舊資料）
+        embeddings=[(10, 1, chunk_content_hash(chunks[0]), chunks[0]), (11, 1, None, chunks[1])],
+    )
+
+    async def create_embeddings(texts):
+        return [[0.0] for _ in texts]
+
+    monkeypatch.setattr(database, "AsyncSessionLocal", lambda: session)
+    monkeypatch.setattr(indexing_service, "create_embeddings", create_embeddings)
+    job = _Job()
+
+    summary = await indexing_service.embed_documents_job(job, [1, 2], chunk_size=50, overlap=0)
+
+    assert [(row["document_id"], row["slice_text"]) for row in session.inserted] == (
+        [(1, text) for text in chunks[2:]] + [(2, "短文件。")]
+    )
+    assert summary == {"documents": 2, "embedded_chunks": len(chunks) - 1, "skipped_chunks": 2}
+    assert job.calls[0] == (0, len(chunks) - 1)
@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.job_service import JobService
+
+
+class _Result:
+    def __init__(self, rows=(), rowcount=None):
+        self.rows = list(rows)
+        self.rowcount = len(self.rows) if rowcount is None else rowcount
+
+    def scalar_one_or_none(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+class _Session:
+    """依序回傳預先排好的結果，並記錄 execute 的語句"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+        self.commits = 0
+        self.refreshed = []
+
+    async def execute(self, statement, params=None):
+        self.statements.append(statement)
+        return self.results.pop(0) if self.results else _Result()
+
+    async def commit(self):
+        self.commits += 1
+
+    async def refresh(self, obj):
+        self.refreshed.append(obj)
+
+
+def _where(statement):
+    """WHERE 條件（SQL 文字）與其中的參數值"""
+    clause = statement.whereclause
+    return str(clause), list(clause.compile().params.values())
+
+
+@pytest.mark.asyncio
+async def test_claim_job_only_takes_pending_jobs():
+    """測試認領以 status = 'pending' 為條件原子更新，已被取走時不再查詢"""
+    session = _Session(_Result())
+    assert await JobService(session).claim_job("job-1") is None
+    (statement,) = session.statements
+    sql, values = _where(statement)
+    assert "jobs.status" in sql and sorted(values) == ["job-1", "pending"]
+    assert statement.compile().params["status"] == "running"
+    assert session.commits == 1
+
+    record = SimpleNamespace(id="job-1", status="running")
+    session = _Session(_Result(["job-1"]), _Result([record]))
+    assert await JobService(session).claim_job("job-1") is record
+    assert len(session.statements) == 2
+
+
+@pytest.mark.asyncio
+async def test_update_progress_returns_cancel_request():
+    session = _Session(_Result([True]))
+    assert await JobService(session).update_progress("job-1", 3, 10, "處理中" * 100) is True
+    params = session.statements[0].compile().params
+    assert (params["progress_done"], params["progress_total"]) == (3, 10)
+    assert len(params["message"]) == 255
+
+    session = _Session(_Result([False]))
+    assert await JobService(session).update_progress("job-1", 4) is False
+    assert "progress_total" not in session.statements[0].compile().params
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_touches_running_jobs_and_reports_cancellations():
+    session = _Session(_Result([("job-1", False), ("job-2", True)]))
+    assert await JobService(session).heartbeat(["job-1", "job-2"]) == ["job-2"]
+    sql, values = _where(session.statements[0])
+    assert "jobs.status" in sql and "running" in values
+    assert session.commits == 1
+
+    session = _Session()
+    assert await JobService(session).heartbeat([]) == []
+    assert session.statements == [] and session.commits == 0
+
+
+@pytest.mark.asyncio
+async def test_finish_job_never_overwrites_non_running_job():
+    session = _Session(_Result(rowcount=0))
+    assert await JobService(session).finish_job("job-1", "succeeded", result={"n": 1}) is False
+    sql, values = _where(session.statements[0])
+    assert "jobs.status" in sql and sorted(values) == ["job-1", "running"]
+
+    session = _Session(_Result(rowcount=1))
+    assert await JobService(session).finish_job("job-1", "failed", error="錯誤") is True
+
+
+@pytest.mark.asyncio
+async def test_fail_stale_jobs_uses_updated_at_cutoff():
+    """測試只有超過 stale_seconds 沒有 heartbeat 的 running 工作會被標記為失敗"""
+    session = _Session(_Result(rowcount=2))
+    before = datetime.now(timezone.utc)
+    assert await JobService(session).fail_stale_jobs(600) == 2
+
+    sql, values = _where(session.statements[0])
+    assert "jobs.updated_at <" in sql and "running" in values
+    (cutoff,) = [v for v in values if isinstance(v, datetime)]
+    assert before - timedelta(seconds=601) < cutoff <= datetime.now(timezone.utc) - timedelta(seconds=600)
+    assert session.statements[0].compile().params["status"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_request_cancel_by_status():
+    """測試 pending 直接標記 cancelled、running 只設定 cancel_requested、已結束的不更新"""
+    pending = SimpleNamespace(id="job-1", status="pending")
+    session = _Session(_Result([pending]))
+    assert await JobService(session).request_cancel("job-1") is pending
+    params = session.statements[1].compile().params
+    assert params["cancel_requested"] is True and params["status"] == "cancelled"
+
+    running = SimpleNamespace(id="job-2", status="running")
+    session = _Session(_Result([running]))
+    await JobService(session).request_cancel("job-2")
+    params = session.statements[1].compile().params
+    assert params["cancel_requested"] is True and "status" not in params
+
+    finished = SimpleNamespace(id="job-3", status="succeeded")
+    session = _Session(_Result([finished]))
+    assert await JobService(session).request_cancel("job-3") is finished
+    assert len(session.statements) == 1 and session.commits == 0
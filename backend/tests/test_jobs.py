@@ -0,0 +1,238 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import jobs
+from app.core.jobs import Job, JobCancelled, JobManager
+from app.db import database
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class _JobService:
+    """以 dict 保存工作的 JobService 替身，狀態轉換與 UPDATE ... WHERE status 的條件相同"""
+
+    def __init__(self, store):
+        self.store = store
+
+    async def claim_job(self, job_id):
+        record = self.store["jobs"].get(job_id)
+        if record is None or record.status != "pending":
+            return None
+        record.status = "running"
+        return record
+
+    async def update_progress(self, job_id, done, total=None, message=None):
+        record = self.store["jobs"][job_id]
+        self.store["progress"].append((job_id, done, total, message))
+        record.progress_done = done
+        if total is not None:
+            record.progress_total = total
+        return record.cancel_requested
+
+    async def heartbeat(self, job_ids):
+        self.store["heartbeats"].append(sorted(job_ids))
+        return [
+            job_id for job_id in job_ids
+            if self.store["jobs"][job_id].status == "running" and self.store["jobs"][job_id].cancel_requested
+        ]
+
+    async def finish_job(self, job_id, status, result=None, error=None):
+        record = self.store["jobs"][job_id]
+        if record.status != "running":
+            return False
+        record.status, record.result, record.error = status, result, error
+        return True
+
+    async def fail_stale_jobs(self, stale_seconds):
+        self.store["stale_seconds"] = stale_seconds
+        return 0
+
+    async def get_pending_job_ids(self):
+        return [job_id for job_id, record in self.store["jobs"].items() if record.status == "pending"]
+
+
+def _record(job_id, job_type="test", status="pending", **params):
+    return SimpleNamespace(
+        id=job_id, job_type=job_type, status=status, params=params,
+        cancel_requested=False, result=None, error=None, progress_done=0, progress_total=0,
+    )
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = {"jobs": {}, "progress": [], "heartbeats": []}
+    monkeypatch.setattr(database, "AsyncSessionLocal", _Session)
+    monkeypatch.setattr(jobs, "JobService", lambda db: _JobService(store))
+    return store
+
+
+@pytest.mark.asyncio
+async def test_run_skips_job_claimed_elsewhere(store):
+    """測試認領失敗（已被其他 worker 取走或已取消）時不執行 handler"""
+    calls = []
+
+    async def handler(job):
+        calls.append(job.id)
+
+    manager = JobManager(workers=1)
+    manager.register("test", handler)
+    store["jobs"]["job-1"] = _record("job-1", status="running")
+    store["jobs"]["job-2"] = _record("job-2", status="cancelled")
+
+    await manager._run("job-1")
+    await manager._run("job-2")
+    await manager._run("missing")
+
+    assert calls == []
+    assert store["jobs"]["job-2"].status == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_run_stores_result_and_final_progress(store):
+    async def handler(job, n):
+        await job.set_progress(n, n, force=True)
+        return {"n": n}
+
+    manager = JobManager(workers=1)
+    manager.register("test", handler)
+    store["jobs"]["job-1"] = _record("job-1", n=3)
+
+    await manager._run("job-1")
+
+    record = store["jobs"]["job-1"]
+    assert (record.status, record.result, record.error) == ("succeeded", {"n": 3}, None)
+    assert store["progress"][-1] == ("job-1", 3, 3, None)
+    assert manager.stats()["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_run_marks_failed_and_cancelled_jobs(store):
+    async def fails(job):
+        raise ValueError("壞掉了")
+
+    async def cancelled(job):
+        store["jobs"][job.id].cancel_requested = True
+        await job.set_progress(1, 2, force=True)
+
+    manager = JobManager(workers=1)
+    manager.register("fails", fails)
+    manager.register("cancelled", cancelled)
+    store["jobs"]["job-1"] = _record("job-1", job_type="fails")
+    store["jobs"]["job-2"] = _record("job-2", job_type="cancelled")
+    store["jobs"]["job-3"] = _record("job-3", job_type="unknown")
+
+    for job_id in ("job-1", "job-2", "job-3"):
+        await manager._run(job_id)
+
+    assert (store["jobs"]["job-1"].status, store["jobs"]["job-1"].error) == ("failed", "壞掉了")
+    assert (store["jobs"]["job-2"].status, store["jobs"]["job-2"].error) == ("cancelled", "已取消")
+    assert store["jobs"]["job-3"].error == "未知的工作類型: unknown"
+
+
+@pytest.mark.asyncio
+async def test_run_does_not_overwrite_job_finished_elsewhere(store):
+    """測試工作在執行中被其他程序標記結束（例如判定中斷）時，不覆寫其狀態"""
+    async def handler(job):
+        store["jobs"][job.id].status = "failed"
+        return "done"
+
+    manager = JobManager(workers=1)
+    manager.register("test", handler)
+    store["jobs"]["job-1"] = _record("job-1")
+
+    await manager._run("job-1")
+
+    assert (store["jobs"]["job-1"].status, store["jobs"]["job-1"].result) == ("failed", None)
+
+
+@pytest.mark.asyncio
+async def test_set_progress_throttles_database_writes(store, monkeypatch):
+    """測試進度最多每 JOB_PROGRESS_INTERVAL 秒寫回一次，force 時立即寫回"""
+    clock = [100.0]
+    monkeypatch.setattr(jobs.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(jobs, "JOB_PROGRESS_INTERVAL", 2.0)
+    store["jobs"]["job-1"] = _record("job-1", status="running")
+    job = Job("job-1", "test", {})
+
+    await job.set_progress(1, 10)
+    clock[0] += 1.0
+    await job.set_progress(2)
+    await job.set_progress(3, force=True)
+    clock[0] += 1.9
+    await job.set_progress(4)
+    clock[0] += 0.1
+    await job.set_progress(5)
+
+    assert [done for _, done, _, _ in store["progress"]] == [1, 3, 5]
+    assert job.progress_done == 5 and job.progress_total == 10
+
+
+@pytest.mark.asyncio
+async def test_set_progress_raises_when_cancel_requested(store):
+    store["jobs"]["job-1"] = _record("job-1", status="running")
+    job = Job("job-1", "test", {})
+    await job.set_progress(1, 2, force=True)
+
+    store["jobs"]["job-1"].cancel_requested = True
+    with pytest.raises(JobCancelled):
+        await job.set_progress(2, force=True)
+    assert job.cancel_requested
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_relays_cancel_requests(store, monkeypatch):
+    """測試 heartbeat 更新執行中的工作，並把其他程序送出的取消要求帶回 Job"""
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT_SECONDS", 0)
+    manager = JobManager(workers=1)
+    store["jobs"]["job-1"] = _record("job-1", status="running")
+    store["jobs"]["job-2"] = _record("job-2", status="running")
+    store["jobs"]["job-2"].cancel_requested = True
+    running = {job_id: Job(job_id, "test", {}) for job_id in ("job-1", "job-2")}
+    manager._running = {job_id: (job, None) for job_id, job in running.items()}
+
+    task = asyncio.create_task(manager._heartbeat_loop())
+    while not store["heartbeats"]:
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert store["heartbeats"][0] == ["job-1", "job-2"]
+    assert not running["job-1"].cancel_requested
+    assert running["job-2"].cancel_requested
+
+
+@pytest.mark.asyncio
+async def test_start_fails_stale_jobs_and_resumes_pending(store, monkeypatch):
+    """測試啟動時先標記中斷的工作，再重新執行 pending 工作"""
+    monkeypatch.setattr(jobs, "JOB_STALE_SECONDS", 600)
+    done = asyncio.Event()
+
+    async def handler(job):
+        done.set()
+        return job.id
+
+    manager = JobManager(workers=1)
+    manager.register("test", handler)
+    store["jobs"]["job-1"] = _record("job-1")
+    store["jobs"]["job-2"] = _record("job-2", status="succeeded")
+
+    await manager.start()
+    try:
+        await asyncio.wait_for(done.wait(), timeout=5)
+        await asyncio.wait_for(manager._queue.join(), timeout=5)
+    finally:
+        await manager.stop()
+
+    assert store["stale_seconds"] == 600
+    assert store["jobs"]["job-1"].status == "succeeded"
+    assert store["jobs"]["job-2"].result is None
+    assert manager.stats() == {"workers": 0, "queued": 0, "running": 0}
@@ -0,0 +1,76 @@
+import json
+
+from app.core.json_stream import JsonObjectExtractor, extract_json_objects
+
+
+QUESTIONS = [
+    {"prompt": "含有 [括號] 與 {大括號} 的 \"題目\"", "answer": "A\\", "explanation": "說明"},
+    {"prompt": "第二題", "answer": ["甲", "乙"], "explanation": "說明", "question_data": {"items": [1, 2]}},
+]
+
+
+def _feed_all(text, step):
+    parser = JsonObjectExtractor()
+    items = []
+    for i in range(0, len(text), step):
+        items.extend(parser.feed(text[i:i + step]))
+    return parser, items
+
+
+def test_elements_are_emitted_as_soon_as_they_close():
+    """測試第一題完成時就能取得，不需等待整個陣列"""
+    text = json.dumps(QUESTIONS, ensure_ascii=False)
+    first_end = len(json.dumps(QUESTIONS[:1], ensure_ascii=False)) - 1
+    parser = JsonObjectExtractor()
+    assert list(parser.feed(text[:first_end])) == [QUESTIONS[0]]
+    assert list(parser.feed(text[first_end:])) == [QUESTIONS[1]]
+    assert not parser.truncated
+
+
+def test_markdown_and_wrapper_object_with_any_split():
+    body = json.dumps({"questions": QUESTIONS}, ensure_ascii=False)
+    text = f"以下是題目：\n```json\n{body}\n```\n"
+    for step in (1, 2, 5, 13, len(text)):
+        parser, items = _feed_all(text, step)
+        assert items == QUESTIONS
+        assert not parser.truncated
+
+
+def test_invalid_element_is_skipped():
+    parser, items = _feed_all('[{"prompt": "ok"}, {"prompt": bad}, {"prompt": "ok2"}]', 4)
+    assert items == [{"prompt": "ok"}, {"prompt": "ok2"}]
+    assert len(parser.errors) == 1
+
+
+def test_loose_objects_between_prose():
+    """測試沒有陣列時，說明文字之間的物件（含巢狀物件與字串中的引號）都能取出"""
+    text = "第一題 \"如下\"：\n" + json.dumps(QUESTIONS[1], ensure_ascii=False) + "\n第二題：" + json.dumps(
+        QUESTIONS[0], ensure_ascii=False
+    )
+    for step in (1, 3, len(text)):
+        _, items = _feed_all(text, step)
+        assert items == [QUESTIONS[1], QUESTIONS[0]]
+
+
+def test_tolerates_trailing_comma_and_raw_newline():
+    items = extract_json_objects('[{"prompt": "第一行\n第二行", "answer": "A",}, {"prompt": "ok"},]')
+    assert items == [{"prompt": "第一行\n第二行", "answer": "A"}, {"prompt": "ok"}]
+
+
+def test_truncated_response_keeps_complete_elements():
+    text = json.dumps(QUESTIONS, ensure_ascii=False)[:-20]
+    parser, items = _feed_all(text, 7)
+    assert items == QUESTIONS[:1]
+    assert parser.truncated
+
+
+def test_single_code_block_matches_extractor():
+    body = json.dumps(QUESTIONS, ensure_ascii=False, indent=2)
+    fenced = f"以下是題目：\n```json\n{body}\n```\n如需調整請告知。"
+    assert extract_json_objects(fenced) == QUESTIONS == list(JsonObjectExtractor().feed(fenced))
+
+    # 區塊外還有物件、或區塊內容不合法時交給擷取器
+    extra = fenced + '\n補充：{"prompt": "第三題"}'
+    assert extract_json_objects(extra) == QUESTIONS + [{"prompt": "第三題"}]
+    broken = '```json\n[{"prompt": "ok"}, {"prompt": bad}]\n```'
+    assert extract_json_objects(broken) == [{"prompt": "ok"}]
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from app.core.llm_cache import LLMCache, bypass_llm_cache, cache_key
+
+
+class _MemoryCache(LLMCache):
+    """以 dict 取代 llm_response_cache 表"""
+
+    def __init__(self, **kwargs):
+        super().__init__(enabled=True, **kwargs)
+        self.rows = {}
+
+    async def _load(self, key):
+        return self.rows.get(key)
+
+    async def _store(self, key, params, response):
+        self.rows[key] = response
+        self.stores += 1
+
+
+def _params(**overrides):
+    params = {"model": "m", "prompt": "p", "max_tokens": 100, "temperature": 0.7, "top_p": None}
+    params.update(overrides)
+    return params
+
+
+def test_cache_key_covers_every_parameter():
+    base = cache_key(_params())
+    assert cache_key(dict(reversed(list(_params().items())))) == base
+    for field, value in [("model", "n"), ("prompt", "q"), ("max_tokens", 50), ("temperature", 0.2), ("top_p", 0.9)]:
+        assert cache_key(_params(**{field: value})) != base
+
+
+@pytest.mark.asyncio
+async def test_hits_bypass_and_single_flight():
+    cache = _MemoryCache()
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return f"response {calls}"
+
+    # 並行的相同請求只呼叫一次 API
+    results = await asyncio.gather(*(cache.get_or_call(_params(), call) for _ in range(3)))
+    assert results == ["response 1"] * 3
+    assert await cache.get_or_call(_params(), call) == "response 1"
+
+    # 明確略過時重新呼叫，並以新回應更新快取
+    with bypass_llm_cache():
+        assert await cache.get_or_call(_params(), call) == "response 2"
+    assert await cache.get_or_call(_params(), call) == "response 2"
+
+    stats = await cache.stats()
+    assert calls == 2
+    assert (stats["misses"], stats["coalesced"], stats["hits"], stats["bypassed"]) == (1, 2, 2, 1)
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache_always_calls():
+    cache = LLMCache(enabled=False)
+
+    async def call():
+        return "fresh"
+
+    assert await cache.get_or_call(_params(), call) == "fresh"
+    assert (await cache.stats())["misses"] == 0
+
+
+def test_cache_control_header_reaches_endpoint():
+    from fastapi import Depends, FastAPI
+    from fastapi.responses import StreamingResponse
+    from fastapi.testclient import TestClient
+
+    from app.core.llm_cache import is_llm_cache_bypassed, llm_cache_control
+
+    app = FastAPI(dependencies=[Depends(llm_cache_control)])
+
+    @app.get("/plain")
+    async def plain():
+        return {"bypassed": is_llm_cache_bypassed()}
+
+    @app.get("/stream")
+    async def stream():
+        async def body():
+            yield str(is_llm_cache_bypassed())
+
+        return StreamingResponse(body())
+
+    client = TestClient(app)
+    assert client.get("/plain").json() == {"bypassed": False}
+    assert client.get("/plain", headers={"Cache-Control": "no-cache"}).json() == {"bypassed": True}
+    assert client.get("/plain", headers={"Cache-Control": "max-age=0, No-Store"}).json() == {"bypassed": True}
+    assert client.get("/stream", headers={"Cache-Control": "no-cache"}).text == "True"
@@ -0,0 +1,31 @@
+import json
+
+from app.core.llm_client import parse_questions_json
+from app.schemas.question import QuestionType
+
+
+def _question(prompt, answer="A", explanation="說明", **extra):
+    return {"prompt": prompt, "answer": answer, "explanation": explanation, **extra}
+
+
+def test_blocking_parse_validates_before_truncating():
+    """測試 /by-type 與 /template 的非串流路徑：先略過不合格的題目再取前 count 題，與串流版本相同"""
+    raw = json.dumps([
+        _question("缺少解釋", explanation=""),
+        _question("第一題"),
+        _question("第二題"),
+        _question("第三題"),
+    ], ensure_ascii=False)
+
+    # 未驗證時（改動前的行為）不合格的題目也會回傳
+    assert [q["prompt"] for q in parse_questions_json(raw, 2, QuestionType.SINGLE_CHOICE)] == ["缺少解釋", "第一題"]
+    assert [q["prompt"] for q in parse_questions_json(raw, 2, QuestionType.SINGLE_CHOICE, "auto")] == ["第一題", "第二題"]
+
+
+def test_blocking_parse_validates_requested_type():
+    raw = json.dumps([
+        _question("是非題", answer="true"),
+        _question("答案不是 true/false", answer="A"),
+    ], ensure_ascii=False)
+    parsed = parse_questions_json(raw, 5, QuestionType.TRUE_FALSE, QuestionType.TRUE_FALSE.value)
+    assert [q["prompt"] for q in parsed] == ["是非題"]
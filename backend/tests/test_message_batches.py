@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from app.core.fake_message_batches import FakeMessageBatchServer
+from app.core.message_batches import MessageBatchClient, MessageBatchError, message_text
+from app.core.prompt_cache import PromptParts, build_api_params
+
+
+def _request(custom_id, count):
+    return {
+        "custom_id": custom_id,
+        "params": build_api_params(
+            PromptParts("教材內容：光合作用。", f"\n\n請生成{count}道題目。"),
+            model="claude-stub",
+            max_tokens=1024,
+            temperature=0.7,
+        ),
+    }
+
+
+def _client(server):
+    return MessageBatchClient(api_key="test", base_url=server.base_url, transport=server.transport)
+
+
+@pytest.mark.asyncio
+async def test_create_wait_and_stream_results():
+    server = FakeMessageBatchServer(polls_until_ended=3, error_ids={"gen-1"})
+    polls = []
+
+    async def on_poll(batch):
+        polls.append(batch["processing_status"])
+
+    async with _client(server) as client:
+        batch = await client.create([_request("gen-0", 2), _request("gen-1", 1), _request("gen-2", 4)])
+        assert batch["processing_status"] == "in_progress"
+
+        finished = await client.wait(batch["id"], poll_interval=0, on_poll=on_poll)
+        assert polls == ["in_progress", "in_progress", "ended"]
+        assert finished["request_counts"]["succeeded"] == 2
+        assert finished["request_counts"]["errored"] == 1
+
+        results = {entry["custom_id"]: entry["result"] async for entry in client.results(finished)}
+
+    assert results["gen-1"]["type"] == "errored"
+    assert len(json.loads(message_text(results["gen-0"]["message"]))) == 2
+    assert len(json.loads(message_text(results["gen-2"]["message"]))) == 4
+
+
+@pytest.mark.asyncio
+async def test_cancel_ends_batch_with_canceled_results():
+    server = FakeMessageBatchServer(polls_until_ended=100)
+    async with _client(server) as client:
+        batch = await client.create([_request("gen-0", 1)])
+        assert (await client.cancel(batch["id"]))["processing_status"] == "canceling"
+
+        finished = await client.wait(batch["id"], poll_interval=0)
+        assert finished["request_counts"]["canceled"] == 1
+        results = [entry async for entry in client.results(finished)]
+
+    assert results[0]["result"]["type"] == "canceled"
+
+
+@pytest.mark.asyncio
+async def test_api_errors_raise_message_batch_error():
+    server = FakeMessageBatchServer()
+    async with _client(server) as client:
+        with pytest.raises(MessageBatchError):
+            await client.retrieve("msgbatch_missing")
+        with pytest.raises(MessageBatchError):
+            await client.create([])
+        with pytest.raises(MessageBatchError):
+            async for _ in client.results({"id": "msgbatch_missing", "results_url": None}):
+                pass
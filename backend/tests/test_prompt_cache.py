@@ -0,0 +1,128 @@
+import json
+
+import httpx
+import pytest
+from anthropic import AsyncAnthropic
+
+from app.core.prompt_cache import (
+    PromptCacheStats,
+    PromptParts,
+    billed_input_tokens,
+    build_api_params,
+    create_message,
+    prompt_text,
+    stream_message,
+)
+
+LONG_CONTEXT = "教材內容：光合作用需要葉綠素與陽光。" * 200
+USAGE = {
+    "input_tokens": 30,
+    "output_tokens": 12,
+    "cache_read_input_tokens": 1500,
+    "cache_creation_input_tokens": 0,
+}
+MESSAGE = {
+    "id": "msg_stub",
+    "type": "message",
+    "role": "assistant",
+    "model": "claude-stub",
+    "content": [{"type": "text", "text": "[]"}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": USAGE,
+}
+
+
+def _stub_client(handler):
+    """以 httpx.MockTransport 取代網路的 Anthropic client（本機 stub server）"""
+    return AsyncAnthropic(
+        api_key="test",
+        base_url="http://stub.local",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+
+def _params(prefix, suffix="\n請生成 3 道題目。"):
+    return build_api_params(
+        PromptParts(prefix, suffix), model="claude-stub", max_tokens=100, temperature=0.5, min_tokens=1024
+    )
+
+
+def test_breakpoint_only_on_long_stable_prefix():
+    params = _params(LONG_CONTEXT)
+    prefix_block, suffix_block = params["messages"][0]["content"]
+    assert prefix_block["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in suffix_block
+    # 拆成兩個區塊不改變 prompt 文字，也不加系統指示
+    assert prompt_text(params) == LONG_CONTEXT + "\n請生成 3 道題目。"
+    assert "system" not in params
+
+    short = _params("短的模板")
+    assert all("cache_control" not in block for block in short["messages"][0]["content"])
+    # 空白的 suffix 不送出空的 text 區塊
+    assert len(_params(LONG_CONTEXT, "")["messages"][0]["content"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_request_uses_prompt_caching_endpoint_and_records_usage():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=MESSAGE)
+
+    client = _stub_client(handler)
+    params = _params(LONG_CONTEXT)
+    resp = await create_message(client, params)
+
+    sent = requests[0]
+    assert sent.url.path == "/v1/messages"
+    assert "prompt-caching" in sent.headers["anthropic-beta"]
+    body = json.loads(sent.content)
+    assert body["messages"][0]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert "system" not in body
+
+    stats = PromptCacheStats()
+    stats.record(params, resp.usage)
+    result = stats.stats()
+    assert result["cache_hits"] == 1
+    assert result["cache_read_input_tokens"] == 1500
+    assert result["cache_read_ratio"] == pytest.approx(1500 / 1530)
+    assert billed_input_tokens(resp.usage) == 30
+
+    # 沒有斷點的請求走一般端點
+    await create_message(client, _params("短的模板"))
+    assert "anthropic-beta" not in requests[1].headers
+
+
+@pytest.mark.asyncio
+async def test_streamed_request_reports_cache_usage():
+    events = [
+        ("message_start", {"type": "message_start", "message": {**MESSAGE, "content": [], "usage": {
+            "input_tokens": 30, "output_tokens": 1,
+            "cache_read_input_tokens": 0, "cache_creation_input_tokens": 1500,
+        }}}),
+        ("content_block_start", {"type": "content_block_start", "index": 0,
+                                 "content_block": {"type": "text", "text": ""}}),
+        ("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                 "delta": {"type": "text_delta", "text": "[{\"prompt\": \"題目\"}]"}}),
+        ("content_block_stop", {"type": "content_block_stop", "index": 0}),
+        ("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                           "usage": {"output_tokens": 9}}),
+        ("message_stop", {"type": "message_stop"}),
+    ]
+    sse = "".join(f"event: {name}\ndata: {json.dumps(data)}\n\n" for name, data in events)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, text=sse, headers={"content-type": "text/event-stream"})
+
+    params = _params(LONG_CONTEXT)
+    async with stream_message(_stub_client(handler), params) as stream:
+        text = "".join([delta async for delta in stream.text_stream])
+        final = await stream.get_final_message()
+
+    assert text == '[{"prompt": "題目"}]'
+    assert final.usage.cache_creation_input_tokens == 1500
+    assert billed_input_tokens(final.usage) == 1530
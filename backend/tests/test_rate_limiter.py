@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from app.core.rate_limiter import AdaptiveLimiter, TokenBucket
+from app.core.tokens import estimate_tokens
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("健康的身體") == 5
+
+
+@pytest.mark.asyncio
+async def test_limiter_caps_concurrency_and_reports_queue():
+    limiter = AdaptiveLimiter(max_concurrency=8, initial_concurrency=2)
+    peak = 0
+    running = 0
+
+    async def call():
+        nonlocal peak, running
+        async with limiter.slot():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    tasks = [asyncio.create_task(call()) for _ in range(6)]
+    await asyncio.sleep(0.001)
+    assert limiter.stats()["queue_depth"] == 4
+    await asyncio.gather(*tasks)
+    assert peak == 2
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_aimd_adjusts_limit():
+    """測試 429 時乘法減少（冷卻時間內只減一次），成功時加法增加"""
+    limiter = AdaptiveLimiter(max_concurrency=16, min_concurrency=1, initial_concurrency=8)
+    limiter.on_rate_limited(retry_after=0)
+    limiter.on_rate_limited(retry_after=0)
+    assert limiter.limit == 4
+    for _ in range(4):
+        limiter.on_success()
+    assert 4.9 < limiter.limit < 5.1
+    assert limiter.stats()["rate_limited"] == 2
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_refill_and_debt():
+    bucket = TokenBucket(per_minute=6000)  # 每秒 100 單位
+    await bucket.acquire(6000)
+    bucket.charge(5)  # 事後扣除的欠額也要先補回
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await bucket.acquire(5)
+    assert loop.time() - start >= 0.09
+    await TokenBucket(per_minute=0).acquire(10**9)
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import retrieval
+
+
+class _Result:
+    def __init__(self, rows=(), scalar=None):
+        self.rows = list(rows)
+        self._scalar = scalar
+
+    def fetchall(self):
+        return self.rows
+
+    def scalar(self):
+        return self._scalar
+
+
+class _Session:
+    """依 SQL 內容回傳結果的 AsyncSession 替身：索引查詢、文本塊數、精確查詢"""
+
+    def __init__(self, pgvector_version, indexed, chunk_counts=None, exact=None):
+        self.pgvector_version = pgvector_version
+        self.indexed = indexed  # 索引查詢取回的 (document_id, slice_text, distance)
+        self.chunk_counts = chunk_counts or {}
+        self.exact = exact or []
+        self.queries = []
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        if "pg_extension" in sql:
+            return _Result(scalar=self.pgvector_version)
+        if "set_config" in sql:
+            return _Result()
+        if "count(*)" in sql:
+            self.queries.append(("count", params["document_ids"]))
+            return _Result([
+                SimpleNamespace(document_id=doc_id, chunk_count=n)
+                for doc_id, n in self.chunk_counts.items() if doc_id in params["document_ids"]
+            ])
+        if "row_number()" in sql:
+            self.queries.append(("exact", params["document_ids"]))
+            return _Result([_row(*row) for row in self.exact if row[0] in params["document_ids"]])
+        self.queries.append(("index", params.get("document_ids", params.get("document_id"))))
+        return _Result([_row(*row) for row in self.indexed])
+
+
+def _row(document_id, slice_text, distance):
+    return SimpleNamespace(id=hash(slice_text), document_id=document_id, slice_text=slice_text, distance=distance)
+
+
+@pytest.fixture(autouse=True)
+def query_embedding(monkeypatch):
+    async def create_query_embedding(query):
+        return [0.0, 1.0]
+
+    monkeypatch.setattr(retrieval, "create_query_embedding", create_query_embedding)
+    monkeypatch.setattr(retrieval, "_iterative_scan_supported", None)
+
+
+@pytest.mark.asyncio
+async def test_short_documents_skip_exact_search():
+    """測試文本塊少於 top_k 的短文件已全部取回時，不再做精確查詢"""
+    session = _Session("0.7.4", indexed=[(1, "甲", 0.2), (1, "乙", 0.3)], chunk_counts={1: 2})
+    hits = await retrieval.search_similar_chunks(session, "問題", 1, top_k=5)
+
+    assert [hit.slice_text for hit in hits] == ["甲", "乙"]
+    assert hits[0].score == pytest.approx(0.8)
+    assert session.queries == [("index", 1), ("count", [1])]
+
+
+@pytest.mark.asyncio
+async def test_documents_missing_index_results_use_exact_search():
+    """測試索引取回的筆數少於文件的文本塊數時，只對該文件精確查詢"""
+    session = _Session(
+        "0.7.4",
+        indexed=[(1, "甲", 0.2), (2, "丙", 0.1)],
+        chunk_counts={1: 1, 2: 9},
+        exact=[(2, "丙", 0.1), (2, "丁", 0.15), (2, "戊", 0.4)],
+    )
+    results = await retrieval.search_similar_chunks_multi(session, "問題", [1, 2, 1], top_k=3)
+
+    assert [hit.slice_text for hit in results[1]] == ["甲"]
+    assert [hit.slice_text for hit in results[2]] == ["丙", "丁", "戊"]
+    assert session.queries == [("index", [1, 2]), ("count", [1, 2]), ("exact", [2])]
+
+
+@pytest.mark.asyncio
+async def test_iterative_scan_skips_fallback_and_keeps_duplicate_texts():
+    """測試 pgvector >= 0.8 不再補查；內容相同的文本塊都保留"""
+    session = _Session("0.8.0", indexed=[(1, "甲", 0.5), (1, "甲", 0.2), (1, "乙", 0.95)])
+    hits = await retrieval.search_similar_chunks(session, "問題", 1, top_k=5)
+
+    assert [(hit.slice_text, round(hit.score, 2)) for hit in hits] == [("甲", 0.8), ("甲", 0.5)]
+    assert session.queries == [("index", 1)]
@@ -0,0 +1,25 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import mock_generate
+
+
+@pytest.fixture
+def client():
+    """只掛載 Mock 生成路由，不依賴 USE_MOCK_API 環境變數"""
+    app = FastAPI()
+    app.include_router(mock_generate.router)
+    return TestClient(app)
+
+
+def test_mock_generate_stream_events(client):
+    """測試Mock串流生成API依序送出 start、question、done 事件"""
+    payload = {"subject": "health", "document_id": 999, "types": {"single_choice": 1, "cloze": 1}}
+
+    with client.stream("POST", "/api/generate/stream", json=payload) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [line[len("event: "):] for line in response.iter_lines() if line.startswith("event: ")]
+
+    assert events == ["start", "question", "question", "done"]
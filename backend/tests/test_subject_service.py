@@ -0,0 +1,55 @@
+import re
+
+import pytest
+
+from app.services.subject_service import SubjectService
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return iter(self.rows)
+
+
+class _Session:
+    """記錄 execute 呼叫的 AsyncSession 替身"""
+
+    def __init__(self, created=()):
+        self.created = list(created)
+        self.calls = []
+        self.commits = 0
+
+    async def execute(self, statement, params=None):
+        self.calls.append((statement, params))
+        return _Result(self.created)
+
+    async def commit(self):
+        self.commits += 1
+
+
+@pytest.mark.asyncio
+async def test_ensure_subjects_skips_names_existing_in_any_grade():
+    """測試科目已存在於任何年級時不另建：只以名稱判斷，新科目的年級為空字串"""
+    session = _Session(created=["英文"])
+    created = await SubjectService(session).ensure_subjects(["健康", " 英文 ", "健康", "", None, "長" * 51])
+
+    assert created == ["英文"]
+    assert session.commits == 1
+    (statement, params), = session.calls
+    # 名稱去除空白、去重、排序；空白與超過欄位長度的名稱不送出
+    assert params["names"] == ["健康", "英文"]
+
+    sql = " ".join(str(statement).split())
+    not_exists = re.search(r"WHERE NOT EXISTS \((.*?)\)", sql).group(1)
+    assert "s.name = n" in not_exists and "grade" not in not_exists
+    assert "SELECT n, :description, :color, '', true" in sql
+    assert "ON CONFLICT (name, grade) DO NOTHING" in sql
+
+
+@pytest.mark.asyncio
+async def test_ensure_subjects_without_names_skips_database():
+    session = _Session()
+    assert await SubjectService(session).ensure_subjects(["", "  "]) == []
+    assert session.calls == [] and session.commits == 0
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from app.core.text_stream import PayloadTooLarge, iter_text_pieces
+
+
+async def _body(parts):
+    for part in parts:
+        yield part
+
+
+async def _collect(parts, content_type, max_bytes=1 << 20, max_line_bytes=1 << 16):
+    return [
+        piece
+        async for piece in iter_text_pieces(_body(parts), content_type, max_bytes, max_line_bytes)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_plain_text_decodes_characters_split_across_parts():
+    """測試多位元組字元被切在兩個片段之間仍能正確解碼"""
+    data = "﻿健康的身體。Healthy body.".encode("utf-8")
+    parts = [data[i:i + 2] for i in range(0, len(data), 2)]
+    pieces = await _collect(parts, "text/plain; charset=utf-8")
+    assert "".join(pieces) == "健康的身體。Healthy body."
+
+
+@pytest.mark.asyncio
+async def test_ndjson_lines_split_across_parts():
+    lines = [json.dumps({"text": "第一段。"}), "", json.dumps("第二段。"), json.dumps({"other": 1})]
+    data = "\n".join(lines).encode("utf-8")
+    parts = [data[i:i + 5] for i in range(0, len(data), 5)]
+    assert await _collect(parts, "application/x-ndjson") == ["第一段。", "第二段。"]
+
+
+@pytest.mark.asyncio
+async def test_limits_and_invalid_input():
+    with pytest.raises(PayloadTooLarge):
+        await _collect([b"a" * 10, b"b" * 10], "text/plain", max_bytes=15)
+    with pytest.raises(PayloadTooLarge):
+        await _collect([b'"' + b"a" * 100], "application/x-ndjson", max_line_bytes=50)
+    with pytest.raises(ValueError):
+        await _collect([b"{not json}\n"], "application/x-ndjson")
+    with pytest.raises(ValueError):
+        await _collect([b"\xff\xfe"], "text/plain")
+    with pytest.raises(ValueError):
+        await _collect([b"<xml/>"], "application/xml")